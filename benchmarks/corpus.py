@@ -0,0 +1,109 @@
+import random
+import argparse
+from pathlib import Path
+
+from models.benchmark import CorpusSpec
+
+WORDS: list[str] = (
+    "conversion latex document section table figure equation normalised tree format journal conference "
+    "result method data model value analysis system performance parser node visitor template output"
+).split()
+
+def generate(spec: CorpusSpec) -> str:
+    """
+    Generates a synthetic article shaped by `spec`.
+
+    Tables, figures and equations are spread evenly over the sections, and
+    every section nests `depth` levels of subsections and environments. Only
+    constructs the Normaliser handles are used (equations are `align`
+    blocks, nesting uses `quote`), so every stage of the pipeline runs. The
+    same spec always produces the same document.
+    """
+    rng = random.Random(spec.seed)
+    body: list[str] = []
+
+    tables = _spread(spec.tables, spec.sections)
+    figures = _spread(spec.figures, spec.sections)
+    equations = _spread(spec.equations, spec.sections)
+
+    for s in range(spec.sections):
+        body.append(f"\\section{{{_words(rng, 3).title()}}}\n\\label{{sec:{s}}}\n")
+        body.extend(_paragraph(rng) for _ in range(spec.paragraphs))
+        body.append(_nested(rng, s, spec.depth))
+
+        body.extend(_equation(rng, f"{s}-{i}") for i in range(equations[s]))
+        body.extend(_table(rng, f"{s}-{i}") for i in range(tables[s]))
+        body.extend(_figure(rng, f"{s}-{i}") for i in range(figures[s]))
+
+    return (
+        "\\documentclass{article}\n"
+        "\\usepackage{amsmath}\n"
+        "\\usepackage{graphicx}\n"
+        "\\begin{document}\n"
+        + "\n".join(body)
+        + "\\end{document}\n"
+    )
+
+def _spread(count: int, buckets: int) -> list[int]:
+    return [count // buckets + (1 if i < count % buckets else 0) for i in range(buckets)]
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+def _paragraph(rng: random.Random) -> str:
+    sentences = (f"{_words(rng, rng.randint(6, 14)).capitalize()}." for _ in range(rng.randint(3, 6)))
+    return " ".join(sentences) + "\n"
+
+def _nested(rng: random.Random, section: int, depth: int) -> str:
+    """ Subsections down to `depth` levels, then environments nested as deep """
+    levels = ["subsection", "subsubsection"]
+    parts: list[str] = []
+
+    for level in range(min(depth, len(levels))):
+        parts.append(f"\\{levels[level]}{{{_words(rng, 2).title()}}}\n{_paragraph(rng)}")
+
+    block = ""
+    for _ in range(depth):
+        block = f"\\begin{{quote}}\n{_words(rng, 8)}\n{block}\\end{{quote}}\n"
+    parts.append(block)
+
+    return "".join(parts)
+
+def _equation(rng: random.Random, label: str) -> str:
+    a, b = rng.randint(1, 9), rng.randint(1, 9)
+    return f"\\begin{{align}}\n\\label{{eq:{label}}}\nx_{{{a}}} &= \\frac{{{a}}}{{{b}}} + \\sum_{{i=1}}^{{{b}}} y_i\n\\end{{align}}\n"
+
+def _table(rng: random.Random, label: str) -> str:
+    columns = rng.randint(2, 4)
+    rows = [" & ".join(_words(rng, 1) for _ in range(columns))]
+    rows += [" & ".join(str(rng.randint(0, 999)) for _ in range(columns)) for _ in range(rng.randint(2, 6))]
+
+    return (
+        "\\begin{table}\n\\centering\n"
+        f"\\begin{{tabular}}{{{'l' * columns}}}\n"
+        + " \\\\\n".join(rows)
+        + "\n\\end{tabular}\n"
+        f"\\caption{{\\label{{tab:{label}}}{_words(rng, 4).capitalize()}.}}\n"
+        "\\end{table}\n"
+    )
+
+def _figure(rng: random.Random, label: str) -> str:
+    return (
+        "\\begin{figure}\n\\centering\n"
+        "\\includegraphics[width=0.5\\linewidth]{frog.jpg}\n"
+        f"\\caption{{{_words(rng, 5).capitalize()}.}}\n\\label{{fig:{label}}}\n"
+        "\\end{figure}\n"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic LaTeX document.")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    spec = CorpusSpec(depth=args.depth, seed=args.seed).scaled(args.scale)
+    args.output.write_text(generate(spec), encoding="utf-8")
+
+    print(f"INFO - wrote {args.output} ({args.output.stat().st_size} bytes)")
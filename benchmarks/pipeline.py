@@ -0,0 +1,318 @@
+import sys
+import time
+import platform
+import argparse
+import datetime
+import tracemalloc
+import subprocess
+from pathlib import Path
+from typing import Callable
+
+import TexSoup as ts
+
+from core.visitation import ASTVisitor, CIRVisitor
+from core.normalisation import Normaliser, Denormaliser
+from core.tables import TableResolver
+from core.convert import extract_format_type
+from models.types import FormatType, LLMBackendType
+from models.compile import CompileJob
+from models.benchmark import CorpusSpec, StageTiming, BenchmarkCase, BenchmarkRun
+from utils.extraction import DocumentIndex
+from rag.extraction import RAGExtractor
+from rag.backends import create_backend, load_config
+from rag.limits import RateLimiter
+from benchmarks.corpus import generate
+
+ROOT: Path = Path(__file__).resolve().parent.parent
+
+BUNDLED: dict[str, Path] = {
+    "IEEE"     : ROOT / "data" / "IEEE" / "conference_101719.tex",
+    "SPRINGER" : ROOT / "data" / "SPRINGER" / "sn-article.tex",
+    "TEST"     : ROOT / "data" / "TEST" / "test_file.tex",
+}
+
+RESULTS_DIR: Path = ROOT / "benchmarks" / "results"
+
+STAGES: tuple[str, ...] = ("parse", "normalise", "tables", "denormalise", "compile")
+
+def run_case(name: str, tex: str, to_format: FormatType = FormatType.IEEE, repeat: int = 5,
+             compile: bool = False, memory: bool = False, resources: Path | None = None,
+             spec: CorpusSpec | None = None, extractor: RAGExtractor | None = None) -> BenchmarkCase:
+    """
+    Times every stage of the pipeline on one document.
+
+    Each repeat runs the stages in order on the output of the previous one;
+    a failing stage is recorded and ends that repeat. With `memory` one more,
+    untimed run measures the peak allocation of every stage with tracemalloc,
+    which would otherwise distort the timings.
+
+    Args:
+        name: Name of the case in the results
+        tex: The document
+        to_format: Format the document is converted to
+        repeat: Number of timed runs
+        compile: Also compile the converted document
+        memory: Also measure the peak memory of every stage
+        resources: Directory holding the images and .bib files of the document
+        spec: The CorpusSpec of a synthetic document
+        extractor: Extractor of the tables the native parser is not confident about, the pooled one if None
+    """
+    case = BenchmarkCase(name=name, size=len(tex.encode("utf-8")), spec=spec)
+    stages = {stage: StageTiming(stage=stage) for stage in STAGES if compile or stage != "compile"}
+    case.stages = list(stages.values())
+
+    for _ in range(repeat):
+        for stage, seconds, _peak, error in _run_stages(tex, to_format, compile, resources, extractor, memory=False):
+            if error is not None:
+                stages[stage].error = error
+                break
+            stages[stage].runs.append(seconds)
+
+    if memory:
+        for stage, _seconds, peak, error in _run_stages(tex, to_format, compile, resources, extractor, memory=True):
+            if error is not None:
+                break
+            stages[stage].peak_memory = peak
+
+    return case
+
+def _run_stages(tex: str, to_format: FormatType, compile: bool, resources: Path | None,
+                extractor: RAGExtractor | None, memory: bool):
+    """ Runs the pipeline once, yielding (stage, seconds, peak bytes, error) per stage """
+    state: dict = {}
+
+    def parse():
+        state["ast"] = ts.TexSoup(tex)
+        state["index"] = DocumentIndex(state["ast"])
+
+    def normalise():
+        normaliser = Normaliser(format_type=extract_format_type(state["index"]), defer_tables=True, source=tex)
+        visitor = ASTVisitor(normaliser=normaliser, index=state["index"])
+        visitor.visit(state["ast"])
+        state["cir"] = visitor.get()
+
+    def tables():
+        TableResolver(extractor=extractor).resolve(state["cir"])
+
+    def denormalise():
+        visitor = CIRVisitor(denormaliser=Denormaliser(format_type=to_format), cir=state["cir"])
+        visitor.visit(state["cir"].root)
+        state["tex"] = visitor.get()
+
+    def compile_():
+        from utils.compile import compile_job
+
+        result = compile_job(CompileJob(tex=state["tex"], resources=resources, use_cache=False))
+        if not result.ok:
+            raise Exception(result.error)
+
+    steps: list[tuple[str, Callable[[], None]]] = [
+        ("parse", parse), ("normalise", normalise), ("tables", tables), ("denormalise", denormalise),
+    ]
+    if compile:
+        steps.append(("compile", compile_))
+
+    if memory:
+        tracemalloc.start()
+
+    try:
+        for stage, step in steps:
+            if memory:
+                tracemalloc.reset_peak()
+
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                yield stage, 0.0, None, f"{type(e).__name__}: {e}"
+                return
+
+            seconds = time.perf_counter() - start
+            yield stage, seconds, tracemalloc.get_traced_memory()[1] if memory else None, None
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+def run(bundled: bool = False, scales: list[int] | None = None, depths: list[int] | None = None,
+        repeat: int = 5, compile: bool = False, memory: bool = False,
+        to_format: FormatType = FormatType.IEEE, llm_backend: LLMBackendType | None = None,
+        cassettes: Path | None = None, replay_latency: float | None = None) -> BenchmarkRun:
+    """
+    Runs the synthetic corpus and, optionally, the bundled documents.
+
+    A case a stage fails on is reported and left out of the results, so a
+    run only holds complete measurements. The bundled documents use
+    constructs the Normaliser does not handle yet and are off by default.
+
+    Args:
+        bundled: Include the documents in data/
+        scales: Factors the synthetic document is scaled by, see `CorpusSpec.scaled`
+        depths: Nesting depths of the synthetic documents
+        repeat: Number of timed runs per case
+        compile: Also time the compilation (needs pdflatex)
+        memory: Also measure the peak memory of every stage
+        to_format: Format every document is converted to
+        llm_backend: Backend of the table extractions, uncached so every repeat reaches it.
+            The pooled, cached extractor if None; with REPLAY the run needs no network.
+        cassettes: Cassette directory of the RECORD and REPLAY backends
+        replay_latency: Seconds per replayed completion, the recorded latency if None
+    """
+    benchmark = BenchmarkRun(
+        started=datetime.datetime.now().isoformat(timespec="seconds"),
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        revision=_revision(),
+        repeat=repeat,
+        llm_backend=llm_backend,
+    )
+
+    extractor = None
+    if llm_backend is not None:
+        overrides = {"backend": llm_backend, "cassettes": cassettes, "replay_latency": replay_latency}
+        config = load_config(**{name: value for name, value in overrides.items() if value is not None})
+        backend = create_backend(config)
+        extractor = RAGExtractor(llm_model=config.model, cache=False, backend=backend,
+                                 limiter=RateLimiter(config.limits) if backend.remote else None)
+
+    if compile:
+        from utils.toolchain import probe
+        benchmark.engine = probe().version("pdflatex") or None
+
+    if bundled:
+        for name, path in BUNDLED.items():
+            if not path.exists():
+                print(f"[WARNING] {path} not found, skipping {name}")
+                continue
+
+            print(f"INFO - benchmarking {name}")
+            _add(benchmark, run_case(name, path.read_text(encoding="utf-8"), to_format, repeat, compile, memory,
+                                     resources=path.parent, extractor=extractor))
+
+    for depth in depths or [1]:
+        for scale in scales or []:
+            spec = CorpusSpec(depth=depth).scaled(scale)
+            name = f"synthetic-x{scale}-d{depth}"
+
+            print(f"INFO - benchmarking {name}")
+            _add(benchmark, run_case(name, generate(spec), to_format, repeat, compile, memory,
+                                     resources=ROOT / "data" / "TEST", spec=spec, extractor=extractor))
+
+    return benchmark
+
+def _add(benchmark: BenchmarkRun, case: BenchmarkCase) -> None:
+    """ Adds a case to the results, unless one of its stages failed """
+    for timing in case.stages:
+        if timing.error is not None:
+            print(f"[WARNING] {case.name} failed at {timing.stage}, left out of the results: "
+                  f"{timing.error.splitlines()[0][:120]}")
+            return
+
+    benchmark.cases.append(case)
+
+def save(benchmark: BenchmarkRun, path: Path | str | None = None) -> Path:
+    """ Writes a run as JSON, by default to RESULTS_DIR/<start time>.json """
+    path = Path(path) if path is not None else RESULTS_DIR / f"{benchmark.started.replace(':', '-')}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(benchmark.model_dump_json(indent=2), encoding="utf-8")
+
+    return path
+
+def load(path: Path | str) -> BenchmarkRun:
+    path = Path(path)
+
+    if not path.exists():
+        raise FileNotFoundError(f"File {path} not found.")
+
+    return BenchmarkRun.model_validate_json(path.read_text(encoding="utf-8"))
+
+def report(benchmark: BenchmarkRun) -> str:
+    """ Median time per stage, throughput and peak memory of every case """
+    lines = [f"{'case':<24}{'KiB':>8}" + "".join(f"{stage:>13}" for stage in STAGES) + f"{'KiB/s':>10}{'peak MiB':>10}"]
+
+    for case in benchmark.cases:
+        cells = []
+        for stage in STAGES:
+            timing = case.stage(stage)
+            if timing is None or not timing.runs:
+                cells.append("error" if timing is not None and timing.error else "-")
+            else:
+                cells.append(f"{timing.median * 1000:.1f}ms")
+
+        total = sum(timing.median for timing in case.stages)
+        peaks = [timing.peak_memory for timing in case.stages if timing.peak_memory is not None]
+        complete = all(timing.error is None for timing in case.stages)
+
+        lines.append(
+            f"{case.name:<24}{case.size / 1024:>8.1f}" + "".join(f"{cell:>13}" for cell in cells)
+            + (f"{case.size / 1024 / total:>10.1f}" if complete and total else f"{'-':>10}")
+            + (f"{max(peaks) / 1024 / 1024:>10.1f}" if peaks else f"{'-':>10}")
+        )
+
+    for case in benchmark.cases:
+        for timing in case.stages:
+            if timing.error is not None:
+                lines.append(f"[WARNING] {case.name} {timing.stage}: {timing.error.splitlines()[0][:120]}")
+
+    return "\n".join(lines)
+
+def compare(baseline: BenchmarkRun, current: BenchmarkRun) -> str:
+    """ Ratio of the median time of every stage of the cases both runs share """
+    previous = {case.name: case for case in baseline.cases}
+    lines = [f"{'case':<24}{'stage':<13}{'before':>12}{'after':>12}{'ratio':>8}"]
+
+    for case in current.cases:
+        if case.name not in previous:
+            continue
+
+        for timing in case.stages:
+            before = previous[case.name].stage(timing.stage)
+            if before is None or not before.runs or not timing.runs:
+                continue
+
+            ratio = timing.median / before.median if before.median else 0.0
+            lines.append(f"{case.name:<24}{timing.stage:<13}{before.median * 1000:>10.1f}ms"
+                         f"{timing.median * 1000:>10.1f}ms{ratio:>8.2f}")
+
+    return "\n".join(lines)
+
+def _revision() -> str | None:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=False)
+    except OSError:
+        return None
+
+    return result.stdout.strip() or None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline stage by stage.")
+    parser.add_argument("--bundled", action="store_true", help="also run the documents in data/")
+    parser.add_argument("--scales", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--depths", type=int, nargs="*", default=[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--compile", action="store_true", help="also time the compilation")
+    parser.add_argument("--memory", action="store_true", help="also measure peak memory per stage")
+    parser.add_argument("--to-format", type=FormatType, default=FormatType.IEEE)
+    parser.add_argument("--llm-backend", type=LLMBackendType, default=None,
+                        help="extract tables uncached through this backend, replay runs offline")
+    parser.add_argument("--cassettes", type=Path, default=None, help="cassette directory of record/replay")
+    parser.add_argument("--replay-latency", type=float, default=None, help="seconds per replayed completion")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None, help="a previous result to compare with")
+    parser.add_argument("--compare", type=Path, nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="only compare two stored results")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(compare(load(args.compare[0]), load(args.compare[1])))
+        sys.exit(0)
+
+    benchmark = run(bundled=args.bundled, scales=args.scales, depths=args.depths, repeat=args.repeat,
+                    compile=args.compile, memory=args.memory, to_format=args.to_format,
+                    llm_backend=args.llm_backend, cassettes=args.cassettes, replay_latency=args.replay_latency)
+
+    print(report(benchmark))
+    print(f"INFO - results written to {save(benchmark, args.out)}")
+
+    if args.baseline is not None:
+        print(compare(load(args.baseline), benchmark))
@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import argparse
+import traceback
+import multiprocessing as mp
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from core.convert import convert
+from models.batch import ConversionJob, ConversionResult, BatchSummary
+
+# Per job, the pid of the worker which started it, shared with the workers so a broken pool can tell which jobs were running
+_started = None
+
+def _init_worker(started) -> None:
+    global _started
+    _started = started
+
+def _run_job(worker: Callable[[int, ConversionJob], ConversionResult], index: int,
+             job: ConversionJob) -> ConversionResult:
+    """ Worker entry point, records which job the process started """
+    if _started is not None:
+        _started[index] = os.getpid()
+
+    return worker(index, job)
+
+def _convert_job(index: int, job: ConversionJob) -> ConversionResult:
+    """ Converts one job, never raises so one document cannot fail the batch """
+    start = time.perf_counter()
+    size = 0
+
+    try:
+        tex: str = job.source.read_text(encoding="utf-8")
+        size = len(tex)
+
+        if job.output is not None:
+            job.output.parent.mkdir(parents=True, exist_ok=True)
+
+            with open(job.output, "w", encoding="utf-8") as out:
+                converted = convert(tex, job.to_format, compile=False, out=out)
+        else:
+            converted = convert(tex, job.to_format, compile=False)
+
+        return ConversionResult(index=index, job=job, tex=converted, size=size,
+                                elapsed=time.perf_counter() - start, worker=os.getpid())
+
+    except Exception:
+        return ConversionResult(index=index, job=job, error=traceback.format_exc(), size=size,
+                                elapsed=time.perf_counter() - start, worker=os.getpid())
+
+def load_manifest(manifest_path: Path | str) -> list[ConversionJob]:
+    """
+    Loads conversion jobs from a JSON manifest.
+
+    The manifest is either a JSON list or JSON lines of objects with the keys
+    `source`, `to_format` (a FormatType value, e.g. "IEEEtran") and optionally
+    `output`. Relative paths are resolved against the manifest directory.
+    """
+    path = Path(manifest_path)
+
+    if not path.exists():
+        raise FileNotFoundError(f"File {path} not found.")
+
+    text = path.read_text(encoding="utf-8").strip()
+
+    if text.startswith("["):
+        entries: list[dict] = json.loads(text)
+    else:
+        entries: list[dict] = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    jobs: list[ConversionJob] = []
+    for entry in entries:
+        job = ConversionJob(**entry)
+
+        job.source = path.parent / job.source
+        if job.output is not None:
+            job.output = path.parent / job.output
+
+        jobs.append(job)
+
+    return jobs
+
+class BatchConverter:
+    """
+    Converts many documents over a pool of worker processes.
+
+    A worker which dies (segfault, OOM kill) breaks the whole pool. The jobs
+    which had not started yet are then resubmitted to a fresh pool, and the
+    ones which were running are rerun one at a time in a pool of their own:
+    only the job which kills its worker again is reported as failed.
+
+    Args:
+        max_workers: Number of worker processes. Defaults to the CPU count.
+        max_tasks_per_child: Documents a worker converts before it is replaced
+                             by a fresh process. None keeps workers for the whole batch.
+        ordered: Deliver results in manifest order. If False, results are
+                 delivered as soon as they complete.
+    """
+    def __init__(self, max_workers: int | None = None, max_tasks_per_child: int | None = 50,
+                 ordered: bool = True):
+        self.max_workers         : int        = max_workers or os.cpu_count() or 1
+        self.max_tasks_per_child : int | None = max_tasks_per_child
+        self.ordered             : bool       = ordered
+        self.summary             : BatchSummary = BatchSummary()
+
+    # Function run on the workers for every job, `(index, job) -> ConversionResult`; must be picklable
+    worker = staticmethod(_convert_job)
+
+    def run(self, jobs: Iterable[ConversionJob]) -> Iterator[ConversionResult]:
+        """ Converts every job, yielding one ConversionResult per job """
+        jobs: list[ConversionJob] = list(jobs)
+        self.summary = BatchSummary(total=len(jobs))
+
+        start = time.perf_counter()
+        context = mp.get_context("spawn")
+        started = context.Array("i", max(1, len(jobs)), lock=False)
+
+        remaining: list[int] = list(range(len(jobs)))
+        buffered: dict[int, ConversionResult] = {}
+        delivered: int = 0
+
+        def deliver(result: ConversionResult) -> list[ConversionResult]:
+            """ Accounts a result, returns the results now ready to be yielded """
+            nonlocal delivered
+
+            self.summary.add(result)
+            self.summary.elapsed = time.perf_counter() - start
+
+            if not self.ordered:
+                return [result]
+
+            buffered[result.index] = result
+            ready = []
+            while delivered in buffered:
+                ready.append(buffered.pop(delivered))
+                delivered += 1
+
+            return ready
+
+        try:
+            while remaining:
+                done: set[int] = set()
+                broken: bool = False
+
+                for result in self._run_pool(context, started, jobs, remaining):
+                    if result is None:
+                        broken = True
+                        break
+
+                    done.add(result.index)
+                    yield from deliver(result)
+
+                if broken:
+                    suspects = [index for index in remaining if index not in done and started[index]]
+
+                    if suspects:
+                        print(f"[WARNING] a worker died, rerunning {len(suspects)} running job(s) one at a time")
+                        for index in suspects:
+                            done.add(index)
+                            yield from deliver(self._isolate(context, started, index, jobs[index]))
+
+                    elif not done:
+                        # Nothing ran, the workers die on their own: give up instead of looping
+                        print(f"[WARNING] worker processes died before converting, failing {len(remaining)} job(s)")
+                        for index in remaining:
+                            done.add(index)
+                            yield from deliver(ConversionResult(index=index, job=jobs[index],
+                                                                error="Worker processes died before converting"))
+
+                remaining = [index for index in remaining if index not in done]
+                for index in remaining:
+                    started[index] = 0
+        finally:
+            self.summary.elapsed = time.perf_counter() - start
+
+    def _run_pool(self, context, started, jobs: list[ConversionJob],
+                  indices: list[int]) -> Iterator[ConversionResult | None]:
+        """ Runs jobs on a fresh pool, yielding results as they complete and None if the pool broke """
+        pool = ProcessPoolExecutor(
+            max_workers=min(self.max_workers, len(indices)),
+            mp_context=context,
+            max_tasks_per_child=self.max_tasks_per_child,
+            initializer=_init_worker,
+            initargs=(started,),
+        )
+
+        try:
+            futures: list[Future] = [pool.submit(_run_job, self.worker, index, jobs[index]) for index in indices]
+
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    yield None
+                    return
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _isolate(self, context, started, index: int, job: ConversionJob) -> ConversionResult:
+        """ Reruns a job which was running when its pool broke, alone so a crash can only be its own """
+        pool = ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker, initargs=(started,))
+
+        try:
+            return pool.submit(_run_job, self.worker, index, job).result()
+        except BrokenProcessPool as e:
+            return ConversionResult(index=index, job=job, error=f"Worker process died converting {job.source}: {e}")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+def convert_many(jobs: Iterable[ConversionJob], **kwargs) -> tuple[list[ConversionResult], BatchSummary]:
+    """
+    Converts a batch of documents in parallel.
+
+    Args:
+        jobs: The documents to convert, e.g. from `load_manifest`
+        **kwargs: Options passed to `BatchConverter`
+
+    Returns:
+        The results in delivery order and the throughput summary
+    """
+    converter = BatchConverter(**kwargs)
+    results = list(converter.run(jobs))
+
+    return results, converter.summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a manifest of LaTeX documents.")
+    parser.add_argument("manifest", type=Path)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-tasks-per-child", type=int, default=50)
+    parser.add_argument("--as-completed", action="store_true")
+    args = parser.parse_args()
+
+    converter = BatchConverter(
+        max_workers=args.workers,
+        max_tasks_per_child=args.max_tasks_per_child,
+        ordered=not args.as_completed,
+    )
+
+    for result in converter.run(load_manifest(args.manifest)):
+        status = "OK" if result.ok else "FAILED"
+        print(f"INFO - [{status}] {result.job.source} ({result.elapsed:.3f}s)")
+
+        if not result.ok:
+            print(result.error)
+
+    print(converter.summary)
@@ -1,47 +1,127 @@
+import asyncio
+import contextvars
 import TexSoup as ts
+from typing import TextIO
+from concurrent.futures import Executor, ThreadPoolExecutor
 
 from core.visitation import ASTVisitor, CIRVisitor
 from core.normalisation import Normaliser, Denormaliser
+from core.tables import TableResolver
+from core.CIRTree import CIRTree
 
 from models.types import FormatType
-from utils.extraction import get_required
-from utils.compile import compile_tex_from_string
+from utils.extraction import DocumentIndex, get_required
+from utils.compile import compile_tex_from_string, compile_tex_async
+from utils.tracing import span
 
-def extract_format_type(soup: ts.TexSoup) -> FormatType:
+def extract_format_type(soup: ts.TexNode | DocumentIndex) -> FormatType:
     """ Extracts format type from tex soup """
-    doc_class = soup.documentclass
+    index = soup if isinstance(soup, DocumentIndex) else DocumentIndex(soup)
 
-    arg = get_required(doc_class)[-1]
+    arg = get_required(index.doc_class)[-1]
 
     return FormatType(arg)
 
-def requires_bibfile(soup: ts.TexSoup) -> bool:
+def requires_bibfile(soup: ts.TexNode | DocumentIndex) -> bool:
     """ Checks if tex soup has bibtex """
-    if soup.find('bibliography'):
-        return True
+    index = soup if isinstance(soup, DocumentIndex) else DocumentIndex(soup)
 
-    return False
+    return index.requires_bibfile
 
-def convert(tex: str, to_format: FormatType, compile: bool=True, ) -> str:
-    """ Converts to specified format """
-    ast     : ts.TexSoup = ts.TexSoup(tex)
-    from_format  : FormatType = extract_format_type(ast)
+def convert(tex: str, to_format: FormatType, compile: bool=True, table_workers: int=8,
+            out: TextIO | None = None) -> str | None:
+    """
+    Converts to specified format, extracting up to `table_workers` tables concurrently.
 
-    normaliser  : Normaliser = Normaliser(format_type=from_format)
-    ast_visitor : ASTVisitor = ASTVisitor(normaliser=normaliser)
-    ast_visitor.visit(ast)
+    If `out` is given the converted document is streamed to it fragment by
+    fragment and None is returned.
+    """
+    if out is not None and compile:
+        raise ValueError("compile=True needs the document in memory, compile the file written to `out` instead")
 
-    denormaliser: Denormaliser = Denormaliser(format_type=to_format)
-    cir_visitor :CIRVisitor = CIRVisitor(denormaliser=denormaliser, cir=ast_visitor.get())
-    cir_visitor.visit(ast_visitor.get().root)
+    with span("convert", to_format=to_format.value):
+        cir: CIRTree = _to_cir(tex)
 
-    tex: str = cir_visitor.get()
+        with span("tables"):
+            TableResolver(max_workers=table_workers).resolve(cir)
+
+        tex: str | None = _from_cir(cir, to_format, out)
+
+    if out is not None:
+        return None
 
     if compile:
         compile_tex_from_string(tex)
 
     return tex
 
+async def convert_async(tex: str, to_format: FormatType, compile: bool = False, table_workers: int = 8,
+                        executor: Executor | None = None) -> str:
+    """
+    Converts to specified format without blocking the event loop.
+
+    Parsing, normalising and denormalising run in `executor` (the loop's
+    default executor if None), table extractions and the compilation are
+    awaited. Cancelling the task cancels the pending extractions and kills
+    the running compilation.
+
+    Raises:
+        Exception: If `compile` is set and the converted document does not compile
+    """
+    with span("convert", to_format=to_format.value):
+        cir: CIRTree = await _run_stage(executor, "normalise", _to_cir, tex)
+
+        with span("tables"):
+            await TableResolver(max_workers=table_workers).aresolve(cir)
+
+        tex: str = await _run_stage(executor, "denormalise", _from_cir, cir, to_format)
+
+    if compile:
+        result = await compile_tex_async(tex)
+        if not result.ok:
+            raise Exception(result.error)
+
+    return tex
+
+async def _run_stage(executor: Executor | None, name: str, func, *args):
+    """
+    Runs a pipeline stage in `executor`.
+
+    Threads run the stage in a copy of the current context so its spans nest
+    under the current one. A context cannot be pickled to another process, so
+    there the stage runs on its own and its span is recorded around the await.
+    """
+    loop = asyncio.get_running_loop()
+
+    if executor is None or isinstance(executor, ThreadPoolExecutor):
+        return await loop.run_in_executor(executor, contextvars.copy_context().run, func, *args)
+
+    with span(name):
+        return await loop.run_in_executor(executor, func, *args)
+
+def _to_cir(tex: str) -> CIRTree:
+    """ Parses and normalises a document, its tables are left as PendingTable placeholders """
+    with span("parse"):
+        ast     : ts.TexSoup = ts.TexSoup(tex)
+        index   : DocumentIndex = DocumentIndex(ast)
+    from_format  : FormatType = extract_format_type(index)
+
+    with span("normalise"):
+        normaliser  : Normaliser = Normaliser(format_type=from_format, defer_tables=True, source=tex)
+        ast_visitor : ASTVisitor = ASTVisitor(normaliser=normaliser, index=index)
+        ast_visitor.visit(ast)
+
+    return ast_visitor.get()
+
+def _from_cir(cir: CIRTree, to_format: FormatType, out: TextIO | None = None) -> str | None:
+    """ Denormalises a CIR, into `out` if given """
+    with span("denormalise"):
+        denormaliser: Denormaliser = Denormaliser(format_type=to_format)
+        cir_visitor :CIRVisitor = CIRVisitor(denormaliser=denormaliser, cir=cir, sink=out)
+        cir_visitor.visit(cir.root)
+
+    return cir_visitor.get() if out is None else None
+
 if __name__ == "__main__":
     texes = [r"""
     \documentclass{article}
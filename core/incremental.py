@@ -0,0 +1,125 @@
+import json
+import time
+import hashlib
+import TexSoup as ts
+from pathlib import Path
+
+from core.CIRTree import CIRTree
+from core.convert import extract_format_type
+from core.visitation import ASTVisitor, CIRVisitor
+from core.normalisation import Normaliser, Denormaliser
+from core.tables import TableResolver
+
+from models.types import FormatType
+from models.batch import IncrementalResult
+from models.normalisation import NormalisedNode
+from utils.extraction import DocumentIndex, get_span
+
+STATE_VERSION: int = 1
+
+class IncrementalConverter:
+    """
+    Re-converts a document while reusing the output of unchanged nodes.
+
+    Every top-level node of the document body is keyed by a hash of its source
+    text and of the formats involved. Nodes whose key was seen in a previous
+    run reuse the stored denormalised fragments; only the others are
+    normalised, have their tables resolved and are denormalised again. The
+    preamble is always rebuilt since it is small.
+
+    The keys and fragments of the last run are kept in memory and, when
+    `state_path` is given, in a JSON state file so they survive restarts.
+
+    Args:
+        state_path: JSON file holding the hashes and fragments of the last run
+        table_workers: Maximum number of tables extracted concurrently
+    """
+    def __init__(self, state_path: Path | str | None = None, table_workers: int = 8):
+        self.state_path    : Path | None = Path(state_path) if state_path is not None else None
+        self.table_workers : int         = table_workers
+        self._nodes        : dict[str, list[str]] = self._load()
+
+    def convert(self, tex: str, to_format: FormatType) -> IncrementalResult:
+        """ Converts to specified format, recomputing only the changed top-level nodes """
+        start = time.perf_counter()
+
+        ast         : ts.TexNode    = ts.TexSoup(tex)
+        index       : DocumentIndex = DocumentIndex(ast)
+        from_format : FormatType    = extract_format_type(index)
+
+        if index.document is None:
+            raise ValueError("The document has no document environment")
+
+        normaliser  : Normaliser = Normaliser(format_type=from_format, defer_tables=True, source=tex)
+        ast_visitor : ASTVisitor = ASTVisitor(normaliser=normaliser, index=index)
+        cir         : CIRTree    = ast_visitor.visit_header(ast)
+
+        children = list(index.document.contents)
+        keys = [self._key(child, tex, from_format, to_format) for child in children]
+
+        changed: dict[str, list[NormalisedNode]] = {}
+        for child, key in zip(children, keys):
+            if key not in self._nodes and key not in changed:
+                changed[key] = ast_visitor.visit_child(child, cir.root)
+
+        if changed:
+            TableResolver(max_workers=self.table_workers).resolve(cir)
+
+        cir_visitor : CIRVisitor = CIRVisitor(denormaliser=Denormaliser(format_type=to_format), cir=cir)
+
+        # The resolver may have replaced placeholders, so the nodes are read back from the root
+        resolved = iter(cir.root.children)
+        for key, nodes in changed.items():
+            subtree = [next(resolved) for _ in nodes]
+            self._nodes[key] = [fragment for node in subtree for fragment in cir_visitor.fragments(node)]
+
+        body = [fragment for key in keys for fragment in self._nodes[key]]
+        fragments = [*cir_visitor.preamble, "\\begin{document}\n", *body, "\\end{document}\n"]
+
+        self._nodes = {key: self._nodes[key] for key in keys}
+        self._save()
+
+        recomputed = sum(key in changed for key in keys)
+        print(f"INFO - {recomputed} of {len(keys)} nodes recomputed")
+
+        return IncrementalResult(
+            tex="\n".join(fragments),
+            recomputed=recomputed,
+            reused=len(keys) - recomputed,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def _key(self, node: ts.TexNode | str, tex: str, from_format: FormatType, to_format: FormatType) -> str:
+        """ Hashes the source of a node together with the conversion it goes through """
+        start, end = get_span(node, tex) if isinstance(node, ts.TexNode) else (-1, -1)
+        text = tex[start:end] if start >= 0 else str(node)
+
+        digest = hashlib.sha256(f"{from_format}\0{to_format}\0".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def _load(self) -> dict[str, list[str]]:
+        if self.state_path is None or not self.state_path.exists():
+            return {}
+
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Ignoring unreadable state file {self.state_path}: {e}")
+            return {}
+
+        if state.get("version") != STATE_VERSION:
+            return {}
+
+        return state.get("nodes", {})
+
+    def _save(self) -> None:
+        if self.state_path is None:
+            return
+
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = self.state_path.with_suffix(self.state_path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"version": STATE_VERSION, "nodes": self._nodes}), encoding="utf-8")
+        tmp.replace(self.state_path)
@@ -1,5 +1,3 @@
-from unittest import case
-
 from TexSoup import TexNode
 
 from models.types import FormatType
@@ -8,12 +6,16 @@ from models.normalisation import *
 from core.mapping import *
 import utils.extraction as extraction
 from formats.IFormat import IEEEFormat, SNFormat, FORMATS, IFormat
-from rag.extraction import RAGExtractor
+from rag.pool import ExtractorPool
+from core.tabular import TabularParse, parse_tabular
 from config.settings import Settings
+from utils.tracing import span
 
 class Normaliser:
-    def __init__(self, format_type: FormatType):
+    def __init__(self, format_type: FormatType, defer_tables: bool = False, source: str | None = None):
         self._format_type = format_type
+        self._defer_tables = defer_tables
+        self._source = source
 
         match format_type:
             case FormatType.ARTICLE:
@@ -85,80 +87,107 @@ class Normaliser:
         if type is None:
             type = ElementType.OTHER
 
-        return self._normalise[type](node)
+        with span("normalise.node", element=type.value):
+            return self._normalise[type](node)
+
+    def _original(self, node: TexNode) -> str | SourceSpan:
+        """Span of the node in the source buffer, or a copy of it without one."""
+        if self._source is not None:
+            start, end = extraction.get_span(node, self._source)
+
+            if start >= 0:
+                return SourceSpan(self._source, start, end)
+
+        return str(node)
 
     def _normalise_text(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX text node."""
-        return Text(
-            text=str(node),
-            original_content=str(node),
+        text = str(node)
+
+        return Text.trusted(
+            text=text,
+            original_content=text,
         )
 
     def _normalise_package(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX package node."""
-        return Package(
+        return Package.trusted(
             names=extraction.get_required(node),
             options=extraction.get_optionals(node),
-            original_content=str(node),
+            original_content=self._original(node),
         )
 
     def _normalise_document_class(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX document class node."""
-        return DocumentClass(
+        return DocumentClass.trusted(
             type=FormatType(extraction.get_required(node)[0]),
             options=extraction.get_optionals(node),
-            original_content=str(node),
+            original_content=self._original(node),
         )
 
     def _normalise_author(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX author node."""
-        return Author(
+        return Author.trusted(
             name=extraction.get_required(node)[0],
-            original_content=str(node),
+            original_content=self._original(node),
         )
 
 
     def _normalise_section(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX section node."""
-        return Section(
+        return Section.trusted(
             title=extraction.get_required(node)[0],
             content="",
             level=1,
-            original_content=str(node),
+            original_content=self._original(node),
         )
 
     def _normalise_subsection(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX subsection node."""
-        return Section(
+        return Section.trusted(
             title=extraction.get_required(node)[0],
             content="",
             level=2,
-            original_content=str(node),
+            original_content=self._original(node),
         )
 
     def _normalise_subsubsection(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX subsubsection node."""
-        return Section(
+        return Section.trusted(
             title=extraction.get_required(node)[0],
             content="",
             level=3,
-            original_content=str(node),
+            original_content=self._original(node),
         )
 
     def _normalise_figure(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX figure node."""
         graphics: TexNode = node.includegraphics
 
-        return Figure(
+        return Figure.trusted(
             filename= extraction.get_required(graphics)[0],
-            original_content=str(node),
+            original_content=self._original(node),
         )
 
     def _normalise_table(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX table node."""
-        extractor = RAGExtractor()
+        if self._defer_tables:
+            return PendingTable.trusted(original_content=self._original(node))
+
+        original: str | SourceSpan = self._original(node)
+        latex: str = str(original)
+
+        parsed: TabularParse = parse_tabular(latex)
+        if parsed.confident:
+            print(f"INFO - table {parsed.table.label} parsed natively")
+            table: NormalisedNode = parsed.table
+        else:
+            print(f"INFO - table falls back to the LLM: {parsed.reason}")
+            extractor = ExtractorPool.default().get()
+
+            table: NormalisedNode = extractor.extract(ElementType.TABLE, latex, Table)
 
-        table: NormalisedNode = extractor.extract(ElementType.TABLE, str(node), Table)
+        table.original_content = original
 
         return table
 
@@ -169,9 +198,9 @@ class Normaliser:
 
     def _normalise_title(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX title node."""
-        return Title(
+        return Title.trusted(
             title=extraction.get_required(node)[0],
-            original_content=str(node),
+            original_content=self._original(node),
         )
 
     def _normalise_abstract(self, node: TexNode) -> NormalisedNode:
@@ -341,9 +370,9 @@ class Normaliser:
 
     def _normalise_other(self, node: TexNode) -> NormalisedNode:
         """Normalise a LaTeX other node."""
-        return Other(
-            name=node.name,
-            original_content=str(node),
+        return Other.trusted(
+            name=str(node.name),
+            original_content=self._original(node),
         )
 
 class Denormaliser:
@@ -381,7 +410,8 @@ class Denormaliser:
 
         node_type = type(node)
         if node_type in denormaliser_map:
-            return denormaliser_map[node_type](node)
+            with span("denormalise.node", node=node_type.__name__):
+                return denormaliser_map[node_type](node)
 
     def _denormalise_text(self, node: Text) -> str:
         return node.text
@@ -0,0 +1,453 @@
+import sys
+import mmap
+import struct
+import datetime as dt
+from array import array
+from pathlib import Path
+from enum import IntEnum
+from typing import Any, Iterator
+
+from core.CIRTree import CIRTree
+from core.store import CIRStore, NODE_TYPES, FIELDS, HEADER_SLOTS, HEADER_LISTS, NONE
+from models.types import FormatType
+from models.normalisation import *
+
+MAGIC: bytes = b"TXMCIR"
+VERSION: int = 1
+
+class _Tag(IntEnum):
+    """Leading byte of every encoded value"""
+    NONE   : int = 0
+    FALSE  : int = 1
+    TRUE   : int = 2
+    INT    : int = 3
+    FLOAT  : int = 4
+    STR    : int = 5
+    LIST   : int = 6
+    DICT   : int = 7
+    FORMAT : int = 8
+    DATE   : int = 9
+    CELL   : int = 10
+    NODE   : int = 11
+
+# Node arrays in file order, with their array typecodes
+_ARRAYS: tuple[tuple[str, str], ...] = (
+    ("node_type", "B"), ("parent", "i"), ("first_child", "i"), ("next_sibling", "i"),
+    ("span_start", "q"), ("span_end", "q"),
+)
+
+_PREFIX = struct.Struct("<6sH")
+_LENGTH = struct.Struct("<Q")
+
+class _Encoder:
+    """ Encodes tagged values, either into a shared string table or with strings inline """
+    def __init__(self, strings: dict[str, int] | None = None):
+        self.buffer  : bytearray             = bytearray()
+        self.strings : dict[str, int] | None = strings
+
+    def uint(self, value: int) -> None:
+        while value >= 0x80:
+            self.buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def sint(self, value: int) -> None:
+        self.uint((value << 1) if value >= 0 else ((-value << 1) - 1))
+
+    def text(self, value: str) -> None:
+        if self.strings is None:
+            data = value.encode("utf-8")
+            self.uint(len(data))
+            self.buffer += data
+        else:
+            self.uint(self.strings.setdefault(value, len(self.strings)))
+
+    def value(self, value: Any) -> None:
+        match value:
+            case None:
+                self.buffer.append(_Tag.NONE)
+            case bool():
+                self.buffer.append(_Tag.TRUE if value else _Tag.FALSE)
+            case int():
+                self.buffer.append(_Tag.INT)
+                self.sint(value)
+            case float():
+                self.buffer.append(_Tag.FLOAT)
+                self.buffer += struct.pack("<d", value)
+            case str():
+                self.buffer.append(_Tag.STR)
+                self.text(value)
+            case list() | tuple():
+                self.buffer.append(_Tag.LIST)
+                self.uint(len(value))
+                for item in value:
+                    self.value(item)
+            case dict():
+                self.buffer.append(_Tag.DICT)
+                self.uint(len(value))
+                for key, item in value.items():
+                    self.text(str(key))
+                    self.value(item)
+            case FormatType():
+                self.buffer.append(_Tag.FORMAT)
+                self.text(value.value)
+            case dt.date():
+                self.buffer.append(_Tag.DATE)
+                self.text(value.isoformat())
+            case TableCell():
+                self.buffer.append(_Tag.CELL)
+                self.value(value.content)
+                self.uint(value.rowspan)
+                self.uint(value.colspan)
+            case NormalisedNode():
+                self.buffer.append(_Tag.NODE)
+                self.node(value, value.original_content)
+            case _:
+                raise ValueError(f"Cannot serialise value of type {type(value)}")
+
+    def node(self, node: NormalisedNode, original_content: str | None) -> None:
+        """ Encodes the fields of a node, without its children """
+        code = NODE_TYPES.index(type(node))
+
+        self.uint(code)
+        self.value(original_content)
+        for name in FIELDS[code]:
+            self.value(getattr(node, name))
+
+class _Decoder:
+    def __init__(self, buffer: bytes | memoryview, strings: 'StringTable | None' = None, pos: int = 0):
+        self.buffer  : bytes | memoryview = buffer
+        self.strings : StringTable | None = strings
+        self.pos     : int                = pos
+
+    def uint(self) -> int:
+        result = shift = 0
+
+        while True:
+            byte = self.buffer[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def sint(self) -> int:
+        value = self.uint()
+        return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+    def text(self) -> str:
+        if self.strings is not None:
+            return self.strings[self.uint()]
+
+        size = self.uint()
+        data = bytes(self.buffer[self.pos:self.pos + size])
+        self.pos += size
+
+        return data.decode("utf-8")
+
+    def value(self) -> Any:
+        tag = self.buffer[self.pos]
+        self.pos += 1
+
+        match tag:
+            case _Tag.NONE:
+                return None
+            case _Tag.FALSE:
+                return False
+            case _Tag.TRUE:
+                return True
+            case _Tag.INT:
+                return self.sint()
+            case _Tag.FLOAT:
+                (value,) = struct.unpack_from("<d", self.buffer, self.pos)
+                self.pos += 8
+                return value
+            case _Tag.STR:
+                return self.text()
+            case _Tag.LIST:
+                return [self.value() for _ in range(self.uint())]
+            case _Tag.DICT:
+                return {self.text(): self.value() for _ in range(self.uint())}
+            case _Tag.FORMAT:
+                return FormatType(self.text())
+            case _Tag.DATE:
+                return dt.date.fromisoformat(self.text())
+            case _Tag.CELL:
+                content = self.value()
+                return TableCell.model_construct(content=content, rowspan=self.uint(), colspan=self.uint())
+            case _Tag.NODE:
+                return self.node()
+            case _:
+                raise ValueError(f"Corrupt CIR file: unknown value tag {tag}")
+
+    def node(self, original_content: str | SourceSpan | None = None) -> NormalisedNode:
+        cls = NODE_TYPES[self.uint()]
+        inline = self.value()
+        fields = {name: self.value() for name in FIELDS[NODE_TYPES.index(cls)]}
+
+        if original_content is None:
+            original_content = inline or ""
+
+        return cls.trusted(original_content=original_content, **fields)
+
+class StringTable:
+    """ Deduplicated strings of a CIR file, decoded on first access """
+    def __init__(self, buffer: bytes | memoryview):
+        (count,) = _LENGTH.unpack_from(buffer, 0)
+
+        self._offsets : memoryview | array      = _cast(buffer[8:8 + 8 * (count + 1)], "q")
+        self._blob    : bytes | memoryview      = buffer[8 + 8 * (count + 1):]
+        self._cache   : dict[int, str]          = {}
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        value = self._cache.get(index)
+
+        if value is None:
+            value = bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8")
+            self._cache[index] = value
+
+        return value
+
+    def release(self) -> None:
+        for view in (self._offsets, self._blob):
+            if isinstance(view, memoryview):
+                view.release()
+
+def dumps(cir: CIRTree | CIRStore, source: str | None = None) -> bytes:
+    """
+    Serialises a CIR to the binary CIR format.
+
+    The file starts with the magic and version, followed by length-prefixed
+    sections: the header nodes (doc class, title, authors, with strings
+    inline so they can be read on their own), the slots of the CIRTree, the
+    deduplicated string table, the node arrays, one record per node and the
+    source the spans point into.
+
+    Args:
+        cir: The tree, or its array-backed store
+        source: The source document, taken from the node spans if None
+
+    Returns:
+        The encoded CIR
+    """
+    store = cir if isinstance(cir, CIRStore) else CIRStore.from_cir(cir, source=source)
+    source = store.source if source is None else source
+
+    header = _Encoder()
+    for slot in ("doc_class", "title"):
+        index = store.slots.get(slot, NONE)
+        header.value(store.node(index) if index != NONE else None)
+    header.value([store.node(index) for index in store.slots.get("authors", [])])
+
+    slots = _Encoder()
+    slots.value({slot: store.slots.get(slot, NONE) for slot in HEADER_SLOTS})
+    slots.value({slot: store.slots.get(slot, []) for slot in HEADER_LISTS})
+
+    strings: dict[str, int] = {}
+    records = _Encoder(strings)
+    offsets = array("q")
+    for index in range(len(store)):
+        offsets.append(len(records.buffer))
+
+        inline = store.inline.get(index) if store.span_start[index] == NONE else None
+        records.node(store.node(index), original_content=inline)
+
+    nodes = _LENGTH.pack(len(store)) + b"".join(
+        _tobytes(getattr(store, name)) for name, _ in _ARRAYS
+    ) + _tobytes(offsets)
+
+    sections = [
+        bytes(header.buffer), bytes(slots.buffer), _string_table(strings), nodes,
+        bytes(records.buffer), (source or "").encode("utf-8"),
+    ]
+
+    return _PREFIX.pack(MAGIC, VERSION) + b"".join(_LENGTH.pack(len(s)) + s for s in sections)
+
+def dump(cir: CIRTree | CIRStore, path: Path | str, source: str | None = None) -> None:
+    """ Writes a CIR to path in the binary CIR format """
+    Path(path).write_bytes(dumps(cir, source=source))
+
+def loads(data: bytes) -> CIRTree:
+    """ Decodes a CIR from bytes produced by `dumps` """
+    return CIRReader(data).to_cir()
+
+def load(path: Path | str) -> CIRTree:
+    """ Reads a CIR from a file written by `dump` """
+    with CIRReader.open(path) as reader:
+        return reader.to_cir()
+
+def read_header(path: Path | str) -> CIRTree:
+    """ Reads only the doc class, title and authors of a CIR file, without touching the body """
+    with open(path, "rb") as f:
+        _check_prefix(f.read(_PREFIX.size))
+
+        (size,) = _LENGTH.unpack(f.read(_LENGTH.size))
+        return _decode_header(f.read(size))
+
+class CIRReader:
+    """
+    Random access to a binary CIR file.
+
+    Built over bytes or, through `open`, over a memory-mapped file: sections
+    are located from their length prefixes, the node arrays are viewed in
+    place and strings and nodes are only decoded when accessed.
+    """
+    def __init__(self, buffer: bytes | memoryview | mmap.mmap):
+        self._mmap    : mmap.mmap | None = buffer if isinstance(buffer, mmap.mmap) else None
+        self._buffer  : memoryview       = memoryview(buffer)
+
+        _check_prefix(bytes(self._buffer[:_PREFIX.size]))
+
+        sections: list[memoryview] = []
+        pos = _PREFIX.size
+        while pos < len(self._buffer):
+            (size,) = _LENGTH.unpack_from(self._buffer, pos)
+            pos += _LENGTH.size
+            sections.append(self._buffer[pos:pos + size])
+            pos += size
+
+        if len(sections) != 6:
+            raise ValueError(f"Corrupt CIR file: expected 6 sections, found {len(sections)}")
+
+        self._header, slots, strings, nodes, self._records, self._source_bytes = sections
+
+        decoder = _Decoder(bytes(slots))
+        self.slots    : dict[str, int | list[int]] = {**decoder.value(), **decoder.value()}
+        self.strings  : StringTable                = StringTable(strings)
+
+        (count,) = _LENGTH.unpack_from(nodes, 0)
+        pos = _LENGTH.size
+        for name, typecode in (*_ARRAYS, ("record", "q")):
+            size = count * array(typecode).itemsize
+            setattr(self, name, _cast(nodes[pos:pos + size], typecode))
+            pos += size
+
+        slots.release()
+        strings.release()
+        nodes.release()
+
+        self._source: str | None = None
+
+    @classmethod
+    def open(cls, path: Path | str) -> 'CIRReader':
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"File {path} not found.")
+
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __enter__(self) -> 'CIRReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self):
+        return len(self.node_type)
+
+    def close(self) -> None:
+        """ Releases the views into the mapped file and unmaps it """
+        if self._mmap is None:
+            return
+
+        views = [getattr(self, name) for name, _ in (*_ARRAYS, ("record", "q"))]
+        views += [self._header, self._records, self._source_bytes, self._buffer]
+        self.strings.release()
+
+        for view in views:
+            if isinstance(view, memoryview):
+                view.release()
+
+        self._mmap.close()
+        self._mmap = None
+
+    @property
+    def source(self) -> str:
+        if self._source is None:
+            self._source = bytes(self._source_bytes).decode("utf-8")
+
+        return self._source
+
+    def header(self) -> CIRTree:
+        """ The doc class, title and authors """
+        return _decode_header(self._header)
+
+    def children(self, index: int) -> Iterator[int]:
+        child = self.first_child[index]
+
+        while child != NONE:
+            yield child
+            child = self.next_sibling[child]
+
+    def node(self, index: int) -> NormalisedNode:
+        """ Decodes the node at index, without its children """
+        span = None
+        if self.span_start[index] != NONE:
+            span = SourceSpan(self.source, self.span_start[index], self.span_end[index])
+
+        return _Decoder(self._records, self.strings, self.record[index]).node(original_content=span)
+
+    def to_store(self) -> CIRStore:
+        """ Rebuilds the array-backed store """
+        store = CIRStore(source=self.source if len(self._source_bytes) else None)
+
+        for index in range(len(self)):
+            parent = self.parent[index]
+            store.add(self.node(index), parent)
+
+        store.slots = dict(self.slots)
+
+        return store
+
+    def to_cir(self) -> CIRTree:
+        """ Materialises the whole CIR """
+        return self.to_store().to_cir()
+
+def _decode_header(buffer: bytes | memoryview) -> CIRTree:
+    decoder = _Decoder(buffer)
+
+    doc_class = decoder.value()
+    title = decoder.value()
+    authors = decoder.value()
+
+    return CIRTree.model_construct(doc_class=doc_class, title=title, authors=authors)
+
+def _check_prefix(prefix: bytes) -> None:
+    if len(prefix) < _PREFIX.size:
+        raise ValueError("Not a CIR file: too short")
+
+    magic, version = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError("Not a CIR file: bad magic")
+    if version > VERSION:
+        raise ValueError(f"Unsupported CIR version {version}, this reader supports up to {VERSION}")
+
+def _string_table(strings: dict[str, int]) -> bytes:
+    blobs = [value.encode("utf-8") for value in strings]
+
+    offsets = array("q", [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    return _LENGTH.pack(len(blobs)) + _tobytes(offsets) + b"".join(blobs)
+
+def _tobytes(values: array) -> bytes:
+    """ Array bytes in little endian, the byte order of the file """
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tobytes()
+
+def _cast(buffer: memoryview, typecode: str) -> memoryview | array:
+    """ Views little endian bytes as an array, copying only on big endian hosts """
+    if sys.byteorder == "big":
+        values = array(typecode, bytes(buffer))
+        values.byteswap()
+        return values
+
+    return buffer.cast(typecode)
@@ -0,0 +1,201 @@
+from array import array
+from typing import Any, Iterator
+
+from core.CIRTree import CIRTree
+from models.normalisation import *
+
+NODE_TYPES: list[type[NormalisedNode]] = [
+    NormalisedNode, Text, Package, DocumentClass, Author, Title, Section, Figure,
+    MathFormula, Table, PendingTable, Abstract, Date, Keywords, Reference, Other,
+]
+
+TYPE_CODES: dict[type[NormalisedNode], int] = {cls: code for code, cls in enumerate(NODE_TYPES)}
+
+FIELDS: list[tuple[str, ...]] = [
+    tuple(name for name in cls.model_fields if name not in ("children", "parent")) for cls in NODE_TYPES
+]
+
+HEADER_SLOTS: tuple[str, ...] = ("doc_class", "title", "abstract", "other", "root")
+HEADER_LISTS: tuple[str, ...] = ("packages", "authors")
+
+NONE: int = -1
+
+class CIRStore:
+    """
+    Array-backed representation of a CIR, used to serialise it.
+
+    The tree structure lives in parallel integer arrays (node type, parent,
+    first child, next sibling); the remaining fields of each node live in one
+    attribute table per node type, with strings interned. Original content is
+    kept as (start, end) offsets into the shared source when the node has a
+    span.
+
+    The store is built from a finished CIR and is not on the conversion
+    path: the normaliser and the table resolver work on pydantic nodes, so a
+    conversion holds the same nodes whether or not a store is built. A stored
+    CIR is read back node by node (`CIRVisitor.visit_store`, `node`,
+    `materialise`) with the trusted constructor, since the data was validated
+    when stored.
+    """
+    def __init__(self, source: str | None = None):
+        self.source       : str | None = source
+
+        self.node_type    : array = array("B")
+        self.parent       : array = array("i")
+        self.first_child  : array = array("i")
+        self.next_sibling : array = array("i")
+        self.span_start   : array = array("q")
+        self.span_end     : array = array("q")
+        self.attr_row     : array = array("i")
+
+        self.attrs        : list[list[tuple]] = [[] for _ in NODE_TYPES]
+        self.inline       : dict[int, str]    = {}
+        self.slots        : dict[str, int | list[int]] = {}
+
+        self._last_child  : array = array("i")
+        self._strings     : dict[str, str] = {}
+
+    def __len__(self):
+        return len(self.node_type)
+
+    @classmethod
+    def from_cir(cls, cir: CIRTree, source: str | None = None) -> 'CIRStore':
+        """ Builds a store holding the header nodes and the body of a CIR """
+        store = cls(source=source)
+
+        for slot in HEADER_SLOTS:
+            node = getattr(cir, slot)
+            store.slots[slot] = store.add(node) if node is not None else NONE
+
+        for slot in HEADER_LISTS:
+            store.slots[slot] = [store.add(node) for node in getattr(cir, slot)]
+
+        return store
+
+    def to_cir(self) -> CIRTree:
+        """ Materialises the stored nodes back into a CIRTree """
+        data: dict[str, Any] = {}
+
+        for slot in HEADER_SLOTS:
+            index = self.slots.get(slot, NONE)
+            data[slot] = self.materialise(index) if index != NONE else None
+
+        for slot in HEADER_LISTS:
+            data[slot] = [self.materialise(index) for index in self.slots.get(slot, [])]
+
+        return CIRTree.model_construct(**data)
+
+    def add(self, node: NormalisedNode, parent: int = NONE) -> int:
+        """ Appends a node and its subtree in document order, returns the index of the node """
+        if self.source is None and node.source_span is not None:
+            self.source = node.source_span.source
+
+        root = NONE
+        stack: list[tuple[NormalisedNode, int]] = [(node, parent)]
+        while stack:
+            current, current_parent = stack.pop()
+
+            index = self._append(current, current_parent)
+            if root == NONE:
+                root = index
+
+            stack.extend((child, index) for child in reversed(current.children))
+
+        return root
+
+    def children(self, index: int) -> Iterator[int]:
+        child = self.first_child[index]
+
+        while child != NONE:
+            yield child
+            child = self.next_sibling[child]
+
+    def walk(self, index: int) -> Iterator[tuple[int, int]]:
+        """ Yields (index, depth) of a subtree in document order """
+        stack: list[tuple[int, int]] = [(index, 0)]
+
+        while stack:
+            current, depth = stack.pop()
+            yield current, depth
+
+            stack.extend(reversed([(child, depth + 1) for child in self.children(current)]))
+
+    def type_of(self, index: int) -> type[NormalisedNode]:
+        return NODE_TYPES[self.node_type[index]]
+
+    def fields(self, index: int) -> dict[str, Any]:
+        code = self.node_type[index]
+
+        return dict(zip(FIELDS[code], self.attrs[code][self.attr_row[index]]))
+
+    def original_content(self, index: int) -> str | SourceSpan:
+        if self.span_start[index] != NONE and self.source is not None:
+            return SourceSpan(self.source, self.span_start[index], self.span_end[index])
+
+        return self.inline.get(index, "")
+
+    def node(self, index: int) -> NormalisedNode:
+        """ Builds the node at index, without its children """
+        return self.type_of(index).trusted(original_content=self.original_content(index), **self.fields(index))
+
+    def materialise(self, index: int) -> NormalisedNode:
+        """ Builds the node at index together with its whole subtree """
+        root = self.node(index)
+
+        stack: list[tuple[int, NormalisedNode]] = [(index, root)]
+        while stack:
+            current, node = stack.pop()
+
+            for child_index in self.children(current):
+                child = self.node(child_index)
+                child.parent = node
+                node.children.append(child)
+
+                stack.append((child_index, child))
+
+        return root
+
+    def _append(self, node: NormalisedNode, parent: int) -> int:
+        index = len(self.node_type)
+        code = TYPE_CODES.get(type(node))
+        if code is None:
+            raise ValueError(f"Unsupported node type: {type(node)}")
+
+        self.node_type.append(code)
+        self.parent.append(parent)
+        self.first_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self._last_child.append(NONE)
+
+        if parent != NONE:
+            last = self._last_child[parent]
+            if last == NONE:
+                self.first_child[parent] = index
+            else:
+                self.next_sibling[last] = index
+            self._last_child[parent] = index
+
+        span = node.source_span
+        if span is not None and span.source is self.source:
+            self.span_start.append(span.start)
+            self.span_end.append(span.end)
+        else:
+            self.span_start.append(NONE)
+            self.span_end.append(NONE)
+            if node.original_content:
+                self.inline[index] = self._intern(node.original_content)
+
+        row = tuple(self._intern(getattr(node, name)) for name in FIELDS[code])
+        self.attr_row.append(len(self.attrs[code]))
+        self.attrs[code].append(row)
+
+        return index
+
+    def _intern(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self._strings.setdefault(value, value)
+
+        if isinstance(value, list) and value and isinstance(value[0], str):
+            return [self._strings.setdefault(item, item) for item in value]
+
+        return value
@@ -0,0 +1,159 @@
+import asyncio
+import contextvars
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from core.CIRTree import CIRTree
+from core.tabular import TabularParse, parse_tabular
+from models.types import ElementType, TableSource
+from models.normalisation import NormalisedNode, PendingTable, Table, TableReport
+from rag.extraction import RAGExtractor
+from rag.pool import ExtractorPool
+
+class TableResolver:
+    """
+    Resolves the PendingTable placeholders of a CIR.
+
+    The Normaliser defers tables when built with `defer_tables=True`. Each
+    placeholder is first given to the native tabular parser; only the tables it
+    is not confident about are dispatched to the extractor, all at once and
+    bounded by `max_workers`. Results are spliced back in document order and
+    the path every table took is recorded in `report`. The extractions of
+    one document share the deadline of the extractor's rate limiter.
+
+    Args:
+        extractor: Extractor shared by all calls. The process-wide pooled one if None.
+        max_workers: Maximum number of extractions in flight
+    """
+    def __init__(self, extractor: RAGExtractor | None = None, max_workers: int = 8):
+        self._extractor  : RAGExtractor | None = extractor
+        self.max_workers : int                 = max_workers
+        self.report      : list[TableReport]   = []
+
+    def resolve(self, cir: CIRTree) -> int:
+        """ Replaces every PendingTable under the CIR root, returns the number of tables """
+        count, fallback = self._plan(cir)
+
+        if fallback:
+            self._extract(fallback)
+
+        self._log()
+
+        return count
+
+    async def aresolve(self, cir: CIRTree) -> int:
+        """
+        Same as `resolve` with async extractions.
+
+        If an extraction fails or the task is cancelled, the extractions still
+        in flight are cancelled.
+        """
+        count, fallback = self._plan(cir)
+
+        if fallback:
+            await self._aextract(fallback)
+
+        self._log()
+
+        return count
+
+    def _plan(self, cir: CIRTree) -> tuple[int, list[tuple[NormalisedNode, int, TableReport]]]:
+        """ Splices every table the native parser is confident about, returns the count and the rest """
+        self.report = []
+
+        if cir.root is None:
+            return 0, []
+
+        pending: list[tuple[NormalisedNode, int]] = self._collect(cir.root)
+        fallback: list[tuple[NormalisedNode, int, TableReport]] = []
+
+        for index, (parent, i) in enumerate(pending):
+            parsed: TabularParse = parse_tabular(parent.children[i].original_content)
+
+            report = TableReport(index=index, source=TableSource.NATIVE,
+                                 confidence=parsed.confidence, reason=parsed.reason)
+            self.report.append(report)
+
+            if parsed.confident:
+                report.label = parsed.table.label
+                self._splice(parent, i, parsed.table)
+            else:
+                report.source = TableSource.LLM
+                fallback.append((parent, i, report))
+
+        return len(pending), fallback
+
+    def _log(self) -> None:
+        for report in self.report:
+            print(f"INFO - table {report.index} ({report.label}): {report.source}"
+                  + (f" [{report.reason}]" if report.reason else ""))
+
+    def _extract(self, fallback: list[tuple[NormalisedNode, int, TableReport]]) -> None:
+        if self._extractor is None:
+            self._extractor = ExtractorPool.default().get()
+
+        with self._document(), ThreadPoolExecutor(max_workers=min(self.max_workers, len(fallback))) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._extractor.extract, ElementType.TABLE,
+                            parent.children[i].original_content, Table)
+                for parent, i, _ in fallback
+            ]
+
+            for (parent, i, report), future in zip(fallback, futures):
+                table: Table = future.result()
+
+                report.label = table.label
+                self._splice(parent, i, table)
+
+    async def _aextract(self, fallback: list[tuple[NormalisedNode, int, TableReport]]) -> None:
+        if self._extractor is None:
+            self._extractor = ExtractorPool.default().get()
+
+        limit = asyncio.Semaphore(self.max_workers)
+
+        async def extract(latex: str) -> Table:
+            async with limit:
+                return await self._extractor.aextract(ElementType.TABLE, latex, Table)
+
+        with self._document():
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(extract(parent.children[i].original_content)) for parent, i, _ in fallback]
+
+        for (parent, i, report), task in zip(fallback, tasks):
+            table: Table = task.result()
+
+            report.label = table.label
+            self._splice(parent, i, table)
+
+    def _document(self):
+        limiter = getattr(self._extractor, "limiter", None)
+
+        return limiter.document() if limiter is not None else nullcontext()
+
+    def _collect(self, root: NormalisedNode) -> list[tuple[NormalisedNode, int]]:
+        """ Finds the (parent, index) of every placeholder in document order """
+        pending: list[tuple[NormalisedNode, int]] = []
+        stack: list[tuple[NormalisedNode, int]] = [(root, i) for i in reversed(range(len(root.children)))]
+
+        while stack:
+            parent, i = stack.pop()
+            child = parent.children[i]
+
+            if isinstance(child, PendingTable):
+                pending.append((parent, i))
+
+            stack.extend((child, j) for j in reversed(range(len(child.children))))
+
+        return pending
+
+    def _splice(self, parent: NormalisedNode, index: int, table: Table) -> None:
+        placeholder: PendingTable = parent.children[index]
+
+        span = placeholder.source_span
+        table.original_content = span if span is not None else placeholder.original_content
+        table.parent = parent
+        table.children = placeholder.children
+        for child in table.children:
+            child.parent = table
+
+        parent.children[index] = table
@@ -0,0 +1,366 @@
+import re
+from pydantic import BaseModel
+
+from models.normalisation import Table, TableCell
+
+CONFIDENCE_THRESHOLD: float = 0.8
+
+# Rule commands and their arguments in order: "[" optional [..], "(" optional (..), "{" required {..}
+RULES: dict[str, str] = {
+    "hline"         : "",
+    "cline"         : "{",
+    "toprule"       : "[",
+    "midrule"       : "[",
+    "bottomrule"    : "[",
+    "cmidrule"      : "[({",
+    "addlinespace"  : "[",
+    "specialrule"   : "{{{",
+    "morecmidrules" : "",
+}
+
+_CLOSING: dict[str, str] = {"[": "]", "(": ")", "{": "}"}
+
+UNSUPPORTED_ENVIRONMENTS: set[str] = {
+    "longtable", "tabularx", "tabulary", "supertabular", "tblr", "array", "verbatim", "lstlisting", "minted",
+}
+
+_BEGIN = re.compile(r"\\begin\s*\{([^}]*)\}")
+_END_TABULAR = re.compile(r"\\end\s*\{tabular\*?\}")
+_COMMAND = re.compile(r"\\([A-Za-z]+)")
+
+class TabularParse(BaseModel):
+    """Result of parsing a table natively"""
+    table       : Table | None = None
+    confidence  : float = 0.0
+    reason      : str | None = None
+
+    @property
+    def confident(self) -> bool:
+        return self.table is not None and self.confidence >= CONFIDENCE_THRESHOLD
+
+class UnsupportedTabular(Exception):
+    """Raised when a table uses constructs the native parser does not handle"""
+
+def parse_tabular(latex: str) -> TabularParse:
+    """
+    Parses a plain `tabular` table into a Table without calling the LLM.
+
+    Handles `&`/`\\\\` grids, rules, `\\multicolumn`, `\\multirow`, `\\caption` and
+    `\\label`. Cells covered by a `\\multirow` from a previous row are dropped so
+    rowspan/colspan follow the usual HTML semantics.
+
+    Args:
+        latex: The LaTeX of a table environment or of a bare tabular
+
+    Returns:
+        The parsed table with a confidence in [0, 1], or no table and the
+        reason it could not be parsed
+    """
+    try:
+        return _TabularParser(latex).parse()
+    except UnsupportedTabular as e:
+        return TabularParse(reason=str(e))
+
+class _TabularParser:
+    def __init__(self, latex: str):
+        self._latex      : str        = _strip_comments(latex)
+        self._confidence : float      = 1.0
+        self._reasons    : list[str]  = []
+
+    def parse(self) -> TabularParse:
+        for env in _BEGIN.findall(self._latex):
+            if env.strip() in UNSUPPORTED_ENVIRONMENTS:
+                raise UnsupportedTabular(f"unsupported environment {env}")
+
+        begins = [m for m in _BEGIN.finditer(self._latex) if m.group(1).strip() in ("tabular", "tabular*")]
+        if not begins:
+            raise UnsupportedTabular("no tabular environment")
+        if len(begins) > 1:
+            raise UnsupportedTabular("nested or multiple tabular environments")
+
+        begin = begins[0]
+        end = _END_TABULAR.search(self._latex, begin.end())
+        if end is None:
+            raise UnsupportedTabular("unterminated tabular")
+
+        pos = begin.end()
+        if begin.group(1).strip() == "tabular*":
+            _, pos = _read_group(self._latex, pos)          # width
+        _, pos = _read_optional(self._latex, pos)          # vertical position
+        spec, pos = _read_group(self._latex, pos)
+        if spec is None:
+            raise UnsupportedTabular("missing column specification")
+
+        columns = _count_columns(spec)
+        rows = self._parse_rows(self._latex[pos:end.start()], columns)
+
+        if not rows:
+            raise UnsupportedTabular("empty tabular")
+
+        outside = self._latex[:begin.start()] + self._latex[end.end():]
+        caption = _find_command(outside, "caption")
+        label = _find_command(outside, "label")
+
+        if caption is not None:
+            caption_label = _find_command(caption, "label")
+            label = label or caption_label
+            caption = re.sub(r"\\label\s*\{[^}]*\}", "", caption).strip()
+
+        table = Table(rows=rows, caption=caption, label=label, original_content=self._latex)
+
+        return TabularParse(
+            table=table,
+            confidence=round(self._confidence, 3),
+            reason="; ".join(self._reasons) or None,
+        )
+
+    def _parse_rows(self, body: str, columns: int) -> list[list[TableCell]]:
+        rows: list[list[TableCell]] = []
+        covered: dict[int, int] = {}      # column -> following rows still spanned by a \multirow
+
+        for raw_row in _split(body, row=True):
+            raw_cells = _split(raw_row, row=False)
+
+            if len(raw_cells) == 1 and not _strip_rules(raw_cells[0]).strip():
+                continue                  # rule-only row
+
+            row: list[TableCell] = []
+            spanned: dict[int, int] = {}
+            column = 0
+
+            for raw in raw_cells:
+                cell = self._parse_cell(raw)
+
+                if column in covered:
+                    if str(cell.content):
+                        raise UnsupportedTabular("content inside a cell covered by \\multirow")
+                    column += cell.colspan
+                    continue
+
+                row.append(cell)
+                if cell.rowspan > 1:
+                    spanned.update({c: cell.rowspan - 1 for c in range(column, column + cell.colspan)})
+                column += cell.colspan
+
+            if column > columns:
+                raise UnsupportedTabular(f"row {len(rows) + 1} has {column} columns, expected {columns}")
+            if column < columns:
+                self._penalise(0.05, f"row {len(rows) + 1} is short")
+
+            rows.append(row)
+            covered = {c: n - 1 for c, n in covered.items() if n > 1} | spanned
+
+        if covered:
+            self._penalise(0.1, "\\multirow spans past the last row")
+
+        return rows
+
+    def _parse_cell(self, raw: str) -> TableCell:
+        text = _strip_rules(raw).strip()
+        rowspan = colspan = 1
+
+        if text.startswith("\\multicolumn"):
+            pos = len("\\multicolumn")
+            span, pos = _read_group(text, pos)
+            _, pos = _read_group(text, pos)
+            content, pos = _read_group(text, pos)
+            if span is None or content is None or not span.strip().isdigit() or text[pos:].strip():
+                raise UnsupportedTabular(f"malformed \\multicolumn: {text}")
+            colspan, text = int(span), content.strip()
+
+        if text.startswith("\\multirow"):
+            pos = len("\\multirow")
+            _, pos = _read_optional(text, pos)
+            span, pos = _read_group(text, pos)
+            _, pos = _read_optional(text, pos)
+            _, pos = _read_group(text, pos)
+            _, pos = _read_optional(text, pos)
+            content, pos = _read_group(text, pos)
+            if span is None or content is None or not span.strip().isdigit() or text[pos:].strip():
+                raise UnsupportedTabular(f"malformed \\multirow: {text}")
+            rowspan, text = int(span), content.strip()
+
+        if "\\multicolumn" in text or "\\multirow" in text or "\\begin" in text or "\\\\" in text:
+            self._penalise(0.3, f"complex cell content: {text[:40]}")
+
+        return TableCell(content=text, rowspan=max(rowspan, 1), colspan=max(colspan, 1))
+
+    def _penalise(self, amount: float, reason: str) -> None:
+        self._confidence -= amount
+        self._reasons.append(reason)
+
+def _strip_comments(latex: str) -> str:
+    return re.sub(r"(?<!\\)%[^\n]*", "", latex)
+
+def _strip_rules(text: str) -> str:
+    """ Removes rule commands, and only the arguments they take, from a cell """
+    out: list[str] = []
+    pos = 0
+
+    while pos < len(text):
+        match = _COMMAND.match(text, pos)
+        if match is None:
+            out.append(text[pos])
+            pos += 1
+            continue
+
+        if match.group(1) not in RULES:
+            out.append(match.group(0))
+            pos = match.end()
+            continue
+
+        pos = match.end()
+        for opening in RULES[match.group(1)]:
+            start = pos
+            while start < len(text) and text[start].isspace():
+                start += 1
+
+            if text[start:start + 1] != opening:
+                continue
+
+            end = _matching(text, start, opening, _CLOSING[opening])
+            if end is None:
+                break
+            pos = end + 1
+
+    return "".join(out)
+
+def _split(text: str, row: bool) -> list[str]:
+    """ Splits on row (\\\\) or cell (&) separators outside of braces """
+    parts: list[str] = []
+    depth = 0
+    start = 0
+    pos = 0
+
+    while pos < len(text):
+        char = text[pos]
+
+        if char == "\\":
+            if text.startswith("\\\\", pos):
+                if row and depth == 0:
+                    parts.append(text[start:pos])
+                    pos += 2
+                    _, pos = _read_optional(text, pos)
+                    start = pos
+                    continue
+                pos += 2
+                continue
+
+            if row and depth == 0 and text.startswith("\\tabularnewline", pos):
+                parts.append(text[start:pos])
+                pos += len("\\tabularnewline")
+                start = pos
+                continue
+
+            pos += 2
+            continue
+
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif char == "&" and not row and depth == 0:
+            parts.append(text[start:pos])
+            start = pos + 1
+
+        pos += 1
+
+    parts.append(text[start:])
+
+    if row and not _strip_rules(parts[-1]).strip():
+        parts.pop()
+
+    return parts
+
+def _matching(text: str, pos: int, open: str, close: str) -> int | None:
+    """ Returns the index of the delimiter closing the one at pos """
+    depth = 0
+
+    while pos < len(text):
+        char = text[pos]
+
+        if char == "\\":
+            pos += 2
+            continue
+        if char == open:
+            depth += 1
+        elif char == close:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+        pos += 1
+
+    return None
+
+def _read_group(text: str, pos: int) -> tuple[str | None, int]:
+    """ Reads a {braced} argument starting at pos, skipping whitespace """
+    start = pos
+    while start < len(text) and text[start].isspace():
+        start += 1
+
+    if start >= len(text) or text[start] != "{":
+        return None, pos
+
+    end = _matching(text, start, "{", "}")
+    if end is None:
+        return None, pos
+
+    return text[start + 1:end], end + 1
+
+def _read_optional(text: str, pos: int) -> tuple[str | None, int]:
+    """ Reads an optional [bracketed] argument starting at pos, skipping whitespace """
+    start = pos
+    while start < len(text) and text[start] in " \t":
+        start += 1
+
+    if start >= len(text) or text[start] != "[":
+        return None, pos
+
+    end = _matching(text, start, "[", "]")
+    if end is None:
+        return None, pos
+
+    return text[start + 1:end], end + 1
+
+def _find_command(text: str, name: str) -> str | None:
+    """ Returns the first required argument of the first \\name in text """
+    match = re.search(rf"\\{name}\s*(\[[^\]]*\])?\s*(?=\{{)", text)
+    if match is None:
+        return None
+
+    content, _ = _read_group(text, match.end())
+
+    return content.strip() if content is not None else None
+
+def _count_columns(spec: str) -> int:
+    """ Counts the columns described by a tabular column specification """
+    columns = 0
+    pos = 0
+
+    while pos < len(spec):
+        char = spec[pos]
+
+        if char in "lcrX":
+            columns += 1
+            pos += 1
+        elif char in "pmb":
+            _, pos = _read_group(spec, pos + 1)
+            columns += 1
+        elif char in "@!><":
+            _, pos = _read_group(spec, pos + 1)
+        elif char == "*":
+            count, pos = _read_group(spec, pos + 1)
+            repeated, pos = _read_group(spec, pos)
+            if count is None or repeated is None or not count.strip().isdigit():
+                raise UnsupportedTabular(f"malformed column specification: {spec}")
+            columns += int(count) * _count_columns(repeated)
+        elif char in "| \t\n":
+            pos += 1
+        else:
+            raise UnsupportedTabular(f"unsupported column type '{char}'")
+
+    if columns == 0:
+        raise UnsupportedTabular(f"no columns in specification: {spec}")
+
+    return columns
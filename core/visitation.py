@@ -1,10 +1,13 @@
 import TexSoup as ts
 from abc import ABC, abstractmethod
-from typing import override, Union
+from itertools import chain
+from typing import override, Union, Iterator, TextIO
 
 from core.CIRTree import CIRTree
+from core.store import CIRStore
 from models.types import FormatType, ElementType
-from normalisation import Normaliser, Denormaliser
+from core.normalisation import Normaliser, Denormaliser
+from utils.extraction import DocumentIndex
 from models.normalisation import *
 
 class Visitor(ABC):
@@ -17,8 +20,9 @@ class Visitor(ABC):
         pass
 
 class ASTVisitor(Visitor):
-    def __init__(self, normaliser: Normaliser):
+    def __init__(self, normaliser: Normaliser, index: DocumentIndex | None = None):
         self._normaliser    : Normaliser            = normaliser
+        self._index         : DocumentIndex | None  = index
         self._cir_tree      : CIRTree | None        = None
         self._curr_node     : NormalisedNode | None = None
 
@@ -46,13 +50,40 @@ class ASTVisitor(Visitor):
             case _:
                 print(f"[WARNING] Unknown node type: {type(node)}")
 
+    def visit_header(self, node: ts.TexNode) -> CIRTree:
+        """ Builds the CIR header and an empty document root, without visiting the body """
+        self._build_header(node)
+
+        self._cir_tree.root = self._normaliser.normalise(self._index.document)
+        self._curr_node = self._cir_tree.root
+
+        return self._cir_tree
+
+    def visit_child(self, node: ts.TexNode, parent: NormalisedNode) -> list[NormalisedNode]:
+        """ Visits one node under parent, returns the nodes appended to parent """
+        self._curr_node = parent
+        before = len(parent.children)
+
+        self.visit(node)
+
+        return parent.children[before:]
+
     def _visit_env(self, node: ts.TexNode):
+        self._build_header(node)
+
+        self.visit(self._index.document)
+
+    def _build_header(self, node: ts.TexNode):
         """ Building cir tree"""
-        doc_class   = self._normaliser.normalise(node.documentclass) if node.documentclass else None
-        title       = self._normaliser.normalise(node.title)         if node.title else None
-        abstract    = self._normaliser.normalise(node.abstract)      if node.abstract else None
-        packages    = [self._normaliser.normalise(_node) for _node in node.find_all('usepackage')]
-        authors     = [self._normaliser.normalise(_node) for _node in node.find_all('author')]
+        if self._index is None:
+            self._index = DocumentIndex(node)
+        index = self._index
+
+        doc_class   = self._normaliser.normalise(index.doc_class) if index.doc_class else None
+        title       = self._normaliser.normalise(index.title)     if index.title else None
+        abstract    = self._normaliser.normalise(index.abstract)  if index.abstract else None
+        packages    = [self._normaliser.normalise(_node) for _node in index.packages]
+        authors     = [self._normaliser.normalise(_node) for _node in index.authors]
 
         self._cir_tree = CIRTree(
             doc_class=doc_class,
@@ -62,8 +93,6 @@ class ASTVisitor(Visitor):
             abstract=abstract,
         )
 
-        self.visit(node.document)
-
     def _visit_named_env(self, node: ts.TexNode):
         if node.name == 'document':
             self._cir_tree.root = self._normaliser.normalise(node)
@@ -77,8 +106,6 @@ class ASTVisitor(Visitor):
             normalised.parent = self._curr_node
             self._curr_node.children.append(normalised)
 
-            self._curr_node = normalised
-
     def _visit_cmd(self, node: ts.TexNode):
         normalised = self._normaliser.normalise(node)
 
@@ -101,31 +128,93 @@ class ASTVisitor(Visitor):
 
 
 class CIRVisitor(Visitor):
-    def __init__(self, denormaliser: Denormaliser, cir: CIRTree):
+    """
+    Denormalises a CIR into LaTeX.
+
+    Fragments are collected in memory for `get`, or, when a `sink` is given,
+    written to it as soon as they are produced so the full document never
+    exists as one string. `iter_document` yields the same text as a generator.
+    """
+    def __init__(self, denormaliser: Denormaliser, cir: CIRTree, sink: TextIO | None = None):
         self._cir_tree      : CIRTree       = cir
         self._denormaliser  : Denormaliser  = denormaliser
-        self._contents      : list[str]     = self._build_preamble()
+        self._sink          : TextIO | None = sink
+        self._separator     : str           = ""
+        self.preamble       : list[str]     = self._build_preamble()
+        self._contents      : list[str]     = []
         # self._ast_tree      : ts.TexSoup | None = None
         # self._curr_node     : ts.TexNode | None = None
 
+        for fragment in self.preamble:
+            self._emit(fragment)
+
     @override
     def visit(self, node: NormalisedNode):
+        for fragment in self.fragments(node):
+            self._emit(fragment)
+
+    def visit_store(self, store: CIRStore, index: int):
+        """ Visits a subtree of a CIRStore, building one node at a time """
+        for fragment in self._store_fragments(store, index):
+            self._emit(fragment)
+
+    def iter_document(self, node: NormalisedNode) -> Iterator[str]:
+        """ Yields the document in chunks which, joined, equal `get()` after `visit(node)` """
+        separator = ""
+
+        for fragment in chain(self.preamble, self.fragments(node)):
+            if separator:
+                yield separator
+            yield fragment
+
+            separator = "\n"
+
+    @override
+    def get(self):
+        if self._sink is not None:
+            raise ValueError("The document was streamed to the sink")
+
+        return "\n".join(self._contents)
+
+    def _emit(self, fragment: str):
+        if self._sink is None:
+            self._contents.append(fragment)
+            return
+
+        self._sink.write(self._separator)
+        self._sink.write(fragment)
+        self._separator = "\n"
+
+    def fragments(self, node: NormalisedNode) -> Iterator[str]:
+        """ Yields the denormalised fragments of a subtree, without the preamble """
         if isinstance(node, Other) and node.name == "document":
-            self._contents.append("\\begin{document}\n")
+            yield "\\begin{document}\n"
 
             for child in node.children:
-                self.visit(child)
+                yield from self.fragments(child)
 
-            self._contents.append("\\end{document}\n")
+            yield "\\end{document}\n"
         else:
-            self._contents.append(self._denormaliser.denormalise(node))
+            yield self._denormaliser.denormalise(node)
 
             for child in node.children:
-                self.visit(child)
+                yield from self.fragments(child)
 
-    @override
-    def get(self):
-        return "\n".join(self._contents)
+    def _store_fragments(self, store: CIRStore, index: int) -> Iterator[str]:
+        node = store.node(index)
+
+        if isinstance(node, Other) and node.name == "document":
+            yield "\\begin{document}\n"
+
+            for child in store.children(index):
+                yield from self._store_fragments(store, child)
+
+            yield "\\end{document}\n"
+        else:
+            yield self._denormaliser.denormalise(node)
+
+            for child in store.children(index):
+                yield from self._store_fragments(store, child)
 
     def _build_preamble(self) -> list[str]:
         preamble: list[str] = []
@@ -133,14 +222,16 @@ class CIRVisitor(Visitor):
         if self._cir_tree.doc_class is not None:
             preamble.append(self._denormaliser.denormalise(self._cir_tree.doc_class))
 
+        # Packages follow the class directly so the two can be dumped into one format
+        # preamble.extend([self._denormaliser.denormalise(p) for p in self._cir_tree.packages])
+        preamble.extend([p.render() for p in self._denormaliser.format.packages])
+
         if self._cir_tree.title is not None:
             preamble.append(self._denormaliser.denormalise(self._cir_tree.title))
 
         if self._cir_tree.abstract is not None:
             preamble.append(self._denormaliser.denormalise(self._cir_tree.abstract))
 
-        # preamble.extend([self._denormaliser.denormalise(p) for p in self._cir_tree.packages])
-        preamble.extend([p.render() for p in self._denormaliser.format.packages])
         preamble.extend([self._denormaliser.denormalise(p) for p in self._cir_tree.authors])
 
         return preamble
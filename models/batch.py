@@ -0,0 +1,77 @@
+from pathlib import Path
+from pydantic import BaseModel, Field
+
+from models.types import FormatType
+
+class ConversionJob(BaseModel):
+    """A single source document to convert"""
+    source      : Path
+    to_format   : FormatType
+    output      : Path | None = None
+
+class ConversionResult(BaseModel):
+    """Outcome of converting one ConversionJob"""
+    index       : int
+    job         : ConversionJob
+    tex         : str | None = None
+    error       : str | None = None
+    size        : int = 0
+    elapsed     : float = 0.0
+    worker      : int | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class BatchSummary(BaseModel):
+    """Throughput summary of a batch conversion"""
+    total       : int = 0
+    succeeded   : int = 0
+    failed      : int = 0
+    input_bytes : int = 0
+    busy        : float = 0.0
+    elapsed     : float = 0.0
+    workers     : set[int] = Field(default_factory=set)
+
+    def add(self, result: ConversionResult) -> None:
+        if result.ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+        self.input_bytes += result.size
+        self.busy += result.elapsed
+
+        if result.worker is not None:
+            self.workers.add(result.worker)
+
+    @property
+    def docs_per_second(self) -> float:
+        return (self.succeeded + self.failed) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.input_bytes / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"BatchSummary(\n"
+            f"    documents={self.succeeded + self.failed}/{self.total},\n"
+            f"    succeeded={self.succeeded},\n"
+            f"    failed={self.failed},\n"
+            f"    elapsed={self.elapsed:.2f}s,\n"
+            f"    throughput={self.docs_per_second:.2f} docs/s ({self.bytes_per_second / 1024:.1f} KiB/s),\n"
+            f"    worker_processes={len(self.workers)}\n"
+            f")"
+        )
+
+class IncrementalResult(BaseModel):
+    """Outcome of an incremental re-conversion"""
+    tex         : str
+    recomputed  : int = 0
+    reused      : int = 0
+    elapsed     : float = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.recomputed + self.reused
@@ -0,0 +1,57 @@
+from pydantic import BaseModel, Field
+
+class CorpusSpec(BaseModel):
+    """Shape of a synthetic document, see `benchmarks.corpus.generate`"""
+    sections    : int = 4
+    paragraphs  : int = 3
+    tables      : int = 1
+    figures     : int = 1
+    equations   : int = 2
+    depth       : int = 1
+    seed        : int = 0
+
+    def scaled(self, factor: int) -> 'CorpusSpec':
+        """ The same document with `factor` times as many sections, tables, figures and equations """
+        return self.model_copy(update={
+            "sections"  : self.sections * factor,
+            "tables"    : self.tables * factor,
+            "figures"   : self.figures * factor,
+            "equations" : self.equations * factor,
+        })
+
+class StageTiming(BaseModel):
+    """Timings of one pipeline stage over the repeats of a case"""
+    stage       : str
+    runs        : list[float] = Field(default_factory=list)
+    peak_memory : int | None = None
+    error       : str | None = None
+
+    @property
+    def best(self) -> float:
+        return min(self.runs) if self.runs else 0.0
+
+    @property
+    def median(self) -> float:
+        runs = sorted(self.runs)
+        return runs[len(runs) // 2] if runs else 0.0
+
+class BenchmarkCase(BaseModel):
+    """One document run through the pipeline"""
+    name        : str
+    size        : int
+    spec        : CorpusSpec | None = None
+    stages      : list[StageTiming] = Field(default_factory=list)
+
+    def stage(self, name: str) -> StageTiming | None:
+        return next((stage for stage in self.stages if stage.stage == name), None)
+
+class BenchmarkRun(BaseModel):
+    """A complete benchmark run, stored as JSON so runs can be compared"""
+    started     : str
+    python      : str
+    platform    : str
+    revision    : str | None = None
+    engine      : str | None = None
+    llm_backend : str | None = None
+    repeat      : int = 1
+    cases       : list[BenchmarkCase] = Field(default_factory=list)
@@ -0,0 +1,107 @@
+from pathlib import Path
+from pydantic import BaseModel, Field, model_validator
+
+from models.types import PassKind, DiagnosticKind, CompileStatus
+
+class ResourceLimits(BaseModel):
+    """
+    Limits applied to every pdflatex/bibtex process of a job.
+
+    `timeout` is wall-clock seconds, `cpu_time` CPU seconds (RLIMIT_CPU) and
+    `memory` bytes of address space (RLIMIT_AS). None disables a limit.
+    """
+    timeout     : float | None = 120.0
+    cpu_time    : int | None = 60
+    memory      : int | None = 2 * 1024 * 1024 * 1024
+
+class CompileJob(BaseModel):
+    """
+    A LaTeX document to compile in an isolated workspace.
+
+    Either `tex` (the document itself) or `source` (a .tex file) is given.
+    `resources` is a directory searched for \\input files, images and .bib
+    files; it defaults to the directory of `source`. With `dump_preamble`
+    the class and packages are loaded from a cached format dump, with
+    `use_cache` an unchanged document reuses its previous PDF.
+    """
+    tex           : str | None = None
+    source        : Path | None = None
+    resources     : Path | None = None
+    name          : str = "document"
+    use_bibtex    : bool = False
+    dump_preamble : bool = True
+    use_cache     : bool = True
+    max_errors    : int | None = 20
+    limits        : ResourceLimits = Field(default_factory=ResourceLimits)
+    output        : Path | None = None
+
+    @model_validator(mode="after")
+    def _check_input(self) -> 'CompileJob':
+        if (self.tex is None) == (self.source is None):
+            raise ValueError("A CompileJob needs exactly one of `tex` or `source`")
+
+        return self
+
+class Diagnostic(BaseModel):
+    """A structured error or warning from a compilation log"""
+    kind        : DiagnosticKind
+    message     : str
+    file        : str | None = None
+    line        : int | None = None
+    tool        : PassKind = PassKind.LATEX
+
+    def __str__(self):
+        location = f"{self.file or '?'}:{self.line}" if self.line is not None else (self.file or self.tool.value)
+        return f"{location}: {self.kind.value}: {self.message}"
+
+class CompileResult(BaseModel):
+    """Outcome of compiling one CompileJob"""
+    index       : int = 0
+    job         : CompileJob
+    pdf         : bytes | None = None
+    pdf_path    : Path | None = None
+    log         : str = ""
+    diagnostics : list[Diagnostic] = Field(default_factory=list)
+    passes      : int = 0
+    status      : CompileStatus = CompileStatus.OK
+    cached      : bool = False
+    elapsed     : float = 0.0
+    error       : str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class CompilePass(BaseModel):
+    """A single tool invocation planned by the PassScheduler"""
+    kind        : PassKind
+    command     : list[str]
+    cwd         : Path
+    draft       : bool = False
+    number      : int = 1
+
+class ToolInfo(BaseModel):
+    """An executable of the TeX distribution"""
+    name        : str
+    path        : str
+    version     : str = ""
+    mtime       : float = 0.0
+
+class Toolchain(BaseModel):
+    """The TeX executables found on PATH, and the files kpsewhich located with them"""
+    key          : str
+    tools        : dict[str, ToolInfo] = Field(default_factory=dict)
+    distribution : str | None = None
+    files        : dict[str, str] = Field(default_factory=dict)
+
+    def has(self, name: str) -> bool:
+        return name in self.tools
+
+    def version(self, name: str) -> str:
+        return self.tools[name].version if name in self.tools else ""
+
+    def require(self, *names: str) -> None:
+        """ Raises if any of the executables is missing """
+        for name in names:
+            if name not in self.tools:
+                raise Exception(f"{name} not found. Please install it.")
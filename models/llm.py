@@ -0,0 +1,76 @@
+from pathlib import Path
+from pydantic import BaseModel, Field
+
+from models.types import LLMBackendType
+
+DEFAULT_MODEL: str = "meta-llama/llama-4-maverick-17b-128e-instruct"
+
+class RateLimits(BaseModel):
+    """
+    Client-side budget of the provider account, see `rag.limits.RateLimiter`.
+
+    The defaults are conservative, raise them to the limits of the account.
+    At most `burst` seconds worth of either budget is spent at once.
+    The number of calls in flight starts at `concurrency` and adapts between
+    `min_concurrency` and `max_concurrency`. Failed calls are retried up to
+    `max_retries` times, backing off from `backoff_base` up to `backoff_cap`
+    seconds, as long as the document's `deadline` (seconds) allows.
+    """
+    requests_per_minute : float = 30.0
+    tokens_per_minute   : float = 6000.0
+    burst               : float = 10.0
+    concurrency         : int = 4
+    min_concurrency     : int = 1
+    max_concurrency     : int = 32
+    latency_tolerance   : float = 3.0
+    max_retries         : int = 6
+    backoff_base        : float = 0.5
+    backoff_cap         : float = 30.0
+    deadline            : float = 300.0
+
+class LLMConfig(BaseModel):
+    """
+    Model and connection settings shared by every extractor of a process.
+
+    `api_key` defaults to GROQ_API_KEY. Connections are kept alive for
+    `keepalive_expiry` seconds, at most `max_keepalive` of them idle.
+
+    `backend` records completions as cassettes in `cassettes` or replays
+    them from there, see `rag.backends`. A replayed completion takes
+    `replay_latency` seconds, the latency it was recorded with if None.
+    """
+    model            : str = DEFAULT_MODEL
+    temperature      : float = 0.0
+    api_key          : str | None = None
+    api_base         : str = "https://api.groq.com/openai/v1"
+    timeout          : float = 60.0
+    max_connections  : int = 32
+    max_keepalive    : int = 16
+    keepalive_expiry : float = 120.0
+    limits           : RateLimits = Field(default_factory=RateLimits)
+    backend          : LLMBackendType = LLMBackendType.GROQ
+    cassettes        : Path | None = None
+    replay_latency   : float | None = None
+
+class PoolStats(BaseModel):
+    """HTTP connection reuse of an ExtractorPool"""
+    requests    : int = 0
+    connections : int = 0
+    handshakes  : int = 0
+    extractors  : int = 0
+
+    @property
+    def reused(self) -> int:
+        return max(0, self.requests - self.connections)
+
+    @property
+    def reuse_rate(self) -> float:
+        return self.reused / self.requests if self.requests else 0.0
+
+class LimiterStats(BaseModel):
+    """Calls made through a RateLimiter and how they went"""
+    calls       : int = 0
+    retries     : int = 0
+    throttled   : int = 0
+    failures    : int = 0
+    concurrency : float = 0.0
@@ -1,16 +1,77 @@
 from typing import Optional, Any, List
 
 import datetime as dt
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, GetJsonSchemaHandler, computed_field
 
-from models.types import FormatType
+from models.types import FormatType, TableSource
+
+class SourceSpan:
+    """
+    A (start, end) slice of the shared source buffer.
+
+    Every span of a document references the same source string, so storing a
+    node's original content costs two integers instead of a copy of its subtree.
+    """
+    __slots__ = ("source", "start", "end")
+
+    def __init__(self, source: str, start: int, end: int):
+        self.source : str = source
+        self.start  : int = start
+        self.end    : int = end
+
+    def __str__(self):
+        return self.source[self.start:self.end]
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"SourceSpan({self.start}, {self.end})"
 
 class NormalisedNode(BaseModel):
     """Base class for normalized elements"""
-    original_content: str
-
     children: list['NormalisedNode'] = Field(default_factory=list)
-    parent: Optional['NormalisedNode'] = None
+    parent: Optional['NormalisedNode'] = Field(default=None, exclude=True, repr=False)
+
+    _source: str | SourceSpan = PrivateAttr(default="")
+
+    def __init__(self, original_content: str | SourceSpan, **data):
+        super().__init__(**data)
+        self._source = original_content
+
+    @classmethod
+    def trusted(cls, original_content: str | SourceSpan = "", **data) -> 'NormalisedNode':
+        """Builds a node from already valid data, skipping validation"""
+        node = cls.model_construct(**data)
+        node._source = original_content
+
+        return node
+
+    @computed_field
+    @property
+    def original_content(self) -> str:
+        """The LaTeX the node was built from, sliced from the source on access"""
+        return str(self._source)
+
+    @original_content.setter
+    def original_content(self, value: str | SourceSpan) -> None:
+        self._source = value
+
+    @property
+    def source_span(self) -> SourceSpan | None:
+        return self._source if isinstance(self._source, SourceSpan) else None
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, core_schema, handler: GetJsonSchemaHandler) -> dict[str, Any]:
+        """Lists original_content as the required input it is, computed fields only show in serialisation"""
+        json_schema = handler(core_schema)
+        if handler.mode == "validation":
+            schema = handler.resolve_ref_schema(json_schema)
+            schema["properties"] = {"original_content": {"title": "Original Content", "type": "string"},
+                                    **schema["properties"]}
+            schema["required"] = ["original_content", *schema.get("required", [])]
+
+        return json_schema
 
 
     def __str__(self):
@@ -87,6 +148,17 @@ class Table(NormalisedNode):
     caption : Optional[str] = None
     content : Optional[str] = None
     label   : Optional[str] = None
+
+class PendingTable(NormalisedNode):
+    """Table awaiting extraction, replaced by a Table once resolved"""
+
+class TableReport(BaseModel):
+    """Which path a table took through normalisation"""
+    index       : int
+    source      : TableSource
+    label       : str | None = None
+    confidence  : float = 0.0
+    reason      : str | None = None
 #------------------------------
 
 class Abstract(NormalisedNode):
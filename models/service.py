@@ -0,0 +1,53 @@
+from pydantic import BaseModel, Field, model_validator
+
+from models.types import FormatType, JobState
+from models.compile import Diagnostic
+
+class ServiceRequest(BaseModel):
+    """
+    A job posted to the conversion service.
+
+    With `to_format` the document is converted, with `compile` the result
+    (or the document itself when there is no `to_format`) is compiled to PDF.
+    """
+    tex         : str
+    to_format   : FormatType | None = None
+    compile     : bool = False
+    use_bibtex  : bool = False
+
+    @model_validator(mode="after")
+    def _check_work(self) -> 'ServiceRequest':
+        if self.to_format is None and not self.compile:
+            raise ValueError("A ServiceRequest needs a `to_format`, `compile` or both")
+
+        return self
+
+class ServiceOutput(BaseModel):
+    """What a worker process returns for a ServiceRequest"""
+    tex         : str | None = None
+    pdf         : bytes | None = None
+    diagnostics : list[Diagnostic] = Field(default_factory=list)
+    error       : str | None = None
+    worker      : int | None = None
+
+class ServiceJob(BaseModel):
+    """A job tracked by the conversion service"""
+    id          : str
+    request     : ServiceRequest
+    state       : JobState = JobState.QUEUED
+    output      : ServiceOutput | None = None
+    submitted   : float = 0.0
+    started     : float | None = None
+    finished    : float | None = None
+
+    def status(self) -> dict:
+        """ The JSON served by GET /jobs/<id> """
+        return {
+            "id"        : self.id,
+            "state"     : self.state.value,
+            "submitted" : self.submitted,
+            "started"   : self.started,
+            "finished"  : self.finished,
+            "error"     : self.output.error if self.output is not None else None,
+            "has_pdf"   : self.output is not None and self.output.pdf is not None,
+        }
@@ -61,3 +61,41 @@ class ElementType(StrEnum):
     TEXT            : str = "text"
 
     OTHER           : str = "other"
+
+class TableSource(StrEnum):
+    """How a table was turned into a normalised Table"""
+    NATIVE          : str = "native"
+    LLM             : str = "llm"
+
+class PassKind(StrEnum):
+    """Tool run by a compilation pass"""
+    LATEX           : str = "pdflatex"
+    BIBTEX          : str = "bibtex"
+
+class DiagnosticKind(StrEnum):
+    """Severity of a message in a pdflatex or bibtex log"""
+    FATAL           : str = "fatal"
+    ERROR           : str = "error"
+    WARNING         : str = "warning"
+    BADBOX          : str = "badbox"
+
+class CompileStatus(StrEnum):
+    """Outcome of a compilation"""
+    OK              : str = "ok"
+    FAILED          : str = "failed"
+    ABORTED         : str = "aborted"
+    TIMEOUT         : str = "timeout"
+    KILLED          : str = "killed"
+
+class JobState(StrEnum):
+    """Lifecycle of a job submitted to the conversion service"""
+    QUEUED          : str = "queued"
+    RUNNING         : str = "running"
+    DONE            : str = "done"
+    FAILED          : str = "failed"
+
+class LLMBackendType(StrEnum):
+    """Where the completions of the extractors come from"""
+    GROQ            : str = "groq"
+    RECORD          : str = "record"
+    REPLAY          : str = "replay"
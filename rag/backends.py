@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import datetime
+import threading
+import dotenv
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable
+
+from models.types import LLMBackendType
+from models.llm import LLMConfig
+from utils.cache import CACHE_DIR
+
+CASSETTE_DIR: Path = CACHE_DIR / "cassettes"
+
+class LLMBackend(ABC):
+    """
+    Source of the completions of an extractor.
+
+    `remote` backends call the provider and go through the rate limiter,
+    the others answer locally.
+    """
+    remote: bool = True
+
+    def __init__(self, model: str, temperature: float):
+        self.model       : str   = model
+        self.temperature : float = temperature
+
+    @abstractmethod
+    def complete(self, prompt: str) -> str:
+        """Returns the completion of a prompt"""
+        pass
+
+    @abstractmethod
+    async def acomplete(self, prompt: str) -> str:
+        """Same as `complete` without blocking the event loop"""
+        pass
+
+class GroqBackend(LLMBackend):
+    """
+    Completions from the Groq API, through llama_index.
+
+    An asyncio client only works on the event loop it was first used on,
+    so async completions go through one Groq client per running loop, built
+    on the HTTP client `async_http_client` returns for that loop.
+
+    Args:
+        async_http_client: Returns the httpx.AsyncClient of the running loop, a new one per loop if None
+        **kwargs: Options of the Groq client
+
+    Raises:
+        ValueError: If there is no API key
+    """
+    def __init__(self, model: str, temperature: float, api_key: str | None,
+                 api_base: str = "https://api.groq.com/openai/v1",
+                 async_http_client: Callable[[], Any] | None = None, **kwargs):
+        from llama_index.llms.groq import Groq
+
+        super().__init__(model, temperature)
+
+        if api_key is None:
+            raise ValueError("GROQ_API_KEY environment variable not set.")
+
+        self._options           : dict[str, Any] = dict(model=model, api_key=api_key, api_base=api_base,
+                                                        temperature=temperature, **kwargs)
+        self._async_http_client : Callable[[], Any] | None = async_http_client
+        self._async_llms        : dict[asyncio.AbstractEventLoop, Any] = {}
+        self._lock              : threading.Lock = threading.Lock()
+
+        self.llm = Groq(**self._options)
+
+    def complete(self, prompt: str) -> str:
+        return str(self.llm.complete(prompt))
+
+    async def acomplete(self, prompt: str) -> str:
+        return str(await self._async_llm().acomplete(prompt))
+
+    def _async_llm(self):
+        from llama_index.llms.groq import Groq
+
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            for closed in [other for other in self._async_llms if other.is_closed()]:
+                del self._async_llms[closed]
+
+            llm = self._async_llms.get(loop)
+            if llm is None:
+                client = self._async_http_client() if self._async_http_client is not None else None
+                llm = self._async_llms[loop] = Groq(**self._options, async_http_client=client)
+
+        return llm
+
+class RecordingBackend(LLMBackend):
+    """
+    Passes completions through to another backend and records each as a cassette.
+
+    A cassette is a JSON file in `directory` named after `cassette_key`,
+    holding the response and the latency it was served with. Recording the
+    same prompt again replaces it.
+    """
+    def __init__(self, inner: LLMBackend, directory: Path | str = CASSETTE_DIR):
+        super().__init__(inner.model, inner.temperature)
+
+        self.inner     : LLMBackend = inner
+        self.directory : Path       = Path(directory)
+        self.remote    : bool       = inner.remote
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def complete(self, prompt: str) -> str:
+        start = time.perf_counter()
+        response = self.inner.complete(prompt)
+        self._record(prompt, response, time.perf_counter() - start)
+
+        return response
+
+    async def acomplete(self, prompt: str) -> str:
+        start = time.perf_counter()
+        response = await self.inner.acomplete(prompt)
+        self._record(prompt, response, time.perf_counter() - start)
+
+        return response
+
+    def _record(self, prompt: str, response: str, latency: float) -> None:
+        key = cassette_key(self.model, self.temperature, prompt)
+        path = self.directory / f"{key}.json"
+
+        cassette = {
+            "key"         : key,
+            "model"       : self.model,
+            "temperature" : self.temperature,
+            "prompt"      : prompt,
+            "response"    : response,
+            "latency"     : latency,
+            "recorded"    : datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+
+        # Written aside and renamed so concurrent extractions never read half a cassette
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(cassette, indent=2), encoding="utf-8")
+        tmp.replace(path)
+
+class ReplayBackend(LLMBackend):
+    """
+    Serves recorded cassettes, offline and without an API key.
+
+    Every answer takes `latency` seconds, or the latency it was recorded
+    with if None, so throughput measured on replay is reproducible.
+    Cassettes are read once and kept in memory.
+
+    Raises:
+        FileNotFoundError: On a prompt which was never recorded
+    """
+    remote = False
+
+    def __init__(self, model: str, temperature: float, directory: Path | str = CASSETTE_DIR,
+                 latency: float | None = None):
+        super().__init__(model, temperature)
+
+        self.directory : Path         = Path(directory)
+        self.latency   : float | None = latency
+
+        self._loaded   : dict[str, tuple[str, float]] = {}
+        self._lock     : threading.Lock               = threading.Lock()
+
+    def complete(self, prompt: str) -> str:
+        response, latency = self._load(prompt)
+        time.sleep(latency)
+
+        return response
+
+    async def acomplete(self, prompt: str) -> str:
+        response, latency = self._load(prompt)
+        await asyncio.sleep(latency)
+
+        return response
+
+    def _load(self, prompt: str) -> tuple[str, float]:
+        key = cassette_key(self.model, self.temperature, prompt)
+
+        with self._lock:
+            loaded = self._loaded.get(key)
+
+        if loaded is None:
+            path = self.directory / f"{key}.json"
+            if not path.exists():
+                raise FileNotFoundError(f"No cassette {path.name} in {self.directory}, "
+                                        f"record it with TEXMORPH_LLM_BACKEND={LLMBackendType.RECORD}")
+
+            cassette = json.loads(path.read_text(encoding="utf-8"))
+            loaded = (cassette["response"], cassette["latency"])
+
+            with self._lock:
+                self._loaded[key] = loaded
+
+        response, recorded = loaded
+
+        return response, self.latency if self.latency is not None else recorded
+
+def cassette_key(model: str, temperature: float, prompt: str) -> str:
+    payload = json.dumps([model, float(temperature), prompt])
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def load_config(**overrides) -> LLMConfig:
+    """
+    LLMConfig from the environment and .env, `overrides` taking precedence.
+
+    GROQ_API_KEY, TEXMORPH_LLM_BACKEND (groq, record or replay),
+    TEXMORPH_CASSETTES (cassette directory) and TEXMORPH_REPLAY_LATENCY
+    (seconds per replayed completion) are read.
+    """
+    dotenv.load_dotenv()
+
+    env = {
+        "api_key"        : os.getenv("GROQ_API_KEY"),
+        "backend"        : os.getenv("TEXMORPH_LLM_BACKEND"),
+        "cassettes"      : os.getenv("TEXMORPH_CASSETTES"),
+        "replay_latency" : os.getenv("TEXMORPH_REPLAY_LATENCY"),
+    }
+
+    return LLMConfig(**{**{name: value for name, value in env.items() if value}, **overrides})
+
+def create_backend(config: LLMConfig, model: str | None = None, temperature: float | None = None,
+                   **client_kwargs) -> LLMBackend:
+    """
+    Builds the backend `config` selects.
+
+    Args:
+        config: Backend, credentials and cassette settings
+        model: Model to use, the configured one if None
+        temperature: Temperature to use, the configured one if None
+        **client_kwargs: Options passed to GroqBackend, unused on replay
+    """
+    model = model or config.model
+    temperature = config.temperature if temperature is None else temperature
+    directory = config.cassettes or CASSETTE_DIR
+
+    if config.backend == LLMBackendType.REPLAY:
+        return ReplayBackend(model, temperature, directory, config.replay_latency)
+
+    backend = GroqBackend(model, temperature, config.api_key, config.api_base, timeout=config.timeout,
+                          **client_kwargs)
+
+    if config.backend == LLMBackendType.RECORD:
+        backend = RecordingBackend(backend, directory)
+
+    return backend
@@ -0,0 +1,54 @@
+import re
+import json
+import hashlib
+from pathlib import Path
+from typing import Type
+
+from pydantic import BaseModel
+
+from utils.cache import CACHE_DIR, DiskCache
+
+_COMMENT    = re.compile(r"(?<!\\)%.*")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalise_latex(latex: str) -> str:
+    """ Strips comments and collapses whitespace so cosmetic edits keep the same key """
+    return _WHITESPACE.sub(" ", _COMMENT.sub("", latex)).strip()
+
+class ExtractionCache(DiskCache):
+    """
+    Content-addressed cache of LLM extraction results.
+
+    Entries are keyed on the normalised LaTeX, the target schema, the model
+    name, the temperature and the prompt version, and are tagged with the
+    prompt version so a prompt change can drop its stale entries.
+    """
+    _default: 'ExtractionCache | None' = None
+
+    def __init__(self, path: Path | str = CACHE_DIR / "extraction.sqlite", **kwargs):
+        super().__init__(path, **kwargs)
+
+    @classmethod
+    def default(cls) -> 'ExtractionCache':
+        """ Returns the process-wide cache in CACHE_DIR """
+        if cls._default is None:
+            cls._default = cls()
+
+        return cls._default
+
+    @staticmethod
+    def key(latex: str, cls: Type[BaseModel], llm_model: str, temperature: float, prompt_version: str) -> str:
+        payload = json.dumps(
+            [normalise_latex(latex), cls.model_json_schema(), llm_model, temperature, prompt_version],
+            sort_keys=True,
+        )
+
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> dict | None:
+        value = self.get(key)
+
+        return json.loads(value) if value is not None else None
+
+    def store(self, key: str, data: dict, prompt_version: str) -> None:
+        self.set(key, json.dumps(data).encode("utf-8"), tag=prompt_version)
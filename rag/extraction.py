@@ -1,17 +1,23 @@
-from llama_index.llms.groq import Groq
-from llama_index.core.prompts import RichPromptTemplate
-from llama_index.core import Settings
-
-import os
-import dotenv
 import json
 
-from typing import Type
+from functools import lru_cache
+from typing import Type, TYPE_CHECKING
 from models.normalisation import NormalisedNode
 
 from models.types import ElementType
+from models.llm import DEFAULT_MODEL
+from rag.cache import ExtractionCache
+from rag.limits import RateLimiter, estimate_tokens
+from rag.backends import LLMBackend, create_backend, load_config
+from utils.tracing import span, Span
+
+# llama_index takes seconds to import, it is only imported once an extractor is built
+if TYPE_CHECKING:
+    from llama_index.core.prompts import RichPromptTemplate
+
+PROMPT_VERSION = "1"
 
-PROMPT = RichPromptTemplate(r"""
+PROMPT_TEXT = r"""
 Convert the following {{ block_type }} LaTeX block of code to a JSON object that can be parsed by Python's json.loads() function.
 
 IMPORTANT REQUIREMENTS:
@@ -33,32 +39,110 @@ LaTeX: \alpha
 JSON: {"formula": "\\\\alpha"}
 
 RETURN ONLY VALID JSON DATA WITH NO SURROUNDING TEXT:
-""")
+"""
 
-class RAGExtractor:
-    def __init__(self, llm_model: str = "meta-llama/llama-4-maverick-17b-128e-instruct", embed_model: str = None, temperature: float=0):
-        dotenv.load_dotenv()
-        api_key = os.getenv("GROQ_API_KEY")
-        assert api_key is not None, "GROQ_API_KEY environment variable not set."
+@lru_cache(maxsize=1)
+def prompt_template() -> 'RichPromptTemplate':
+    from llama_index.core.prompts import RichPromptTemplate
+
+    return RichPromptTemplate(PROMPT_TEXT)
 
-        Settings.llm = Groq(model=llm_model, api_key=api_key, temperature=temperature)
+def __getattr__(name: str):
+    # PROMPT used to be built at import time, it is now built on first access
+    if name == "PROMPT":
+        return prompt_template()
 
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class RAGExtractor:
+    """
+    Extracts normalised nodes from LaTeX blocks with an LLM.
+
+    Prefer `rag.pool.ExtractorPool.default().get()`, which shares one
+    extractor and its HTTP connections across the process. Completions
+    come from `backend`, by default the one the environment selects (see
+    `rag.backends.load_config`); an injected backend needs no API key.
+    With a `limiter` every call goes through its rate limits and retries.
+    """
+    def __init__(self, llm_model: str = DEFAULT_MODEL, embed_model: str = None, temperature: float=0,
+                 cache: ExtractionCache | bool = True, backend: LLMBackend | None = None,
+                 limiter: RateLimiter | None = None):
+        if backend is None:
+            backend = create_backend(load_config(), llm_model, temperature)
+
+        self.backend = backend
+        self.limiter = limiter
         self.llm_model = llm_model
         self.embed_model = embed_model
+        self.temperature = temperature
+
+        if cache is True:
+            cache = ExtractionCache.default()
+        self.cache: ExtractionCache | None = cache or None
 
     def extract(self, block_type: ElementType, latex: str, cls: Type[NormalisedNode]) -> NormalisedNode:
-        prompt = PROMPT.format(block_type=block_type, schema=cls.model_json_schema(), latex=latex)
+        with span("extract", model=self.llm_model, block=str(block_type)) as current:
+            key, cached = self._lookup(latex, cls)
+            _label(current, cached)
+            if cached is not None:
+                return cached
+
+            prompt = self._prompt(block_type, latex, cls)
+
+            print(f"INFO - {self.llm_model} call")
+            if self.limiter is not None:
+                # The JSON answer is about as long as the block itself
+                response = self.limiter.call(lambda: self.backend.complete(prompt), estimate_tokens(prompt, latex))
+            else:
+                response = self.backend.complete(prompt)
+            print(f"INFO - {self.llm_model} call done")
 
-        print(f"INFO - {self.llm_model} call")
-        response = str(Settings.llm.complete(prompt))
-        print(f"INFO - {self.llm_model} call done")
+            return self._parse(response, latex, cls, key)
 
+    async def aextract(self, block_type: ElementType, latex: str, cls: Type[NormalisedNode]) -> NormalisedNode:
+        """ Same as `extract` with the async LLM client, cancelling it drops the pending request """
+        with span("extract", model=self.llm_model, block=str(block_type)) as current:
+            key, cached = self._lookup(latex, cls)
+            _label(current, cached)
+            if cached is not None:
+                return cached
+
+            prompt = self._prompt(block_type, latex, cls)
+
+            print(f"INFO - {self.llm_model} async call")
+            if self.limiter is not None:
+                response = await self.limiter.acall(lambda: self.backend.acomplete(prompt),
+                                                    estimate_tokens(prompt, latex))
+            else:
+                response = await self.backend.acomplete(prompt)
+            print(f"INFO - {self.llm_model} async call done")
+
+            return self._parse(response, latex, cls, key)
+
+    def _lookup(self, latex: str, cls: Type[NormalisedNode]) -> tuple[str | None, NormalisedNode | None]:
+        if self.cache is None:
+            return None, None
+
+        key = ExtractionCache.key(latex, cls, self.llm_model, self.temperature, PROMPT_VERSION)
+        cached = self.cache.load(key)
+
+        return key, cls(**cached) if cached is not None else None
+
+    def _prompt(self, block_type: ElementType, latex: str, cls: Type[NormalisedNode]) -> str:
+        return prompt_template().format(block_type=block_type, schema=cls.model_json_schema(), latex=latex)
+
+    def _parse(self, response: str, latex: str, cls: Type[NormalisedNode], key: str | None) -> NormalisedNode:
         try:
             json_data = self._jsonfy(response)
         except Exception as e:
             raise Exception(f"Failed to parse JSON response: {e}\n {latex}")
 
-        return cls(**json_data)
+        node = cls(**json_data)
+
+        if key is not None:
+            self.cache.store(key, json_data, PROMPT_VERSION)
+
+        return node
 
     def _jsonfy(self, data: str) -> dict:
         left = data.index("{")
@@ -73,3 +157,6 @@ class RAGExtractor:
 
         return parsed_json
 
+def _label(current: Span | None, cached: NormalisedNode | None) -> None:
+    if current is not None:
+        current.labels["cached"] = "true" if cached is not None else "false"
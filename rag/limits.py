@@ -0,0 +1,373 @@
+import time
+import random
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, TypeVar
+
+from models.llm import RateLimits, LimiterStats
+from utils.tracing import metrics
+
+T = TypeVar("T")
+
+# Statuses worth retrying: the provider throttled the call or is briefly unavailable
+RETRY_STATUSES: frozenset[int] = frozenset({408, 409, 429, 500, 502, 503, 504})
+OVERLOAD_STATUSES: frozenset[int] = frozenset({429, 503})
+
+# Raised by the OpenAI client, which Groq is built on, when no response came back
+RETRY_ERRORS: tuple[str, ...] = ("APIConnectionError", "APITimeoutError")
+
+# Rough size of a token in characters, only used to budget tokens before a call
+CHARS_PER_TOKEN: int = 4
+
+# Interval at which async callers check for a free concurrency slot
+POLL_INTERVAL: float = 0.01
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("texmorph_llm_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """ Raised when an LLM call cannot complete before the deadline of its document """
+
+class TokenBucket:
+    """
+    Budget refilled at `rate` units per second, holding at most `capacity` units.
+
+    `reserve` takes the units at once and returns how long the caller must
+    wait before they are really available, so callers are served in the
+    order they asked and nobody polls. The balance may go negative.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate     : float = rate
+        self.capacity : float = capacity
+
+        self._level   : float          = capacity
+        self._updated : float          = time.monotonic()
+        self._lock    : threading.Lock = threading.Lock()
+
+    def reserve(self, amount: float, deadline: float | None = None) -> float:
+        """
+        Takes `amount` units, returns the seconds to wait before using them.
+
+        Raises:
+            DeadlineExceeded: If the wait would end after `deadline`, nothing is taken then
+        """
+        amount = min(amount, self.capacity)
+
+        with self._lock:
+            now = self._refill()
+
+            wait = max(0.0, (amount - self._level) / self.rate)
+            if deadline is not None and now + wait > deadline:
+                raise DeadlineExceeded(f"waiting {wait:.1f}s for the rate limit would pass the deadline")
+
+            self._level -= amount
+
+        return wait
+
+    def refund(self, amount: float) -> None:
+        """ Gives back units taken by `reserve` for a call which was not made """
+        amount = min(amount, self.capacity)
+
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level + amount)
+
+    def take(self, amount: float = 1.0) -> bool:
+        """ Takes `amount` units if they are available now, without waiting or going negative """
+        with self._lock:
+            self._refill()
+
+            if self._level < amount:
+                return False
+
+            self._level -= amount
+
+        return True
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+        return now
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on the number of calls in flight.
+
+    Every call answered in time raises the limit by 1/limit, about one more
+    slot per round of calls. A throttled call halves the limit; a call
+    slower than `latency_tolerance` times the fastest recent one takes 10%
+    off. Calls started before the last decrease do not decrease it again,
+    so a burst of 429s caused by one round counts once.
+    """
+    def __init__(self, limits: RateLimits):
+        self.limit     : float = float(limits.concurrency)
+        self.minimum   : int   = limits.min_concurrency
+        self.maximum   : int   = limits.max_concurrency
+        self.tolerance : float = limits.latency_tolerance
+        self.in_flight : int   = 0
+
+        self._condition : threading.Condition = threading.Condition()
+        self._floor     : float | None        = None    # fastest recent latency
+        self._decreased : float               = 0.0     # monotonic time of the last decrease
+
+    def acquire(self, deadline: float | None = None) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                timeout = deadline - time.monotonic() if deadline is not None else None
+                if timeout is not None and timeout <= 0:
+                    raise DeadlineExceeded(f"no free slot among {int(self.limit)} before the deadline")
+                self._condition.wait(timeout)
+
+            self.in_flight += 1
+
+    async def aacquire(self, deadline: float | None = None) -> None:
+        while not self._try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DeadlineExceeded(f"no free slot among {int(self.limit)} before the deadline")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def release(self, started: float, overloaded: bool = False, failed: bool = False) -> None:
+        """
+        Frees the slot of a call started at `started` (monotonic time).
+
+        Args:
+            started: When the call was sent
+            overloaded: The provider throttled the call or was overloaded
+            failed: The call failed for another reason, it says nothing about the load
+        """
+        now = time.monotonic()
+        latency = now - started
+
+        with self._condition:
+            self.in_flight -= 1
+
+            if overloaded:
+                self._decrease(started, now, 0.5)
+            elif not failed:
+                # Drifts up 1% per call so a provider that became slower for good is not seen as overloaded forever
+                self._floor = latency if self._floor is None else min(latency, self._floor * 1.01)
+
+                if latency > self.tolerance * self._floor:
+                    self._decrease(started, now, 0.9)
+                else:
+                    self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+            self._condition.notify_all()
+
+    def _try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return False
+
+            self.in_flight += 1
+
+        return True
+
+    def _decrease(self, started: float, now: float, factor: float) -> None:
+        if started < self._decreased:
+            return
+
+        self.limit = max(float(self.minimum), self.limit * factor)
+        self._decreased = now
+
+class RateLimiter:
+    """
+    Client-side limits of one provider account, shared by every extractor of a process.
+
+    A call waits for one request and its estimated tokens from the per-minute
+    buckets, then for one of the AdaptiveConcurrency slots. Throttled, timed
+    out and 5xx calls are retried with full-jitter exponential backoff; a
+    Retry-After sent by the provider pauses every caller, not only the one
+    which was throttled. Nothing is retried past the deadline of the
+    document, see `document`, or `limits.deadline` after the first attempt
+    of a call made outside of one.
+
+    Args:
+        limits: Budget of the account, the RateLimits defaults if None
+    """
+    def __init__(self, limits: RateLimits | None = None):
+        self.limits      : RateLimits          = limits or RateLimits()
+        self.requests    : TokenBucket         = _bucket(self.limits.requests_per_minute, self.limits.burst)
+        self.tokens      : TokenBucket         = _bucket(self.limits.tokens_per_minute, self.limits.burst)
+        self.concurrency : AdaptiveConcurrency = AdaptiveConcurrency(self.limits)
+
+        self._resume     : float               = 0.0     # monotonic time until which the provider asked to pause
+        self._stats      : LimiterStats        = LimiterStats()
+        self._lock       : threading.Lock      = threading.Lock()
+
+    @contextmanager
+    def document(self, seconds: float | None = None) -> Iterator[None]:
+        """
+        Gives every call made in the block, including from threads and tasks
+        started with a copy of the context, one deadline `seconds` from now
+        (`limits.deadline` by default). A nested block cannot extend it.
+        """
+        deadline = time.monotonic() + (self.limits.deadline if seconds is None else seconds)
+        outer = _deadline.get()
+
+        token = _deadline.set(deadline if outer is None else min(outer, deadline))
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+    def call(self, func: Callable[[], T], tokens: int = 0) -> T:
+        """
+        Runs `func` within the limits, retrying it when it fails transiently.
+
+        Args:
+            func: The call to the provider
+            tokens: Tokens the call is expected to use, see `estimate_tokens`
+
+        Raises:
+            DeadlineExceeded: If the call cannot be made or retried before the deadline
+        """
+        deadline = self._deadline()
+
+        for attempt in itertools.count():
+            time.sleep(self._admit(tokens, deadline))
+            self.concurrency.acquire(deadline)
+
+            started = time.monotonic()
+            try:
+                result = func()
+            except Exception as e:
+                delay = self._retry(e, attempt, started, deadline)
+                if delay is None:
+                    raise
+            except BaseException:
+                self.concurrency.release(started, failed=True)
+                raise
+            else:
+                return self._done(result, started)
+
+            time.sleep(delay)
+
+    async def acall(self, func: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """ Same as `call` for a coroutine function; cancelling the task frees its slot """
+        deadline = self._deadline()
+
+        for attempt in itertools.count():
+            await asyncio.sleep(self._admit(tokens, deadline))
+            await self.concurrency.aacquire(deadline)
+
+            started = time.monotonic()
+            try:
+                result = await func()
+            except Exception as e:
+                delay = self._retry(e, attempt, started, deadline)
+                if delay is None:
+                    raise
+            except BaseException:
+                self.concurrency.release(started, failed=True)
+                raise
+            else:
+                return self._done(result, started)
+
+            await asyncio.sleep(delay)
+
+    @property
+    def stats(self) -> LimiterStats:
+        with self._lock:
+            stats = self._stats.model_copy()
+
+        stats.concurrency = self.concurrency.limit
+
+        return stats
+
+    def _deadline(self) -> float:
+        deadline = _deadline.get()
+
+        return deadline if deadline is not None else time.monotonic() + self.limits.deadline
+
+    def _admit(self, tokens: int, deadline: float) -> float:
+        """ Reserves a request and `tokens`, returns how long to wait for them """
+        pause = max(0.0, self._resume - time.monotonic())
+        if time.monotonic() + pause > deadline:
+            raise DeadlineExceeded(f"the provider asked to pause {pause:.1f}s, past the deadline")
+
+        wait = self.requests.reserve(1, deadline)
+        try:
+            return max(pause, wait, self.tokens.reserve(tokens, deadline))
+        except DeadlineExceeded:
+            # The call is not made, so the request it reserved goes back to the others
+            self.requests.refund(1)
+            raise
+
+    def _done(self, result: T, started: float) -> T:
+        self.concurrency.release(started)
+
+        with self._lock:
+            self._stats.calls += 1
+
+        return result
+
+    def _retry(self, error: Exception, attempt: int, started: float, deadline: float) -> float | None:
+        """
+        Frees the slot of a failed call and returns the delay before retrying it, None to give up.
+
+        Raises:
+            DeadlineExceeded: If the retry would start after the deadline
+        """
+        status = _status(error)
+        retry = status in RETRY_STATUSES or type(error).__name__ in RETRY_ERRORS \
+            or isinstance(error, (TimeoutError, ConnectionError))
+        overloaded = status in OVERLOAD_STATUSES or type(error).__name__ == "APITimeoutError"
+
+        self.concurrency.release(started, overloaded=overloaded, failed=not overloaded)
+
+        with self._lock:
+            self._stats.throttled += status == 429
+            if not retry or attempt >= self.limits.max_retries:
+                self._stats.failures += 1
+                return None
+            self._stats.retries += 1
+
+        metrics().inc("texmorph_llm_retries_total", reason=str(status or type(error).__name__))
+
+        delay = random.uniform(0, min(self.limits.backoff_cap, self.limits.backoff_base * 2 ** attempt))
+
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+            with self._lock:
+                self._resume = max(self._resume, time.monotonic() + retry_after)
+
+        if time.monotonic() + delay > deadline:
+            with self._lock:
+                self._stats.failures += 1
+            raise DeadlineExceeded(f"retrying after {delay:.1f}s would pass the deadline") from error
+
+        print(f"[WARNING] LLM call failed ({status or type(error).__name__}), retry {attempt + 1} in {delay:.1f}s")
+
+        return delay
+
+def estimate_tokens(*texts: str) -> int:
+    """ Tokens `texts` take, roughly, for budgeting before the provider counts them """
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN + 1
+
+def _bucket(per_minute: float, burst: float) -> TokenBucket:
+    rate = per_minute / 60
+
+    return TokenBucket(rate, max(1.0, rate * burst))
+
+def _status(error: Exception) -> int | None:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+
+    return status if isinstance(status, int) else None
+
+def _retry_after(error: Exception) -> float | None:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None:
+        return None
+
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
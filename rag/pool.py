@@ -0,0 +1,190 @@
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+
+from models.types import LLMBackendType
+from models.llm import LLMConfig, PoolStats
+from rag.extraction import RAGExtractor
+from rag.limits import RateLimiter
+from rag.backends import LLMBackend, create_backend, load_config
+
+if TYPE_CHECKING:
+    import httpx
+
+class ExtractorPool:
+    """
+    Process-wide extractors sharing keep-alive HTTP connections.
+
+    The environment is read and the HTTP clients are built once; every
+    extractor handed out by `get` sends its requests through the same
+    connection pool, so TCP connections and TLS sessions are reused from
+    one table to the next. Extractors are stateless and shared between
+    threads, one per model and temperature. They also share one
+    RateLimiter, since every model counts against the same account; the
+    client's own retries are disabled so throttling reaches the limiter.
+    Replayed completions are local and skip both the clients and the limiter.
+    An asyncio HTTP client is bound to its event loop, so there is one per
+    running loop; close the pool with `aclose` from async code.
+
+    `stats` counts requests against the connections and TLS handshakes
+    they needed, from the connection events httpcore reports.
+
+    Args:
+        config: Model and connection settings, from the environment if None
+    """
+    _default: 'ExtractorPool | None' = None
+    _default_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, config: LLMConfig | None = None):
+        self.config      : LLMConfig = config or load_config()
+        if self.config.api_key is None:
+            self.config.api_key = load_config().api_key
+
+        self.limiter     : RateLimiter = RateLimiter(self.config.limits)
+
+        self._extractors : dict[tuple[str, float], RAGExtractor] = {}
+        self._lock       : threading.Lock = threading.Lock()
+        self._stats      : PoolStats = PoolStats()
+        self._client     : 'httpx.Client | None' = None
+        self._aclients   : dict[asyncio.AbstractEventLoop, 'httpx.AsyncClient'] = {}
+
+    @classmethod
+    def default(cls) -> 'ExtractorPool':
+        """ Returns the process-wide pool, configured from the environment unless `configure` was called """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+
+        return cls._default
+
+    @classmethod
+    def configure(cls, config: LLMConfig) -> 'ExtractorPool':
+        """ Replaces the process-wide pool with one using `config` """
+        with cls._default_lock:
+            if cls._default is not None:
+                cls._default.close()
+            cls._default = cls(config)
+
+        return cls._default
+
+    def get(self, model: str | None = None, temperature: float | None = None) -> RAGExtractor:
+        """ The shared extractor for a model, the configured one by default """
+        key = (model or self.config.model, self.config.temperature if temperature is None else temperature)
+
+        with self._lock:
+            extractor = self._extractors.get(key)
+            if extractor is None:
+                backend = self._backend(*key)
+                extractor = self._extractors[key] = RAGExtractor(
+                    llm_model=key[0], temperature=key[1], backend=backend,
+                    limiter=self.limiter if backend.remote else None,
+                )
+                self._stats.extractors += 1
+
+        return extractor
+
+    @property
+    def stats(self) -> PoolStats:
+        with self._lock:
+            return self._stats.model_copy()
+
+    def close(self) -> None:
+        """
+        Closes the HTTP clients. The async ones can only be closed on their
+        own loop: it is done there for the loops still running, the others
+        are dropped, see `aclose`.
+        """
+        for loop, client in self._release():
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def aclose(self) -> None:
+        """ Same as `close`, awaiting the async client of the running loop """
+        current = asyncio.get_running_loop()
+        pending = []
+
+        for loop, client in self._release():
+            if loop is current:
+                pending.append(client.aclose())
+            elif loop.is_running():
+                pending.append(asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop)))
+
+        await asyncio.gather(*pending)
+
+    def _release(self) -> list[tuple[asyncio.AbstractEventLoop, 'httpx.AsyncClient']]:
+        """ Closes the sync client, forgets the extractors and hands back the async clients to close """
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+
+            aclients = list(self._aclients.items())
+
+            self._client = None
+            self._aclients.clear()
+            self._extractors.clear()
+
+        return aclients
+
+    def _backend(self, model: str, temperature: float) -> LLMBackend:
+        if self.config.backend == LLMBackendType.REPLAY:
+            return create_backend(self.config, model, temperature)
+
+        return create_backend(self.config, model, temperature, max_retries=0,
+                              http_client=self._http_client(), async_http_client=self._async_http_client)
+
+    def _http_client(self) -> 'httpx.Client':
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.Client(limits=self._limits(), timeout=self.config.timeout,
+                                        event_hooks={"request": [self._trace_request]})
+
+        return self._client
+
+    def _async_http_client(self) -> 'httpx.AsyncClient':
+        """ The async client of the running event loop """
+        import httpx
+
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            # The connections of a closed loop cannot be used or closed any more, and they keep the loop alive
+            for closed in [other for other in self._aclients if other.is_closed()]:
+                del self._aclients[closed]
+
+            client = self._aclients.get(loop)
+            if client is None:
+                client = self._aclients[loop] = httpx.AsyncClient(
+                    limits=self._limits(), timeout=self.config.timeout,
+                    event_hooks={"request": [self._atrace_request]},
+                )
+
+        return client
+
+    def _limits(self) -> 'httpx.Limits':
+        import httpx
+
+        return httpx.Limits(max_connections=self.config.max_connections,
+                            max_keepalive_connections=self.config.max_keepalive,
+                            keepalive_expiry=self.config.keepalive_expiry)
+
+    def _trace_request(self, request: 'httpx.Request') -> None:
+        request.extensions["trace"] = self._trace
+        self._count("requests")
+
+    async def _atrace_request(self, request: 'httpx.Request') -> None:
+        request.extensions["trace"] = self._atrace
+        self._count("requests")
+
+    def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            self._count("connections")
+        elif event == "connection.start_tls.complete":
+            self._count("handshakes")
+
+    async def _atrace(self, event: str, info: dict) -> None:
+        self._trace(event, info)
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self._stats, field, getattr(self._stats, field) + 1)
@@ -0,0 +1,175 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from rag.limits import TokenBucket
+
+# A table every extraction can be parsed into
+DEFAULT_RESPONSE: str = '{"rows": [[{"content": "stub"}, {"content": "1"}]], "caption": "stub", "label": null}'
+
+class StubLLMServer:
+    """
+    Local OpenAI-compatible chat completions endpoint which throttles like a provider.
+
+    Requests beyond `rpm` per minute or `max_concurrency` in flight get a
+    429 with Retry-After, and a `throttle` share of the others is refused at
+    random. An answer takes `latency` seconds plus `latency_per_call` for
+    every other request in flight, so piling calls up makes them slower.
+    Point an LLMConfig at `url` to run the extractors against it:
+
+        server = StubLLMServer(rpm=60, throttle=0.1).start()
+        ExtractorPool.configure(LLMConfig(api_key="stub", api_base=server.url))
+
+    Args:
+        rpm: Requests per minute accepted
+        max_concurrency: Requests answered at the same time
+        throttle: Probability of a 429 for a request within the limits
+        latency: Seconds an answer takes when it is the only one in flight
+        latency_per_call: Extra seconds per other request in flight
+        retry_after: Retry-After sent with a 429, None to send none
+        response: Content of every answer
+        host: Interface to listen on
+        port: Port to listen on, a free one if 0
+    """
+    def __init__(self, rpm: float = 600.0, max_concurrency: int = 8, throttle: float = 0.0, latency: float = 0.05,
+                 latency_per_call: float = 0.0, retry_after: float | None = 1.0, response: str = DEFAULT_RESPONSE,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.max_concurrency  : int          = max_concurrency
+        self.throttle         : float        = throttle
+        self.latency          : float        = latency
+        self.latency_per_call : float        = latency_per_call
+        self.retry_after      : float | None = retry_after
+        self.response         : str          = response
+
+        self.requests         : int = 0
+        self.served           : int = 0
+        self.throttled        : int = 0
+        self.peak             : int = 0
+
+        self._bucket    : TokenBucket    = TokenBucket(rpm / 60, max(1.0, rpm / 60))
+        self._in_flight : int            = 0
+        self._lock      : threading.Lock = threading.Lock()
+        self._server    : ThreadingHTTPServer = ThreadingHTTPServer((host, port), self._handler())
+        self._thread    : threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'StubLLMServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="texmorph-llm-stub", daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "served": self.served, "throttled": self.throttled, "peak": self.peak}
+
+    def _admit(self) -> bool:
+        """ Counts a request in, False if it is throttled """
+        with self._lock:
+            self.requests += 1
+
+            throttled = self._in_flight >= self.max_concurrency or random.random() < self.throttle \
+                or not self._bucket.take()
+            if throttled:
+                self.throttled += 1
+                return False
+
+            self._in_flight += 1
+            self.peak = max(self.peak, self._in_flight)
+
+        return True
+
+    def _answer(self) -> dict:
+        with self._lock:
+            others = self._in_flight - 1
+
+        time.sleep(self.latency + self.latency_per_call * others)
+
+        with self._lock:
+            self._in_flight -= 1
+            self.served += 1
+
+        return {
+            "id"      : f"stub-{self.served}",
+            "object"  : "chat.completion",
+            "created" : int(time.time()),
+            "model"   : "stub",
+            "choices" : [{
+                "index"         : 0,
+                "message"       : {"role": "assistant", "content": self.response},
+                "finish_reason" : "stop",
+            }],
+            "usage"   : {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, as the provider does
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    return self._send(404, {"error": {"message": f"No such endpoint {self.path}"}})
+
+                if not stub._admit():
+                    headers = {"Retry-After": f"{stub.retry_after:g}"} if stub.retry_after is not None else {}
+                    return self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, headers)
+
+                self._send(200, stub._answer())
+
+            def log_message(self, format: str, *args):
+                pass
+
+            def _send(self, code: int, payload: dict, headers: dict[str, str] | None = None) -> None:
+                body = json.dumps(payload).encode("utf-8")
+
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local OpenAI-compatible endpoint which injects 429s.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--rpm", type=float, default=600.0)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--throttle", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-per-call", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(rpm=args.rpm, max_concurrency=args.max_concurrency, throttle=args.throttle,
+                           latency=args.latency, latency_per_call=args.latency_per_call,
+                           host=args.host, port=args.port).start()
+    print(f"INFO - stub LLM listening on {server.url}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"INFO - {server.stats()}")
@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import uuid
+import queue
+import argparse
+import threading
+import traceback
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pydantic import ValidationError
+
+from models.types import JobState
+from models.service import ServiceRequest, ServiceOutput, ServiceJob
+
+def _warm_up() -> None:
+    """ Worker initializer, pays the import and setup cost once per process instead of once per job """
+    import core.convert
+    import utils.compile
+    from formats.IFormat import FORMATS
+    from config.settings import Settings
+    from utils.toolchain import probe
+
+    probe()
+
+def _run(request: ServiceRequest) -> ServiceOutput:
+    """ Worker entry point, never raises so one document cannot break the pool """
+    from core.convert import convert
+    from utils.compile import compile_job
+    from models.compile import CompileJob
+
+    output = ServiceOutput(worker=os.getpid())
+
+    try:
+        tex = request.tex
+        if request.to_format is not None:
+            tex = convert(tex, request.to_format, compile=False)
+            output.tex = tex
+
+        if request.compile:
+            result = compile_job(CompileJob(tex=tex, use_bibtex=request.use_bibtex, use_cache=True))
+
+            output.pdf = result.pdf
+            output.diagnostics = result.diagnostics
+            output.error = result.error
+
+    except Exception:
+        output.error = traceback.format_exc()
+
+    return output
+
+class QueueFull(Exception):
+    """ Raised when the service cannot take another job """
+
+class ConversionService:
+    """
+    Runs conversion and compile jobs on warm worker processes.
+
+    Workers are spawned once and import the pipeline, the format registries
+    and the toolchain probe in their initializer, so a job only pays for its
+    own work. At most `workers` jobs run at a time and at most `queue_size`
+    wait; `submit` raises QueueFull beyond that instead of letting the
+    backlog grow without bound. Finished jobs are kept until `max_jobs`
+    newer ones replaced them. When a worker dies, the jobs it broke the
+    pool for fail and the pool is replaced by a new one with warm workers.
+
+    Args:
+        workers: Number of worker processes. Defaults to the CPU count.
+        queue_size: Number of jobs which may wait for a worker
+        max_jobs: Number of finished jobs kept for status and result retrieval
+    """
+    # Function run on the workers for every job, `(request) -> ServiceOutput`; must be picklable
+    worker = staticmethod(_run)
+
+    def __init__(self, workers: int | None = None, queue_size: int = 64, max_jobs: int = 1024):
+        self.workers    : int = workers or os.cpu_count() or 1
+        self.queue_size : int = queue_size
+        self.max_jobs   : int = max_jobs
+
+        self._jobs      : OrderedDict[str, ServiceJob] = OrderedDict()
+        self._lock      : threading.Lock               = threading.Lock()
+        self._queue     : queue.Queue[ServiceJob | None] = queue.Queue(maxsize=queue_size)
+        self._slots     : threading.Semaphore          = threading.Semaphore(self.workers)
+        self._pool      : ProcessPoolExecutor | None   = None
+        self._pool_lock : threading.Lock               = threading.Lock()
+        self._thread    : threading.Thread | None      = None
+
+    def start(self) -> 'ConversionService':
+        self._pool = self._spawn_pool()
+
+        self._thread = threading.Thread(target=self._dispatch, name="texmorph-dispatch", daemon=True)
+        self._thread.start()
+
+        print(f"INFO - conversion service started with {self.workers} warm workers")
+
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    def submit(self, request: ServiceRequest) -> ServiceJob:
+        """
+        Queues a job.
+
+        Raises:
+            QueueFull: If `queue_size` jobs are already waiting
+        """
+        job = ServiceJob(id=uuid.uuid4().hex, request=request, submitted=time.time())
+
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(f"{self.queue_size} jobs are already waiting")
+
+            self._jobs[job.id] = job
+            self._evict()
+
+        return job
+
+    def get(self, job_id: str) -> ServiceJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+
+        return {
+            "workers"    : self.workers,
+            "queue_size" : self.queue_size,
+            **{state.value: states.count(state) for state in JobState},
+        }
+
+    def _dispatch(self) -> None:
+        """ Hands queued jobs to the pool, never more than there are workers; only the None sentinel stops it """
+        while True:
+            # Take a worker first so jobs wait in the bounded queue, not in the pool
+            self._slots.acquire()
+
+            job = self._queue.get()
+            if job is None:
+                break
+
+            job.state = JobState.RUNNING
+            job.started = time.time()
+
+            try:
+                pool = self._pool
+                try:
+                    future = pool.submit(self.worker, job.request)
+                except BrokenProcessPool:
+                    pool = self._restart(pool)
+                    future = pool.submit(self.worker, job.request)
+            except Exception as e:
+                self._fail(job, f"Could not start the job: {e}")
+                continue
+
+            future.add_done_callback(lambda f, job=job, pool=pool: self._finish(job, f, pool))
+
+    def _finish(self, job: ServiceJob, future: Future, pool: ProcessPoolExecutor) -> None:
+        try:
+            job.output = future.result()
+        except BrokenProcessPool as e:
+            self._fail(job, f"Worker process died: {e}")
+            # Callbacks of a broken pool run under its shutdown lock, so it is replaced from another thread
+            threading.Thread(target=self._replace, args=(pool,), name="texmorph-restart", daemon=True).start()
+            return
+        except Exception as e:
+            self._fail(job, f"Worker process failed: {e}")
+            return
+
+        job.finished = time.time()
+        job.state = JobState.FAILED if job.output.error is not None else JobState.DONE
+
+        self._slots.release()
+
+    def _fail(self, job: ServiceJob, error: str) -> None:
+        job.output = ServiceOutput(error=error)
+        job.finished = time.time()
+        job.state = JobState.FAILED
+
+        self._slots.release()
+
+    def _spawn_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_warm_up,
+        )
+
+        # Spawn every worker now, not on the first jobs
+        for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+        return pool
+
+    def _restart(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """ Replaces a broken pool, once however many of its jobs report it, returns the current pool """
+        with self._pool_lock:
+            if self._pool is broken:
+                print(f"[WARNING] a worker process died, restarting {self.workers} workers")
+
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._spawn_pool()
+
+            return self._pool
+
+    def _replace(self, broken: ProcessPoolExecutor) -> None:
+        try:
+            self._restart(broken)
+        except Exception as e:
+            # The dispatch thread retries when it hands the next job to the broken pool
+            print(f"[WARNING] Could not restart the workers: {e}")
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in (JobState.DONE, JobState.FAILED)]
+
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of a ConversionService.
+
+        POST /jobs               ServiceRequest JSON -> 202 {id, state}, 429 when the queue is full
+        GET  /jobs/<id>          job status
+        GET  /jobs/<id>/result   converted tex and diagnostics, 409 while the job runs
+        GET  /jobs/<id>/pdf      the compiled PDF
+        GET  /health             worker and queue counters
+    """
+    service: ConversionService
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": f"No such endpoint {self.path}"})
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = ServiceRequest.model_validate_json(self.rfile.read(length))
+        except (ValueError, ValidationError) as e:
+            return self._send_json(400, {"error": str(e)})
+
+        try:
+            job = self.service.submit(request)
+        except QueueFull as e:
+            return self._send_json(429, {"error": str(e)}, headers={"Retry-After": "1"})
+
+        self._send_json(202, {"id": job.id, "state": job.state.value}, headers={"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+
+        if parts == ["health"]:
+            return self._send_json(200, self.service.stats())
+
+        if len(parts) not in (2, 3) or parts[0] != "jobs":
+            return self._send_json(404, {"error": f"No such endpoint {self.path}"})
+
+        job = self.service.get(parts[1])
+        if job is None:
+            return self._send_json(404, {"error": f"No job {parts[1]}"})
+
+        if len(parts) == 2:
+            return self._send_json(200, job.status())
+
+        if job.state in (JobState.QUEUED, JobState.RUNNING):
+            return self._send_json(409, job.status())
+
+        match parts[2]:
+            case "result":
+                self._send_json(200, {
+                    "id"          : job.id,
+                    "state"       : job.state.value,
+                    "tex"         : job.output.tex,
+                    "error"       : job.output.error,
+                    "diagnostics" : [d.model_dump(mode="json") for d in job.output.diagnostics],
+                })
+            case "pdf" if job.output.pdf is not None:
+                self._send(200, job.output.pdf, "application/pdf")
+            case "pdf":
+                self._send_json(404, {"error": f"Job {job.id} produced no PDF"})
+            case _:
+                self._send_json(404, {"error": f"No such endpoint {self.path}"})
+
+    def log_message(self, format: str, *args):
+        print(f"INFO - {self.address_string()} {format % args}")
+
+    def _send_json(self, code: int, payload: dict, headers: dict[str, str] | None = None) -> None:
+        self._send(code, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _send(self, code: int, body: bytes, content_type: str, headers: dict[str, str] | None = None) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(host: str = "127.0.0.1", port: int = 8765, **kwargs) -> None:
+    """
+    Runs the conversion service until interrupted.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on
+        **kwargs: Options passed to `ConversionService`
+    """
+    service = ConversionService(**kwargs).start()
+    handler = type("Handler", (ServiceHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+
+    print(f"INFO - listening on http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve LaTeX conversion and compile jobs over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--max-jobs", type=int, default=1024)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, workers=args.workers, queue_size=args.queue_size, max_jobs=args.max_jobs)
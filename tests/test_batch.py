@@ -0,0 +1,40 @@
+import os
+import signal
+from pathlib import Path
+
+from core.batch import BatchConverter
+from models.batch import ConversionJob, ConversionResult
+from models.types import FormatType
+
+def _crash_on_marker(index: int, job: ConversionJob) -> ConversionResult:
+    """ Stands in for a document which kills its worker, e.g. a segfault or an OOM kill """
+    if "crash" in job.source.name:
+        os.kill(os.getpid(), signal.SIGKILL)
+
+    return ConversionResult(index=index, job=job, tex=job.source.name, worker=os.getpid())
+
+class CrashingConverter(BatchConverter):
+    worker = staticmethod(_crash_on_marker)
+
+def _jobs(*names: str) -> list[ConversionJob]:
+    return [ConversionJob(source=Path(name), to_format=FormatType.IEEE) for name in names]
+
+def test_dead_worker_fails_only_its_job():
+    names = [f"doc{i}.tex" for i in range(6)]
+    names.insert(2, "crash.tex")
+
+    converter = CrashingConverter(max_workers=2)
+    results = list(converter.run(_jobs(*names)))
+
+    assert [result.index for result in results] == list(range(len(names)))
+    assert [result.ok for result in results] == [name != "crash.tex" for name in names]
+    assert "Worker process died" in results[2].error
+    assert converter.summary.succeeded == 6 and converter.summary.failed == 1
+
+def test_unordered_results_cover_every_job():
+    names = ["crash.tex", "a.tex", "b.tex", "crash2.tex", "c.tex"]
+
+    results = list(CrashingConverter(max_workers=3, ordered=False).run(_jobs(*names)))
+
+    assert sorted(result.index for result in results) == list(range(len(names)))
+    assert {names[result.index] for result in results if not result.ok} == {"crash.tex", "crash2.tex"}
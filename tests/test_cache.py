@@ -0,0 +1,82 @@
+import sqlite3
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import utils.cache
+from models.normalisation import Table
+from rag.cache import ExtractionCache
+from utils.cache import DiskCache
+
+LATEX = "\\begin{tabular}{ll}\n  a & b \\\\ % first row\n  c & d\n\\end{tabular}"
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ Every call to time() is one second later, so access order is never a tie """
+    ticks = itertools.count(1)
+    monkeypatch.setattr(utils.cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ExtractionCache(tmp_path / "extraction.sqlite", max_size=30)
+    yield cache
+    cache.close()
+
+def key(latex: str = LATEX, model: str = "model", temperature: float = 0.0, version: str = "1") -> str:
+    return ExtractionCache.key(latex, Table, model, temperature, version)
+
+def test_key_ignores_whitespace_and_comments():
+    reformatted = "\\begin{tabular}{ll} a & b \\\\\n\n\tc & d %% note\n\\end{tabular}\n"
+
+    assert key(reformatted) == key()
+    assert key(LATEX.replace("a & b", "a & x")) != key()
+
+def test_key_changes_with_prompt_model_and_temperature():
+    keys = {key(), key(version="2"), key(model="other"), key(temperature=0.5)}
+
+    assert len(keys) == 4
+
+def test_prompt_version_invalidates_its_entries(cache):
+    cache.store(key(), {"rows": []}, "1")
+    cache.store(key(version="2"), {"rows": [["a"]]}, "2")
+
+    assert cache.invalidate(keep="2") == 1
+    assert cache.load(key()) is None
+    assert cache.load(key(version="2")) == {"rows": [["a"]]}
+
+def test_least_recently_used_entries_are_evicted(cache, clock):
+    for name in "abc":
+        cache.set(name, b"x" * 10)
+
+    cache.get("a")
+    cache.set("d", b"x" * 10)
+
+    assert "b" not in cache
+    assert all(name in cache for name in "acd")
+    assert cache.stats.size == 30
+
+def test_running_size_follows_replacements_and_invalidations(cache):
+    cache.set("a", b"x" * 10, tag="1")
+    cache.set("a", b"x" * 4, tag="1")
+    cache.set("b", b"x" * 6, tag="2")
+    assert cache.stats.size == 10
+
+    cache.invalidate(tag="1")
+    assert cache.stats.size == 6
+
+def test_size_of_an_existing_cache_is_counted_once(tmp_path):
+    path = tmp_path / "old.sqlite"
+    with sqlite3.connect(path) as db:
+        db.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, tag TEXT NOT NULL, value BLOB NOT NULL, "
+                   "size INTEGER NOT NULL, accessed REAL NOT NULL)")
+        db.execute("INSERT INTO entries VALUES ('a', '', x'00', 7, 0)")
+    db.close()
+
+    cache = DiskCache(path)
+    try:
+        assert cache.stats.size == 7
+        cache.set("b", b"xyz")
+        assert cache.stats.size == 10
+    finally:
+        cache.close()
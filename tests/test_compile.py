@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import utils.compile as compile
+from models.compile import ResourceLimits
+from models.types import PassKind, CompileStatus
+from utils.texlog import LogParser
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="process groups and rlimits are POSIX only")
+
+PRINT_LIMITS = "import resource; print(resource.getrlimit(resource.RLIMIT_CPU), resource.getrlimit(resource.RLIMIT_AS))"
+
+LIMITS = ResourceLimits(timeout=10, cpu_time=7, memory=4 * 1024 * 1024 * 1024)
+
+def gone(pid: int, timeout: float = 2.0) -> bool:
+    """ Whether a process exited within timeout, zombies waiting for their parent count as gone """
+    until = time.monotonic() + timeout
+
+    while time.monotonic() < until:
+        try:
+            if Path(f"/proc/{pid}/stat").read_text().split(") ", 1)[1].startswith("Z"):
+                return True
+        except (FileNotFoundError, ProcessLookupError):
+            return True
+        time.sleep(0.02)
+
+    return False
+
+def test_limits_apply_from_the_start():
+    returncode, output, status = compile._stream([sys.executable, "-c", PRINT_LIMITS], cwd=Path.cwd(), env=None,
+                                                 parser=LogParser(), limits=LIMITS)
+
+    assert status == CompileStatus.OK
+    assert output.strip() == f"(7, 12) ({LIMITS.memory}, {LIMITS.memory})"
+
+def test_async_limits_apply_from_the_start():
+    returncode, output, status = asyncio.run(compile._stream_async([sys.executable, "-c", PRINT_LIMITS],
+                                                                   cwd=Path.cwd(), env=None, parser=LogParser(),
+                                                                   limits=LIMITS))
+
+    assert output.strip() == f"(7, 12) ({LIMITS.memory}, {LIMITS.memory})"
+
+def test_limits_apply_without_prlimit(monkeypatch):
+    monkeypatch.setattr(compile.shutil, "which", lambda name: None)
+
+    returncode, output, status = compile._stream([sys.executable, "-c", PRINT_LIMITS], cwd=Path.cwd(), env=None,
+                                                 parser=LogParser(), limits=LIMITS)
+
+    assert status == CompileStatus.OK
+    assert output.strip() == f"(7, 12) ({LIMITS.memory}, {LIMITS.memory})"
+
+def test_no_limits_no_prefix():
+    assert compile.rlimits(ResourceLimits(cpu_time=None, memory=None)) == []
+
+def test_leftover_children_are_killed():
+    command = ["sh", "-c", "sleep 30 >/dev/null 2>&1 & echo $!"]
+
+    returncode, output, status = compile._stream(command, cwd=Path.cwd(), env=None, parser=LogParser(),
+                                                 limits=LIMITS)
+
+    assert status == CompileStatus.OK
+    assert gone(int(output.strip()))
+
+def test_reaped_process_is_not_signalled(monkeypatch):
+    sent = []
+    monkeypatch.setattr(compile.os, "killpg", lambda pid, sig: sent.append(pid))
+
+    process = subprocess.Popen(["true"], start_new_session=True)
+    process.wait()
+    compile.kill(process)
+
+    assert sent == []
+
+def test_timeout_kills_the_group():
+    parser = LogParser(tool=PassKind.LATEX)
+    command = ["sh", "-c", "sleep 30 & echo $!; wait"]
+
+    returncode, output, status = compile._stream(command, cwd=Path.cwd(), env=None, parser=parser,
+                                                 limits=ResourceLimits(timeout=0.5))
+
+    assert status == CompileStatus.TIMEOUT
+    assert gone(int(output.strip()))
@@ -0,0 +1,20 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from core.convert import convert, convert_async
+from models.types import FormatType
+
+from test_store import DOCUMENT
+
+def test_convert_async_in_a_process_executor():
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        tex = asyncio.run(convert_async(DOCUMENT, FormatType.IEEE, executor=executor))
+
+    assert tex == convert(DOCUMENT, FormatType.IEEE, compile=False)
+
+def test_convert_async_in_a_thread_executor():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        tex = asyncio.run(convert_async(DOCUMENT, FormatType.IEEE, executor=executor))
+
+    assert tex == convert(DOCUMENT, FormatType.IEEE, compile=False)
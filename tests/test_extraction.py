@@ -0,0 +1,13 @@
+import TexSoup as ts
+
+from utils.extraction import DocumentIndex
+
+def test_bibliography_requires_bibfile():
+    soup = ts.TexSoup(r"\documentclass{article}\begin{document}\bibliography{refs}\end{document}")
+
+    assert DocumentIndex(soup).requires_bibfile
+
+def test_biblatex_does_not_require_bibtex():
+    soup = ts.TexSoup(r"\documentclass{article}\addbibresource{refs.bib}\begin{document}\printbibliography\end{document}")
+
+    assert not DocumentIndex(soup).requires_bibfile
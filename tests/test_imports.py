@@ -0,0 +1,20 @@
+import sys
+import subprocess
+
+from utils.dev_tools import ROOT, LAZY_MODULES, check_import_budget
+
+def test_convert_import_budget():
+    ok, report = check_import_budget("core.convert")
+
+    assert ok, report
+
+def test_convert_does_not_import_the_llm_stack():
+    script = f"import sys, core.convert; print(sorted(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+def test_budget_check_catches_eager_imports():
+    ok, report = check_import_budget("json", lazy=("json",), runs=1)
+
+    assert not ok and "should load lazily: json" in report
@@ -0,0 +1,53 @@
+from core.incremental import IncrementalConverter
+from models.types import FormatType
+
+DOCUMENT = r"""\documentclass{IEEEtran}
+\title{T}
+\begin{document}
+\section{One}
+First paragraph.
+\section{Two}
+Second %s paragraph.
+\subsection{Three}
+Third.
+\end{document}
+"""
+
+def test_only_changed_nodes_are_recomputed():
+    converter = IncrementalConverter()
+
+    first = converter.convert(DOCUMENT % "old", FormatType.IEEE)
+    assert first.reused == 0 and first.recomputed == first.total
+
+    second = converter.convert(DOCUMENT % "new", FormatType.IEEE)
+    assert second.recomputed == 1
+    assert second.reused == second.total - 1
+
+    unchanged = converter.convert(DOCUMENT % "new", FormatType.IEEE)
+    assert unchanged.recomputed == 0
+
+def test_reused_output_matches_a_fresh_conversion():
+    converter = IncrementalConverter()
+    converter.convert(DOCUMENT % "old", FormatType.IEEE)
+
+    incremental = converter.convert(DOCUMENT % "new", FormatType.IEEE)
+    fresh = IncrementalConverter().convert(DOCUMENT % "new", FormatType.IEEE)
+
+    assert incremental.tex == fresh.tex
+    assert "\\section{Two}" in fresh.tex and "\\subsection{Three}" in fresh.tex
+
+def test_state_file_survives_restarts(tmp_path):
+    state = tmp_path / "state.json"
+
+    IncrementalConverter(state_path=state).convert(DOCUMENT % "old", FormatType.IEEE)
+    restarted = IncrementalConverter(state_path=state).convert(DOCUMENT % "old", FormatType.IEEE)
+
+    assert restarted.recomputed == 0
+
+def test_unreadable_state_file_is_ignored(tmp_path):
+    state = tmp_path / "state.json"
+    state.write_text("{not json", encoding="utf-8")
+
+    result = IncrementalConverter(state_path=state).convert(DOCUMENT % "old", FormatType.IEEE)
+
+    assert result.reused == 0
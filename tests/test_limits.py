@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from models.llm import RateLimits
+from rag.backends import GroqBackend
+from rag.limits import RateLimiter, DeadlineExceeded
+from rag.stub import StubLLMServer, DEFAULT_RESPONSE
+
+def stub(**kwargs) -> StubLLMServer:
+    return StubLLMServer(**{"latency": 0.0, **kwargs}).start()
+
+def backend(server: StubLLMServer) -> GroqBackend:
+    return GroqBackend("stub", 0.0, api_key="stub", api_base=server.url, max_retries=0)
+
+def limits(**kwargs) -> RateLimits:
+    return RateLimits(**{"requests_per_minute": 6000, "tokens_per_minute": 10 ** 7, "backoff_base": 0.05, **kwargs})
+
+def test_token_bucket_paces_requests():
+    server = stub(rpm=6000)
+    llm = backend(server)
+    # 10 requests a second, 5 at once
+    limiter = RateLimiter(limits(requests_per_minute=600, burst=0.5))
+
+    try:
+        start = time.monotonic()
+        for _ in range(15):
+            assert limiter.call(lambda: llm.complete("prompt")) == DEFAULT_RESPONSE
+
+        assert time.monotonic() - start >= 0.9
+        assert server.stats()["throttled"] == 0
+    finally:
+        server.stop()
+
+def test_throttling_halves_concurrency_and_retries():
+    server = stub(max_concurrency=2, latency=0.1, retry_after=None)
+    llm = backend(server)
+    limiter = RateLimiter(limits(concurrency=8))
+
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: limiter.call(lambda: llm.complete("prompt")), range(16)))
+
+        stats = limiter.stats
+        assert results == [DEFAULT_RESPONSE] * 16
+        assert stats.throttled > 0 and stats.retries >= stats.throttled and stats.failures == 0
+        assert stats.concurrency < 8
+        assert server.stats()["peak"] <= 2
+    finally:
+        server.stop()
+
+def test_retry_after_is_honoured():
+    # One request a second: the second call is throttled and told to wait a second
+    server = stub(rpm=60, retry_after=1.0)
+    llm = backend(server)
+    limiter = RateLimiter(limits())
+
+    try:
+        limiter.call(lambda: llm.complete("prompt"))
+
+        start = time.monotonic()
+        assert limiter.call(lambda: llm.complete("prompt")) == DEFAULT_RESPONSE
+
+        assert time.monotonic() - start >= 1.0
+        assert limiter.stats.throttled == 1 and limiter.stats.retries == 1
+    finally:
+        server.stop()
+
+def test_deadline_stops_retries():
+    server = stub(throttle=1.0, retry_after=5.0)
+    llm = backend(server)
+    limiter = RateLimiter(limits())
+
+    try:
+        start = time.monotonic()
+        with limiter.document(1.0), pytest.raises(DeadlineExceeded):
+            limiter.call(lambda: llm.complete("prompt"))
+
+        assert time.monotonic() - start < 1.0
+        assert server.stats()["requests"] == 1
+        assert limiter.stats.failures == 1
+    finally:
+        server.stop()
+
+def test_token_deadline_refunds_the_request():
+    limiter = RateLimiter(limits(requests_per_minute=60, tokens_per_minute=60, burst=1))
+    limiter.tokens.reserve(limiter.tokens.capacity)
+
+    with pytest.raises(DeadlineExceeded):
+        limiter._admit(1, deadline=time.monotonic() + 0.1)
+
+    assert limiter.requests.reserve(1) == 0.0
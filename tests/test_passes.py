@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import pytest
+
+from models.types import PassKind
+from utils.cache import DiskCache
+from utils.passes import PassScheduler
+
+AUX = "\\citation{knuth84}\n\\bibdata{refs}\n\\bibstyle{plain}\n"
+
+@pytest.fixture
+def document(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "refs.bib").write_text("@book{knuth84, title={The TeXbook}}", encoding="utf-8")
+    (source / "main.tex").write_text("\\documentclass{article}\n\\begin{document}\n\\cite{knuth84}\n"
+                                     "\\bibliography{refs}\n\\end{document}\n", encoding="utf-8")
+
+    return source / "main.tex"
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DiskCache(tmp_path / "bibliography.sqlite")
+    yield cache
+    cache.close()
+
+def run(scheduler: PassScheduler, aux: str = AUX, fls: str | None = None) -> list[PassKind]:
+    """ Drives the scheduler, writing the files each pass would """
+    stem = scheduler.file_path.stem
+    kinds: list[PassKind] = []
+
+    while (step := scheduler.next_pass()) is not None:
+        kinds.append(step.kind)
+
+        if step.kind == PassKind.BIBTEX:
+            (scheduler.work_dir / f"{stem}.bbl").write_text("\\begin{thebibliography}{1}\n", encoding="utf-8")
+        else:
+            bbl = scheduler.work_dir / f"{stem}.bbl"
+            (scheduler.work_dir / f"{stem}.aux").write_text(aux + ("\\bibcite{knuth84}{1}\n" if bbl.exists() else ""),
+                                                           encoding="utf-8")
+            if fls is not None:
+                (scheduler.work_dir / f"{stem}.fls").write_text(fls, encoding="utf-8")
+
+        scheduler.record("")
+
+    return kinds
+
+def workspace(tmp_path: Path, name: str) -> Path:
+    path = tmp_path / name
+    path.mkdir()
+
+    return path
+
+def test_bibtex_is_skipped_in_a_fresh_workspace(document, cache, tmp_path):
+    first = PassScheduler(document, workspace(tmp_path, "one"), use_bibtex=True, bib_cache=cache)
+    assert PassKind.BIBTEX in run(first)
+
+    second_dir = workspace(tmp_path, "two")
+    second = PassScheduler(document, second_dir, use_bibtex=True, bib_cache=cache)
+    kinds = run(second)
+
+    assert PassKind.BIBTEX not in kinds and second.skipped == [PassKind.BIBTEX]
+    assert (second_dir / "main.bbl").read_text(encoding="utf-8") == "\\begin{thebibliography}{1}\n"
+    # The restored bibliography still needs the passes that read it
+    assert kinds == [PassKind.LATEX] * 3
+    assert [step.draft for step in second.passes] == [True, True, False]
+
+def test_bibtex_reruns_when_the_database_changes(document, cache, tmp_path):
+    run(PassScheduler(document, workspace(tmp_path, "one"), use_bibtex=True, bib_cache=cache))
+
+    (document.parent / "refs.bib").write_text("@book{knuth84, title={The METAFONTbook}}", encoding="utf-8")
+    kinds = run(PassScheduler(document, workspace(tmp_path, "two"), use_bibtex=True, bib_cache=cache))
+
+    assert PassKind.BIBTEX in kinds
+
+def test_bibtex_reruns_when_an_included_aux_cites_more(document, cache, tmp_path):
+    run(PassScheduler(document, workspace(tmp_path, "one"), use_bibtex=True, bib_cache=cache))
+
+    second_dir = workspace(tmp_path, "two")
+    (second_dir / "chapter.aux").write_text("\\citation{lamport94}\n", encoding="utf-8")
+    kinds = run(PassScheduler(document, second_dir, use_bibtex=True, bib_cache=cache),
+                aux=AUX + "\\@input{chapter.aux}\n")
+
+    assert PassKind.BIBTEX in kinds
+
+def test_cross_references_in_an_input_file(tmp_path):
+    (tmp_path / "main.tex").write_text("\\begin{document}\n\\input{chapter}\n\\end{document}\n", encoding="utf-8")
+    (tmp_path / "chapter.tex").write_text("See \\ref{fig:one}.\n", encoding="utf-8")
+
+    scheduler = PassScheduler(tmp_path / "main.tex", workspace(tmp_path, "work"))
+
+    assert scheduler.next_pass().draft
+
+def test_commented_input_is_not_followed(tmp_path):
+    (tmp_path / "main.tex").write_text("% \\input{chapter}\nNo references.\n", encoding="utf-8")
+    (tmp_path / "chapter.tex").write_text("See \\ref{fig:one}.\n", encoding="utf-8")
+
+    scheduler = PassScheduler(tmp_path / "main.tex", workspace(tmp_path, "work"))
+
+    assert run(scheduler, aux="") == [PassKind.LATEX]
+
+def test_cross_references_in_a_recorded_input(tmp_path):
+    (tmp_path / "main.tex").write_text("\\InputIfFileExists{chapter.tex}{}{}\n", encoding="utf-8")
+    (tmp_path / "chapter.tex").write_text("See \\ref{fig:one}.\n", encoding="utf-8")
+    fls = f"PWD {tmp_path}\nINPUT {tmp_path / 'main.tex'}\nINPUT {tmp_path / 'chapter.tex'}\n"
+
+    scheduler = PassScheduler(tmp_path / "main.tex", workspace(tmp_path, "work"), recorder=True)
+
+    # The first pass writes the .aux the references need, so a second one follows
+    assert run(scheduler, aux="\\newlabel{fig:one}{{1}{1}}\n", fls=fls) == [PassKind.LATEX] * 2
+    assert not scheduler.passes[0].draft
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from models.llm import LLMConfig, RateLimits
+from rag.pool import ExtractorPool
+from rag.stub import StubLLMServer, DEFAULT_RESPONSE
+
+@pytest.fixture
+def server():
+    server = StubLLMServer(latency=0.0).start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def pool(server):
+    pool = ExtractorPool(LLMConfig(api_key="stub", api_base=server.url, limits=RateLimits(requests_per_minute=6000)))
+    yield pool
+    pool.close()
+
+def test_sync_requests_share_one_connection(pool):
+    backend = pool.get().backend
+
+    assert [backend.complete("prompt") for _ in range(5)] == [DEFAULT_RESPONSE] * 5
+    assert pool.stats.requests == 5 and pool.stats.connections == 1
+
+def test_each_event_loop_gets_its_own_client(pool):
+    backend = pool.get().backend
+
+    async def complete() -> str:
+        return await backend.acomplete("prompt")
+
+    # The second loop would fail on connections bound to the first one if the client were shared
+    assert asyncio.run(complete()) == DEFAULT_RESPONSE
+    assert asyncio.run(complete()) == DEFAULT_RESPONSE
+
+    # The client of the first, closed, loop was dropped
+    assert len(pool._aclients) == 1
+
+def test_aclose_closes_the_client_of_the_loop(pool):
+    backend = pool.get().backend
+
+    async def run():
+        await asyncio.gather(*(backend.acomplete("prompt") for _ in range(3)))
+        client = pool._async_http_client()
+
+        await pool.aclose()
+
+        return client
+
+    client = asyncio.run(run())
+
+    assert client.is_closed
+    assert pool.stats.requests == 3
@@ -0,0 +1,84 @@
+import pytest
+
+from core.convert import _to_cir
+from core.serialisation import dumps, loads, dump, load, read_header, CIRReader
+from models.normalisation import Author, Section, SourceSpan
+
+DOCUMENT = r"""\documentclass{IEEEtran}
+\title{T}
+\begin{document}
+\section{One}
+First paragraph.
+\section{Two}
+Second paragraph.
+\subsection{Three}
+Third.
+\end{document}
+"""
+
+def shape(node):
+    return (type(node).__name__, node.model_dump(exclude={"children"}), [shape(child) for child in node.children])
+
+@pytest.fixture
+def cir():
+    return _to_cir(DOCUMENT)
+
+def test_round_trip_keeps_the_tree(cir):
+    restored = loads(dumps(cir, source=DOCUMENT))
+
+    assert restored.doc_class.model_dump() == cir.doc_class.model_dump()
+    assert restored.title.model_dump() == cir.title.model_dump()
+    assert shape(restored.root) == shape(cir.root)
+
+def test_round_trip_keeps_spans_into_the_source(cir):
+    restored = loads(dumps(cir, source=DOCUMENT))
+
+    sections = [node for node in restored.root.children if isinstance(node, Section)]
+    assert sections and all(isinstance(node.source_span, SourceSpan) for node in sections)
+    assert sections[0].source_span.source == DOCUMENT
+    assert sections[0].original_content.startswith(r"\section{One}")
+
+def test_round_trip_keeps_inline_content(cir):
+    cir.authors.append(Author(name="A. Author", email="a@b.c", original_content=r"\author{A. Author}"))
+
+    restored = loads(dumps(cir, source=DOCUMENT))
+
+    assert restored.authors == cir.authors
+    assert restored.authors[0].original_content == r"\author{A. Author}"
+
+def test_file_round_trip_and_header(cir, tmp_path):
+    path = tmp_path / "doc.cir"
+    dump(cir, path, source=DOCUMENT)
+
+    assert shape(load(path).root) == shape(cir.root)
+
+    header = read_header(path)
+    assert header.doc_class.model_dump() == cir.doc_class.model_dump()
+    assert header.title.model_dump() == cir.title.model_dump()
+    assert header.authors == []
+
+def test_reader_decodes_single_nodes(cir, tmp_path):
+    path = tmp_path / "doc.cir"
+    dump(cir, path, source=DOCUMENT)
+
+    with CIRReader.open(path) as reader:
+        root = reader.slots["root"]
+        children = [reader.node(index) for index in reader.children(root)]
+
+        assert len(reader) > len(children)
+        assert reader.source == DOCUMENT
+        assert [shape(node)[:2] for node in children] == [shape(node)[:2] for node in cir.root.children]
+
+def test_bad_magic_is_rejected():
+    with pytest.raises(ValueError, match="bad magic"):
+        loads(b"NOTCIR" + bytes(16))
+
+def test_truncated_file_is_rejected(cir):
+    data = dumps(cir, source=DOCUMENT)
+
+    with pytest.raises(ValueError, match="Corrupt CIR file"):
+        loads(data[:len(data) // 2])
+
+def test_missing_file_is_rejected(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CIRReader.open(tmp_path / "missing.cir")
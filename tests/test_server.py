@@ -0,0 +1,58 @@
+import os
+import time
+import signal
+
+from models.service import ServiceRequest, ServiceOutput
+from models.types import JobState
+from services.server import ConversionService
+
+def _crash_on_marker(request: ServiceRequest) -> ServiceOutput:
+    """ Stands in for a document which kills its worker, e.g. a segfault or an OOM kill """
+    if request.tex == "crash":
+        os.kill(os.getpid(), signal.SIGKILL)
+
+    return ServiceOutput(tex=request.tex, worker=os.getpid())
+
+class CrashingService(ConversionService):
+    worker = staticmethod(_crash_on_marker)
+
+def _wait(service: ConversionService, job_id: str, timeout: float = 60.0) -> JobState:
+    until = time.monotonic() + timeout
+
+    while time.monotonic() < until:
+        state = service.get(job_id).state
+        if state in (JobState.DONE, JobState.FAILED):
+            return state
+        time.sleep(0.05)
+
+    raise TimeoutError(f"job {job_id} still {state}")
+
+def _request(tex: str) -> ServiceRequest:
+    return ServiceRequest(tex=tex, compile=True)
+
+def test_dead_worker_fails_its_job_and_the_service_recovers():
+    service = CrashingService(workers=2, queue_size=8).start()
+
+    try:
+        crashed = service.submit(_request("crash"))
+        assert _wait(service, crashed.id) == JobState.FAILED
+        assert "Worker process died" in service.get(crashed.id).output.error
+
+        jobs = [service.submit(_request(f"doc{i}")) for i in range(4)]
+
+        assert [_wait(service, job.id) for job in jobs] == [JobState.DONE] * 4
+        assert [service.get(job.id).output.tex for job in jobs] == [f"doc{i}" for i in range(4)]
+        assert service._thread.is_alive()
+    finally:
+        service.stop()
+
+def test_repeated_crashes_keep_the_dispatcher_alive():
+    service = CrashingService(workers=1, queue_size=8).start()
+
+    try:
+        jobs = [service.submit(_request(tex)) for tex in ("crash", "crash", "ok")]
+
+        assert [_wait(service, job.id) for job in jobs] == [JobState.FAILED, JobState.FAILED, JobState.DONE]
+        assert service.stats()["done"] == 1
+    finally:
+        service.stop()
@@ -0,0 +1,73 @@
+from pathlib import Path
+
+import pytest
+import TexSoup as ts
+
+from models.normalisation import NormalisedNode, SourceSpan, Text
+from utils.extraction import get_span
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DOCUMENTS = [
+    ROOT / "data" / "IEEE" / "conference_101719.tex",
+    ROOT / "data" / "SPRINGER" / "sn-article.tex",
+    ROOT / "data" / "TEST" / "test_file.tex",
+]
+
+SAMPLE = r"""\documentclass{article}
+\usepackage[utf8]{inputenc}
+\begin{document}
+\section{Intro}\label{sec:intro}
+Some \textbf{bold} and $x^2$ text.
+\begin{itemize}
+  \item one
+  \item two \emph{nested \textit{deep}}
+\end{itemize}
+\end{document}
+"""
+
+def _walk(node: ts.TexNode):
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+@pytest.mark.parametrize("source", [SAMPLE] + [path.read_text(encoding="utf-8") for path in DOCUMENTS if path.exists()])
+def test_span_slices_match_serialised_nodes(source: str):
+    soup = ts.TexSoup(source)
+    positioned = 0
+
+    for node in _walk(soup):
+        start, end = get_span(node, source)
+        if start < 0:
+            continue
+
+        positioned += 1
+        assert source[start:end] == str(node)
+
+    assert positioned > 0
+
+def test_source_span_materialises_on_access():
+    source = "abc \\textbf{def} ghi"
+    node = NormalisedNode(original_content=SourceSpan(source, 4, 16))
+
+    assert node.original_content == "\\textbf{def}"
+    assert node.source_span is not None and len(node.source_span) == 12
+    assert node.model_dump()["original_content"] == "\\textbf{def}"
+
+def test_original_content_accepts_strings():
+    node = Text(original_content="plain", text="plain")
+    assert node.source_span is None
+
+    node.original_content = SourceSpan("xx plain", 3, 8)
+    assert node.original_content == "plain"
+
+def test_original_content_is_required():
+    with pytest.raises(TypeError):
+        Text(text="plain")
+
+def test_schema_lists_original_content_as_required():
+    schema = Text.model_json_schema()
+
+    assert list(schema["properties"])[0] == "original_content"
+    assert schema["required"] == ["original_content", "text"]
+    assert schema["$defs"]["NormalisedNode"]["required"] == ["original_content"]
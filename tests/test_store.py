@@ -0,0 +1,63 @@
+import warnings
+
+from core.convert import _to_cir
+from core.store import CIRStore
+from models.normalisation import Text, Package, Section, Other
+
+DOCUMENT = r"""\documentclass{IEEEtran}
+\title{T}
+\begin{document}
+\section{One}
+First paragraph.
+\section{Two}
+Second paragraph.
+\subsection{Three}
+Third.
+\end{document}
+"""
+
+def test_trusted_matches_validated_construction():
+    trusted = Package.trusted(names=["amsmath"], original_content=r"\usepackage{amsmath}")
+    validated = Package(names=["amsmath"], original_content=r"\usepackage{amsmath}")
+
+    assert trusted == validated
+    assert trusted.options == [] and trusted.children == []
+    assert trusted.original_content == r"\usepackage{amsmath}"
+
+def test_trusted_node_dumps_without_warnings():
+    node = Text.trusted(text="a", original_content="a")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert node.model_dump() == {"children": [], "text": "a", "original_content": "a"}
+
+def test_trusted_leaves_missing_fields_unset():
+    node = Text.trusted()
+
+    assert node.model_fields_set == set()
+    assert not hasattr(node, "text")
+
+def test_store_round_trip_keeps_the_tree():
+    cir = _to_cir(DOCUMENT)
+    store = CIRStore.from_cir(cir, source=DOCUMENT)
+    restored = store.to_cir()
+
+    assert restored.doc_class.type == cir.doc_class.type
+    assert restored.title.title == cir.title.title
+
+    def shape(node):
+        return (type(node).__name__, node.original_content, [shape(child) for child in node.children])
+
+    assert shape(restored.root) == shape(cir.root)
+
+def test_store_walks_without_building_nodes():
+    store = CIRStore()
+    root = Other.trusted(name="document")
+    section = Section.trusted(title="One", content="", original_content=r"\section{One}")
+    section.children.append(Text.trusted(text="x", original_content="x"))
+    root.children.append(section)
+
+    index = store.add(root)
+
+    assert [(store.type_of(i), depth) for i, depth in store.walk(index)] == [(Other, 0), (Section, 1), (Text, 2)]
+    assert store.materialise(index).children[0].children[0].parent.title == "One"
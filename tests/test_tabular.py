@@ -0,0 +1,61 @@
+from core.tabular import parse_tabular, _strip_rules
+
+def _contents(result) -> list[list[str]]:
+    return [[cell.content for cell in row] for row in result.table.rows]
+
+def test_plain_grid_with_caption_and_label():
+    result = parse_tabular(r"""
+    \begin{table}
+    \centering
+    \begin{tabular}{l|r}
+    \hline
+    Item & Quantity \\
+    Widgets & 42 \\ % a comment & not a cell
+    Gadgets & 13
+    \end{tabular}
+    \caption{\label{tab:widgets}An example table.}
+    \end{table}
+    """)
+
+    assert result.confident
+    assert _contents(result) == [["Item", "Quantity"], ["Widgets", "42"], ["Gadgets", "13"]]
+    assert result.table.caption == "An example table."
+    assert result.table.label == "tab:widgets"
+
+def test_hline_keeps_braced_first_cell():
+    result = parse_tabular("\\begin{tabular}{ll}\n\\hline\n{\\bf Name} & {\\bf Value} \\\\\na & 1\n\\end{tabular}")
+
+    assert result.confident
+    assert _contents(result)[0] == ["{\\bf Name}", "{\\bf Value}"]
+
+def test_hline_keeps_parenthesised_first_cell():
+    result = parse_tabular("\\begin{tabular}{ll}\n\\hline\n(a) & 1 \\\\\n\\hline\n(b) & 2\n\\end{tabular}")
+
+    assert result.confident
+    assert _contents(result) == [["(a)", "1"], ["(b)", "2"]]
+
+def test_booktabs_rules_take_their_arguments_only():
+    assert _strip_rules(r"\toprule[1pt] {x}").strip() == "{x}"
+    assert _strip_rules(r"\cmidrule[1pt](lr){1-2} (a)").strip() == "(a)"
+    assert _strip_rules(r"\cline{1-2}{x}").strip() == "{x}"
+    assert _strip_rules(r"\specialrule{1pt}{2pt}{3pt}{x}").strip() == "{x}"
+    assert _strip_rules(r"\addlinespace[4pt] [y]").strip() == "[y]"
+    assert _strip_rules(r"\midrule (a)").strip() == "(a)"
+
+def test_multicolumn_and_multirow_spans():
+    result = parse_tabular(r"""\begin{tabular}{lll}
+    \multicolumn{2}{c}{Head} & C \\
+    \multirow{2}{*}{Tall} & b & c \\
+    & e & f
+    \end{tabular}""")
+
+    assert result.confident
+    rows = result.table.rows
+    assert (rows[0][0].content, rows[0][0].colspan) == ("Head", 2)
+    assert (rows[1][0].content, rows[1][0].rowspan) == ("Tall", 2)
+    assert [cell.content for cell in rows[2]] == ["e", "f"]
+
+def test_unsupported_tables_fall_back():
+    assert not parse_tabular(r"\begin{longtable}{ll} a & b \end{longtable}").confident
+    assert not parse_tabular(r"\begin{tabular}{ll} a & b & c \end{tabular}").confident
+    assert parse_tabular("no table here").reason == "no tabular environment"
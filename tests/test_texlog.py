@@ -0,0 +1,102 @@
+from models.compile import Diagnostic
+from models.types import PassKind, DiagnosticKind
+from utils.texlog import LogParser, CompilationError
+
+def parse(text: str, **kwargs) -> LogParser:
+    parser = LogParser(**kwargs)
+    for line in text.splitlines(keepends=True):
+        parser.feed(line)
+
+    return parser
+
+def test_file_line_error():
+    parser = parse("(./main.tex\n./main.tex:12: Undefined control sequence.\n)")
+
+    [diagnostic] = parser.diagnostics
+    assert diagnostic.kind == DiagnosticKind.ERROR
+    assert (diagnostic.file, diagnostic.line) == ("./main.tex", 12)
+    assert diagnostic.message == "Undefined control sequence."
+
+def test_bang_error_takes_its_line_and_the_open_file():
+    parser = parse(
+        "(./main.tex (./chapter.tex\n"
+        "! Missing $ inserted.\n"
+        "<inserted text>\n"
+        "l.7 x^\n"
+        "))\n"
+    )
+
+    [diagnostic] = parser.diagnostics
+    assert (diagnostic.file, diagnostic.line) == ("./chapter.tex", 7)
+    assert parser.errors == 1
+
+def test_file_stack_pops_on_close():
+    parser = parse("(./main.tex (./chapter.tex)\n! Emergency stop.\n")
+
+    assert parser.diagnostics[0].file == "./main.tex"
+
+def test_multiline_warning_takes_its_input_line():
+    parser = parse(
+        "LaTeX Warning: Reference `fig:one' on page 1 undefined\n"
+        " on input line 42.\n"
+        "\n"
+    )
+
+    [diagnostic] = parser.diagnostics
+    assert diagnostic.kind == DiagnosticKind.WARNING
+    assert diagnostic.line == 42
+    assert "fig:one" in diagnostic.message and "input line 42" in diagnostic.message
+
+def test_badbox():
+    parser = parse("Overfull \\hbox (12.0pt too wide) in paragraph at lines 10--12\n")
+
+    [diagnostic] = parser.diagnostics
+    assert diagnostic.kind == DiagnosticKind.BADBOX
+    assert diagnostic.line == 10
+    assert parser.errors == 0
+
+def test_fatal_error_aborts():
+    parser = parse("./main.tex:3: TeX capacity exceeded, sorry [main memory size=5000000].\n")
+
+    assert parser.diagnostics[0].kind == DiagnosticKind.FATAL
+    assert parser.fatal and parser.should_abort
+
+def test_max_errors_aborts():
+    parser = parse("./a.tex:1: one\n./a.tex:2: two\n", max_errors=3)
+    assert not parser.should_abort
+
+    parser.feed("./a.tex:3: three\n")
+    assert parser.should_abort
+
+def test_bibtex_lines():
+    parser = parse(
+        "I couldn't open database file refs.bib\n"
+        "---line 3 of file main.aux\n"
+        "Warning--empty journal in knuth84\n"
+        "Repeated entry---line 17 of file refs.bib\n",
+        tool=PassKind.BIBTEX,
+    )
+
+    kinds = [(d.kind, d.file, d.line) for d in parser.diagnostics]
+    assert kinds == [
+        (DiagnosticKind.ERROR, None, None),
+        (DiagnosticKind.ERROR, "main.aux", 3),
+        (DiagnosticKind.WARNING, None, None),
+        (DiagnosticKind.ERROR, "refs.bib", 17),
+    ]
+    assert all(d.tool == PassKind.BIBTEX for d in parser.diagnostics)
+
+def test_compilation_error_lists_the_first_errors():
+    diagnostics = [Diagnostic(kind=DiagnosticKind.ERROR, message=f"error {i}", file="main.tex", line=i) for i in range(7)]
+    diagnostics.append(Diagnostic(kind=DiagnosticKind.WARNING, message="only a warning"))
+
+    error = CompilationError("pdflatex failed", diagnostics, log="tail")
+    message = str(error)
+
+    assert message.startswith("pdflatex failed\n  main.tex:0: error: error 0")
+    assert "error 4" in message and "error 5" not in message
+    assert message.endswith("... and 2 more")
+    assert "only a warning" not in message
+
+def test_compilation_error_without_diagnostics():
+    assert str(CompilationError("pdflatex timed out")) == "pdflatex timed out"
@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pytest
+
+import utils.toolchain as toolchain
+from models.compile import ToolInfo, Toolchain
+from utils.toolchain import required_files, find_files, preflight
+
+PREAMBLE = r"""\documentclass[a4paper]{article}
+\usepackage{amsmath, graphicx}
+\IfFileExists{fancy.sty}{\usepackage{fancy}}{\usepackage{plain}}
+\newif\ifdraft
+\ifdraft
+  \usepackage{draftwatermark}
+\fi
+% \usepackage{commented}
+\usepackage{hyperref}
+\begin{document}
+\usepackage{body}
+\end{document}
+"""
+
+def test_required_files_skip_conditional_branches():
+    assert required_files(PREAMBLE) == ["article.cls", "amsmath.sty", "graphicx.sty", "hyperref.sty"]
+
+def test_conditional_files():
+    assert required_files(PREAMBLE, conditional=True) == ["fancy.sty", "plain.sty", "draftwatermark.sty"]
+
+def test_nested_braces_in_a_branch():
+    tex = r"\documentclass{article}\@ifpackageloaded{x}{\newcommand{\a}{b}\usepackage{y}}{}\usepackage{z}"
+
+    assert required_files(tex) == ["article.cls", "z.sty"]
+    assert required_files(tex, conditional=True) == ["y.sty"]
+
+class FakeKpsewhich:
+    def __init__(self, available: set[str]):
+        self.available = available
+        self.calls     = 0
+
+    def __call__(self, names):
+        self.calls += 1
+        return {name: Path("/texmf") / name for name in names if name in self.available}
+
+@pytest.fixture
+def kpsewhich(monkeypatch):
+    fake = FakeKpsewhich(set())
+    tools = {name: ToolInfo(name=name, path=f"/bin/{name}", version="1", mtime=0.0) for name in toolchain.TOOLS}
+
+    monkeypatch.setattr(toolchain, "probe", lambda: Toolchain(key="one", tools=tools))
+    monkeypatch.setattr(toolchain, "_kpsewhich", fake)
+    monkeypatch.setattr(toolchain, "_save", lambda _: None)
+    monkeypatch.setattr(toolchain, "_missing", {})
+
+    return fake
+
+def test_misses_are_remembered(kpsewhich):
+    assert find_files(["late.sty"]) == {"late.sty": None}
+    assert find_files(["late.sty"]) == {"late.sty": None}
+
+    assert kpsewhich.calls == 1
+
+def test_misses_expire(kpsewhich, monkeypatch):
+    monkeypatch.setattr(toolchain, "MISSING_TTL", 0.0)
+    find_files(["late.sty"])
+
+    kpsewhich.available.add("late.sty")
+
+    assert find_files(["late.sty"])["late.sty"] is not None
+    assert kpsewhich.calls == 2
+
+def test_misses_are_dropped_when_the_toolchain_changes(kpsewhich, monkeypatch):
+    find_files(["late.sty"])
+
+    kpsewhich.available.add("late.sty")
+    tools = toolchain.probe().tools
+    monkeypatch.setattr(toolchain, "probe", lambda: Toolchain(key="two", tools=tools))
+
+    assert find_files(["late.sty"])["late.sty"] is not None
+
+def test_preflight_only_warns_about_conditional_packages(kpsewhich, capsys):
+    kpsewhich.available.update({"article.cls", "amsmath.sty", "graphicx.sty", "hyperref.sty"})
+
+    preflight(PREAMBLE)
+
+    assert "fancy.sty" in capsys.readouterr().out
+
+def test_preflight_raises_on_a_missing_package(kpsewhich):
+    kpsewhich.available.update({"article.cls", "amsmath.sty", "graphicx.sty"})
+
+    with pytest.raises(FileNotFoundError, match="hyperref.sty"):
+        preflight(PREAMBLE)
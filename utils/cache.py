@@ -0,0 +1,152 @@
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from pydantic import BaseModel
+
+CACHE_DIR: Path = Path(os.getenv("TEXMORPH_CACHE_DIR", Path.home() / ".cache" / "texmorph"))
+
+class CacheStats(BaseModel):
+    """Hit/miss counters and size of a DiskCache"""
+    hits    : int = 0
+    misses  : int = 0
+    entries : int = 0
+    size    : int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+class DiskCache:
+    """
+    Persistent, size-bounded key/value store with LRU eviction.
+
+    Entries live in a single SQLite file so several worker processes can share
+    one cache. Every entry carries a tag (e.g. a prompt or engine version) that
+    can be used to invalidate a whole generation of entries at once. Triggers
+    keep the total size in a meta row, so a write only scans the entries when
+    the total crosses max_size.
+
+    Args:
+        path: The SQLite file backing the cache
+        max_size: Maximum total size of the stored values in bytes
+    """
+    def __init__(self, path: Path | str, max_size: int = 256 * 1024 * 1024):
+        self.path     : Path = Path(path)
+        self.max_size : int  = max_size
+
+        self._hits   : int = 0
+        self._misses : int = 0
+        self._lock   : threading.Lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, tag TEXT NOT NULL, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_tag ON entries (tag)")
+
+            # The running total, counted once for a cache written before it existed
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._db.execute("INSERT OR IGNORE INTO meta (name, value) "
+                             "SELECT 'size', COALESCE(SUM(size), 0) FROM entries")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN "
+                             "UPDATE meta SET value = value + new.size WHERE name = 'size'; END")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN "
+                             "UPDATE meta SET value = value + new.size - old.size WHERE name = 'size'; END")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN "
+                             "UPDATE meta SET value = value - old.size WHERE name = 'size'; END")
+
+    def get(self, key: str) -> bytes | None:
+        """ Returns the stored value and marks it as recently used """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+
+            if row is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+
+            return row[0]
+
+    def set(self, key: str, value: bytes, tag: str = "") -> None:
+        """ Stores a value, evicting least recently used entries past max_size """
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete fires no trigger
+            self._db.execute(
+                "INSERT INTO entries (key, tag, value, size, accessed) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tag = excluded.tag, value = excluded.value, "
+                "size = excluded.size, accessed = excluded.accessed",
+                (key, tag, value, len(value), time.time()),
+            )
+
+            size = self._size()
+            if size > self.max_size:
+                self._evict(size)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def invalidate(self, tag: str | None = None, keep: str | None = None) -> int:
+        """
+        Removes entries by tag.
+
+        Args:
+            tag: Remove the entries with this tag
+            keep: Remove every entry whose tag is different from this one
+
+        Returns:
+            The number of removed entries
+        """
+        with self._lock:
+            if tag is not None:
+                cursor = self._db.execute("DELETE FROM entries WHERE tag = ?", (tag,))
+            elif keep is not None:
+                cursor = self._db.execute("DELETE FROM entries WHERE tag != ?", (keep,))
+            else:
+                cursor = self._db.execute("DELETE FROM entries")
+
+            return cursor.rowcount
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._size()
+
+        return CacheStats(hits=self._hits, misses=self._misses, entries=entries, size=size)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _size(self) -> int:
+        return self._db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+
+    def _evict(self, size: int) -> None:
+        """ Deletes the least recently used entries until the total size is back under max_size """
+        victims: list[str] = []
+        for key, entry_size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            if size <= self.max_size:
+                break
+
+            victims.append(key)
+            size -= entry_size
+
+        self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
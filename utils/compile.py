@@ -1,11 +1,40 @@
 import os
+import asyncio
 from pathlib import Path
+import shutil
 import subprocess
 import platform
-import shutil
+import tempfile
+import threading
+import signal
 import time
+from typing import Iterable
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
 
+from models.types import PassKind, CompileStatus
+from models.compile import CompileJob, CompileResult, CompilePass, Diagnostic, ResourceLimits
 from utils.dev_tools import compiling_timer
+from utils.passes import PassScheduler
+from utils.fmt import FormatDumpCache
+from utils.toolchain import probe, preflight
+from utils.compile_cache import CompileCache, recorded_inputs
+from utils.texlog import LogParser, CompilationError, MAX_PRINT_LINE
+from utils.tracing import span, Span
+
+LOG_TAIL_LINES: int = 2000
+
+# Longest line an asyncio pass reads at once, TeX lines are at most MAX_PRINT_LINE characters
+STREAM_LIMIT: int = 1024 * 1024
+
+TEMP_EXTENSIONS: list[str] = [
+    '.aux', '.log', '.out', '.toc', '.lof', '.lot', '.bbl', '.blg', '.bcf', '.run.xml', '.fls',
+]
 
 
 @compiling_timer
@@ -28,105 +57,362 @@ def compile_tex(file_path: Path | str, open_pdf: bool = True,
     """
     # Get absolute paths for everything to avoid confusion
     file_path = Path(file_path).resolve()  # Get absolute path
-    original_cwd = Path.cwd().resolve()  # Save original working directory
 
     if not file_path.exists():
         raise FileNotFoundError(f"File {file_path} not found.")
 
-    if check_pdflatex()[0] == False:
-        raise Exception("pdflatex not found. Please install it.")
-
-    if use_bibtex and not check_bibtex()[0]:
-        raise Exception("bibtex not found. Please install it.")
-
     file_dir = file_path.parent
+
+    preflight(file_path.read_text(encoding="utf-8", errors="replace"), search_dirs=[file_dir], use_bibtex=use_bibtex)
     file_name = file_path.stem
 
     if output_dir is not None:
-        output_dir = (original_cwd / Path(output_dir)).resolve()
-        os.makedirs(output_dir, exist_ok=True)
-        output_arg = ['-output-directory', str(output_dir)]
-        pdf_path = output_dir / f"{file_name}.pdf"
-        work_dir = output_dir
+        work_dir = Path(output_dir).resolve()
+        os.makedirs(work_dir, exist_ok=True)
     else:
-        output_arg = []  # No output directory specified, use file_dir
-        pdf_path = file_dir / f"{file_name}.pdf"
         work_dir = file_dir
 
+    pdf_path = work_dir / f"{file_name}.pdf"
+
+    run_passes(file_path, work_dir, use_bibtex=use_bibtex, env=search_env(file_dir), search_dirs=[file_dir])
+
+    if open_pdf and pdf_path.exists():
+        open_file(pdf_path)
+
+    if not keep_temp:
+        for ext in TEMP_EXTENSIONS:
+            temp_file = work_dir / f"{file_name}{ext}"
+            if temp_file.exists():
+                temp_file.unlink()
+
+    if not keep_pdf and pdf_path.exists():
+        time.sleep(delete_dellay)
+        pdf_path.unlink()
+
+def run_passes(file_path: Path, work_dir: Path, use_bibtex: bool = False,
+               env: dict[str, str] | None = None, search_dirs: list[Path] | None = None,
+               max_passes: int = 5, fmt: str | None = None) -> tuple[str, int]:
+    """
+    Runs the pdflatex (and bibtex) passes the PassScheduler asks for, writing every output into work_dir.
+
+    Each tool is started with its working directory set through `cwd=`, so
+    the working directory of this process is never changed and several
+    compilations can run at once from different threads.
+
+    Args:
+        file_path: Absolute path to the .tex file
+        work_dir: Directory receiving the .aux, .log and .pdf files
+        use_bibtex: Whether to use BibTeX for bibliography processing
+        env: Environment of the tools, see `search_env`
+        search_dirs: Extra directories holding .bib and .bst files
+        max_passes: Maximum number of pdflatex passes
+        fmt: Name of a precompiled format, see `FormatDumpCache`
+
+    Returns:
+        The concatenated output of every pass and the number of passes run
+    """
+    scheduler = PassScheduler(file_path, work_dir, use_bibtex=use_bibtex, max_passes=max_passes,
+                              search_dirs=search_dirs, fmt=fmt)
+
+    log, _ = drive(scheduler, env=env)
+
+    return log, len(scheduler.passes)
+
+def drive(scheduler: PassScheduler, env: dict[str, str] | None = None,
+          max_errors: int | None = None, limits: ResourceLimits | None = None) -> tuple[str, list[Diagnostic]]:
+    """
+    Runs the passes of a scheduler until it is done.
+
+    The output of every pass is parsed while it is produced and a pass is
+    terminated as soon as a fatal error shows up or `max_errors` errors were
+    seen, instead of letting TeX go through the rest of the document. Every
+    process runs under `limits`.
+
+    Returns:
+        The tail of the output of every pass and the diagnostics parsed from it
+
+    Raises:
+        CompilationError: If a pass fails, is aborted or exceeds its limits
+    """
+    limits = limits or ResourceLimits()
+    log: list[str] = []
+    diagnostics: list[Diagnostic] = []
+
+    while (step := scheduler.next_pass()) is not None:
+        parser = LogParser(tool=step.kind, max_errors=max_errors)
+        with span("compile.pass", tool=step.kind.value, draft=str(step.draft).lower()) as current:
+            returncode, output, status = _stream(step.command, cwd=step.cwd, env=env, parser=parser, limits=limits)
+            _label(current, status)
+
+        log.append(output)
+        diagnostics.extend(parser.diagnostics)
+
+        if status != CompileStatus.OK:
+            raise _pass_error(step, status, returncode, parser, limits, diagnostics, "".join(log))
+
+        scheduler.record(output)
+
+    return "".join(log), diagnostics
+
+async def drive_async(scheduler: PassScheduler, env: dict[str, str] | None = None, max_errors: int | None = None,
+                      limits: ResourceLimits | None = None) -> tuple[str, list[Diagnostic]]:
+    """ Same as `drive`, running every pass as an asyncio subprocess """
+    limits = limits or ResourceLimits()
+    log: list[str] = []
+    diagnostics: list[Diagnostic] = []
+
+    while (step := scheduler.next_pass()) is not None:
+        parser = LogParser(tool=step.kind, max_errors=max_errors)
+        with span("compile.pass", tool=step.kind.value, draft=str(step.draft).lower()) as current:
+            returncode, output, status = await _stream_async(step.command, cwd=step.cwd, env=env, parser=parser,
+                                                             limits=limits)
+            _label(current, status)
+
+        log.append(output)
+        diagnostics.extend(parser.diagnostics)
+
+        if status != CompileStatus.OK:
+            raise _pass_error(step, status, returncode, parser, limits, diagnostics, "".join(log))
+
+        scheduler.record(output)
+
+    return "".join(log), diagnostics
+
+def _pass_error(step: CompilePass, status: CompileStatus, returncode: int, parser: LogParser,
+                limits: ResourceLimits, diagnostics: list[Diagnostic], log: str) -> CompilationError:
+    tool = "BibTeX" if step.kind == PassKind.BIBTEX else "LaTeX"
+
+    match status:
+        case CompileStatus.ABORTED:
+            message = f"{tool} compilation run {step.number} aborted after {parser.errors} error(s)!"
+        case CompileStatus.TIMEOUT:
+            message = f"{tool} compilation run {step.number} timed out after {limits.timeout}s!"
+        case CompileStatus.KILLED:
+            message = f"{tool} compilation run {step.number} was killed (signal {-returncode}), resource limit exceeded?"
+        case _:
+            message = f"{tool} compilation run {step.number} failed!"
+
+    return CompilationError(message, diagnostics=diagnostics, log=log, status=status)
+
+def _label(current: Span | None, status: CompileStatus) -> None:
+    if current is not None:
+        current.labels["status"] = status.value
+
+def _status(returncode: int, aborted: bool, timed_out: bool) -> CompileStatus:
+    if timed_out:
+        return CompileStatus.TIMEOUT
+    if aborted:
+        return CompileStatus.ABORTED
+    if returncode < 0:
+        return CompileStatus.KILLED
+    if returncode != 0:
+        return CompileStatus.FAILED
+
+    return CompileStatus.OK
+
+def search_env(*directories: Path | str) -> dict[str, str]:
+    """
+    Returns the environment with the given directories prepended to the TeX search paths.
+
+    The trailing separator keeps the default search path of the distribution.
+    """
+    env = dict(os.environ)
+    paths = os.pathsep.join(str(Path(d).resolve()) for d in directories) + os.pathsep
+
+    for variable in ("TEXINPUTS", "BIBINPUTS", "BSTINPUTS"):
+        env[variable] = paths + env.get(variable, "")
+
+    return env
+
+def _stream(command: list[str], cwd: Path, env: dict[str, str] | None, parser: LogParser,
+            limits: ResourceLimits | None = None) -> tuple[int, str, CompileStatus]:
+    """
+    Runs a command under resource limits, parsing its output line by line.
+
+    The process gets its own session so it and anything it spawned can be
+    killed as a group on timeout or abort. Only the last LOG_TAIL_LINES lines
+    are kept in memory, the full log is in the .log/.blg file of the pass.
+
+    Returns:
+        The return code, the tail of the output and the status of the run
+    """
+    limits = limits or ResourceLimits()
+
+    tail: deque[str] = deque(maxlen=LOG_TAIL_LINES)
+    aborted = False
+    timed_out = threading.Event()
+
+    process = subprocess.Popen(
+        rlimits(limits) + command, cwd=cwd, env=_pass_env(env), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace", start_new_session=os.name == "posix",
+    )
+
+    timer = None
+    if limits.timeout is not None:
+        timer = threading.Timer(limits.timeout, lambda: (timed_out.set(), kill(process)))
+        timer.daemon = True
+        timer.start()
+
     try:
-        os.chdir(file_dir)
+        for line in process.stdout:
+            tail.append(line)
+            parser.feed(line)
+
+            if parser.should_abort:
+                aborted = True
+                kill(process)
+                break
+
+        returncode = _reap(process)
+    finally:
+        if timer is not None:
+            timer.cancel()
+        kill(process)
+        process.stdout.close()
+        _reap(process)
+
+    return returncode, "".join(tail), _status(returncode, aborted, timed_out.is_set())
+
+async def _stream_async(command: list[str], cwd: Path, env: dict[str, str] | None, parser: LogParser,
+                        limits: ResourceLimits) -> tuple[int, str, CompileStatus]:
+    """ Same as `_stream` with an asyncio subprocess; cancelling it kills the process group """
+    tail: deque[str] = deque(maxlen=LOG_TAIL_LINES)
+    aborted = False
+    timed_out = False
+
+    process = await asyncio.create_subprocess_exec(
+        *rlimits(limits), *command, cwd=cwd, env=_pass_env(env), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT, start_new_session=os.name == "posix", limit=STREAM_LIMIT,
+    )
+
+    async def read() -> None:
+        nonlocal aborted
 
-        # First pdflatex run to generate aux files
+        while line := (await process.stdout.readline()).decode("utf-8", errors="replace"):
+            tail.append(line)
+            parser.feed(line)
+
+            if parser.should_abort:
+                aborted = True
+                return
+
+    try:
         try:
-            result = subprocess.run(
-                ['pdflatex', '-interaction=nonstopmode'] + output_arg + [file_path],
-                capture_output=True, text=True, check=False)
-
-            if result.returncode != 0:
-                raise Exception(result.stdout)
-
-        except subprocess.CalledProcessError as e:
-            error_output = e.stdout if e.stdout else "No error message available."
-            raise Exception(f"First compilation failed! Error output: {error_output}")
-
-        # BibTeX run if requested
-        if use_bibtex:
-            try:
-                # Change to output directory if specified, as that's where the .aux file is
-                if output_dir:
-                    os.chdir(output_dir)
-
-                result = subprocess.run(
-                    ['bibtex', file_name],
-                    capture_output=True, text=True, check=False)
-
-                # Return to file directory for subsequent pdflatex runs
-                if output_dir:
-                    os.chdir(file_dir)
-
-                if result.returncode != 0:
-                    raise Exception(result.stdout)
-
-            except subprocess.CalledProcessError as e:
-                error_output = e.stdout if e.stdout else "No error message available."
-                raise Exception(f"BibTeX compilation failed! Error output: {error_output}")
-
-            # Two more pdflatex runs to resolve references
-            for run in range(2):
-                try:
-                    result = subprocess.run(
-                        ['pdflatex', '-interaction=nonstopmode'] + output_arg + [file_path],
-                        capture_output=True, text=True, check=False)
-
-                    if result.returncode != 0:
-                        raise Exception(result.stdout)
-
-                except subprocess.CalledProcessError as e:
-                    error_output = e.stdout if e.stdout else "No error message available."
-                    raise Exception(f"LaTeX compilation run {run+2} failed! Error output: {error_output}")
-
-        if open_pdf and pdf_path.exists():
-            open_file(pdf_path)
-
-        if not keep_temp:
-            for ext in ['.aux', '.log', '.out', '.toc', '.lof', '.lot', '.bbl', '.blg', '.bcf', '.run.xml']:
-                temp_file = work_dir / f"{file_name}{ext}"
-                if temp_file.exists():
-                    temp_file.unlink()
-
-        if not keep_pdf and pdf_path.exists():
-            time.sleep(delete_dellay)
-            pdf_path.unlink()
+            await asyncio.wait_for(read(), timeout=limits.timeout)
+        except TimeoutError:
+            timed_out = True
 
+        if aborted or timed_out:
+            kill(process)
+
+        returncode = await process.wait()
     finally:
-        os.chdir(original_cwd)
+        # A no-op once the event loop reaped the process, see `kill`
+        kill(process)
+
+    return returncode, "".join(tail), _status(returncode, aborted, timed_out)
+
+def _pass_env(env: dict[str, str] | None) -> dict[str, str]:
+    env = dict(os.environ if env is None else env)
+    env["max_print_line"] = MAX_PRINT_LINE
+
+    return env
+
+def rlimits(limits: ResourceLimits) -> list[str]:
+    """
+    Command prefix applying the CPU-time and address-space limits (POSIX only).
+
+    The limits are computed here, in the parent, and capped at the current
+    hard limits. They are set by `prlimit`, or by `ulimit` in a shell when it
+    is missing, which then execs the command: no Python runs in the child
+    between fork and exec, which is unsafe while other threads hold locks.
+
+    Returns:
+        The prefix, empty if there is nothing to limit
+    """
+    if resource is None:
+        return []
+
+    cpu_time = memory = None
+    if limits.cpu_time is not None:
+        # The soft limit sends SIGXCPU, the hard one SIGKILL shortly after
+        cpu_time = _capped(resource.RLIMIT_CPU, limits.cpu_time, limits.cpu_time + 5)
+    if limits.memory is not None:
+        memory = _capped(resource.RLIMIT_AS, limits.memory, limits.memory)
+
+    if cpu_time is None and memory is None:
+        return []
+
+    prlimit = shutil.which("prlimit")
+    if prlimit is not None:
+        prefix = [prlimit]
+        if cpu_time is not None:
+            prefix.append(f"--cpu={cpu_time[0]}:{cpu_time[1]}")
+        if memory is not None:
+            prefix.append(f"--as={memory[0]}:{memory[1]}")
+
+        return prefix + ["--"]
+
+    # Soft before hard, a hard limit below the current soft one is refused
+    script = []
+    if cpu_time is not None:
+        script.append(f"ulimit -S -t {cpu_time[0]} && ulimit -H -t {cpu_time[1]}")
+    if memory is not None:
+        script.append(f"ulimit -S -v {memory[0] // 1024} && ulimit -H -v {memory[1] // 1024}")
+
+    return ["/bin/sh", "-c", " && ".join(script) + ' && exec "$@"', "sh"]
+
+def _capped(which: int, soft: int, hard: int) -> tuple[int, int]:
+    """ Soft and hard limit, capped at the current hard limit a child cannot raise """
+    current = resource.getrlimit(which)[1]
+    if current != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current), min(hard, current)
+
+    return soft, hard
+
+def kill(process: subprocess.Popen | asyncio.subprocess.Process) -> None:
+    """
+    Kills a process started by `_stream` together with its process group.
+
+    Nothing is sent once the process was reaped: its id, and so the id of
+    its group, may already belong to an unrelated process.
+    """
+    if process.returncode is not None:
+        return
+
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def _reap(process: subprocess.Popen) -> int:
+    """
+    Waits for a process and, on POSIX, kills what is left of its group first.
+
+    The exited process stays a zombie until it is reaped, which keeps its
+    group id reserved, so whatever the pass started cannot outlive it and
+    no other process can be hit.
+    """
+    if process.returncode is None and os.name == "posix":
+        try:
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        except ChildProcessError:
+            pass
+        else:
+            kill(process)
+
+    return process.wait()
 
 def compile_tex_from_string(tex: str, ** kwargs):
     """
     Compiles a LaTeX document provided as a string and handles optional compilation settings.
 
-    This function writes the LaTeX string to a temporary `.tex` file, compiles it using the `compile_tex`
-    function, and deletes the temporary file after the compilation process.
+    This function writes the LaTeX string to a `.tex` file in a fresh temporary directory,
+    compiles it using the `compile_tex` function, and deletes the directory afterwards, so
+    concurrent calls never share files.
 
     Args:
         tex: The LaTeX document content as a string.
@@ -134,20 +420,202 @@ def compile_tex_from_string(tex: str, ** kwargs):
             - open_pdf (bool): Whether to open the generated PDF after compilation (default: True).
             - keep_temp (bool): Whether to keep temporary files (default: False).
             - keep_pdf (bool): Whether to keep the generated PDF file (default: False).
+              Kept PDFs are written to the current directory unless output_dir is given.
             - output_dir (str | Path | None): The directory where output files should be stored (default: None).
             - delete_dellay (float): Delay in seconds before deleting the generated PDF file (default: 0.5).
 
     Raises:
         Exception: If there are errors during the compilation process.
     """
-    temp = Path("temp.tex")
+    if kwargs.get("keep_pdf") and kwargs.get("output_dir") is None:
+        kwargs["output_dir"] = Path.cwd()
+
+    with tempfile.TemporaryDirectory(prefix="texmorph-") as workspace:
+        temp = Path(workspace) / "temp.tex"
+
+        with open(temp, "w", encoding="utf-8") as f:
+            f.write(tex)
+
+        compile_tex(temp, **kwargs)
+
+def compile_job(job: CompileJob, index: int = 0) -> CompileResult:
+    """
+    Compiles one job in its own temporary workspace, never raises.
+
+    With `job.use_cache` the PDF comes from the CompileCache when the document
+    and every input file recorded by a previous compilation are unchanged.
+
+    Returns:
+        The PDF bytes, or its path when `job.output` is set, with the log and timing
+    """
+    start = time.perf_counter()
+    scheduler = None
+
+    with span("compile"):
+        try:
+            with tempfile.TemporaryDirectory(prefix="texmorph-") as workspace:
+                workspace = Path(workspace)
+
+                with span("compile.prepare"):
+                    scheduler, env, request, cached = _prepare(job, workspace)
+
+                if cached is not None:
+                    return _deliver(CompileResult(index=index, job=job, cached=True), cached,
+                                    time.perf_counter() - start)
+
+                log, diagnostics = drive(scheduler, env=env, max_errors=job.max_errors, limits=job.limits)
+                data = _collect(job, workspace, scheduler, request, log)
+
+                return _deliver(CompileResult(index=index, job=job, log=log, diagnostics=diagnostics,
+                                              passes=len(scheduler.passes)), data, time.perf_counter() - start)
+
+        except Exception as e:
+            return _failed(job, index, scheduler, e, time.perf_counter() - start)
+
+async def compile_job_async(job: CompileJob, index: int = 0) -> CompileResult:
+    """
+    Same as `compile_job`, without blocking the event loop.
 
-    with open(temp, "w") as f:
-        f.write(tex)
+    The preparation and the cache run in a thread, the passes as asyncio
+    subprocesses. Cancelling the task kills the running pass and its
+    children and removes the workspace.
+    """
+    start = time.perf_counter()
+    scheduler = None
+
+    with span("compile"):
+        try:
+            with tempfile.TemporaryDirectory(prefix="texmorph-") as workspace:
+                workspace = Path(workspace)
+
+                with span("compile.prepare"):
+                    scheduler, env, request, cached = await asyncio.to_thread(_prepare, job, workspace)
+
+                if cached is not None:
+                    return _deliver(CompileResult(index=index, job=job, cached=True), cached,
+                                    time.perf_counter() - start)
 
-    compile_tex(temp, **kwargs)
+                log, diagnostics = await drive_async(scheduler, env=env, max_errors=job.max_errors, limits=job.limits)
+                data = await asyncio.to_thread(_collect, job, workspace, scheduler, request, log)
 
-    temp.unlink()
+                return _deliver(CompileResult(index=index, job=job, log=log, diagnostics=diagnostics,
+                                              passes=len(scheduler.passes)), data, time.perf_counter() - start)
+
+        except Exception as e:
+            return _failed(job, index, scheduler, e, time.perf_counter() - start)
+
+async def compile_tex_async(tex: str, **kwargs) -> CompileResult:
+    """
+    Compiles a LaTeX document given as a string, without blocking the event loop.
+
+    Args:
+        tex: The LaTeX document content
+        **kwargs: Options of the CompileJob, e.g. `use_bibtex`, `resources` or `limits`
+    """
+    return await compile_job_async(CompileJob(tex=tex, **kwargs))
+
+def _prepare(job: CompileJob, workspace: Path) -> tuple[PassScheduler, dict[str, str], str | None, bytes | None]:
+    """
+    Checks the toolchain, dumps the preamble and writes the document into the workspace.
+
+    Returns:
+        The scheduler of the passes, their environment, the CompileCache request key and the cached PDF if any
+    """
+    if job.tex is not None:
+        tex = job.tex
+        file_path = workspace / f"{job.name}.tex"
+    else:
+        file_path = job.source.resolve()
+        if not file_path.exists():
+            raise FileNotFoundError(f"File {file_path} not found.")
+        tex = file_path.read_text(encoding="utf-8")
+
+    resources = job.resources or file_path.parent
+    preflight(tex, search_dirs=[resources], use_bibtex=job.use_bibtex)
+
+    env = search_env(resources)
+    fmt = None
+
+    if job.dump_preamble:
+        formats = FormatDumpCache.default()
+        tex, fmt = formats.prepare(tex, search_dirs=[resources])
+        if fmt is not None:
+            env = formats.env(env)
+
+    # A source file is copied into the workspace only when its preamble was rewritten
+    if fmt is not None and job.source is not None:
+        file_path = workspace / file_path.name
+    if file_path.parent == workspace:
+        file_path.write_text(tex, encoding="utf-8")
+
+    scheduler = PassScheduler(file_path, workspace, use_bibtex=job.use_bibtex, search_dirs=[resources],
+                              fmt=fmt, recorder=job.use_cache)
+
+    if not job.use_cache:
+        return scheduler, env, None, None
+
+    request = CompileCache.request_key(tex, file_path.name, scheduler.flags,
+                                       probe().version("pdflatex"), job.use_bibtex)
+
+    return scheduler, env, request, CompileCache.default().lookup(request)
+
+def _collect(job: CompileJob, workspace: Path, scheduler: PassScheduler, request: str | None, log: str) -> bytes:
+    """ Reads the PDF of the last pass and stores it in the CompileCache """
+    stem = scheduler.file_path.stem
+
+    pdf = workspace / f"{stem}.pdf"
+    if not pdf.exists():
+        raise Exception(f"pdflatex produced no PDF. Output: {log}")
+
+    data = pdf.read_bytes()
+    if request is not None:
+        inputs = recorded_inputs(workspace / f"{stem}.fls", exclude=workspace)
+        CompileCache.default().store(request, data, inputs + scheduler.bib_inputs(), tag=probe().version("pdflatex"))
+
+    return data
+
+def _failed(job: CompileJob, index: int, scheduler: PassScheduler | None, error: Exception,
+            elapsed: float) -> CompileResult:
+    passes = len(scheduler.passes) if scheduler is not None else 0
+
+    if isinstance(error, CompilationError):
+        return CompileResult(index=index, job=job, log=error.log, diagnostics=error.diagnostics, status=error.status,
+                             passes=passes, error=str(error), elapsed=elapsed)
+
+    return CompileResult(index=index, job=job, passes=passes, error=str(error), status=CompileStatus.FAILED,
+                         elapsed=elapsed)
+
+def _deliver(result: CompileResult, pdf: bytes, elapsed: float) -> CompileResult:
+    """ Writes the PDF to the job output, or attaches its bytes to the result """
+    if result.job.output is not None:
+        result.job.output.parent.mkdir(parents=True, exist_ok=True)
+        result.job.output.write_bytes(pdf)
+        result.pdf_path = result.job.output
+    else:
+        result.pdf = pdf
+
+    result.elapsed = elapsed
+
+    return result
+
+def compile_many(jobs: Iterable[CompileJob], max_workers: int | None = None) -> list[CompileResult]:
+    """
+    Compiles jobs in parallel, each in its own workspace.
+
+    The work happens in pdflatex subprocesses, so a thread pool is enough to
+    keep `max_workers` compilations running at once.
+
+    Args:
+        jobs: The documents to compile
+        max_workers: Number of concurrent compilations. Defaults to the CPU count.
+
+    Returns:
+        One result per job, in the order of `jobs`
+    """
+    jobs = list(jobs)
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as pool:
+        return list(pool.map(compile_job, jobs, range(len(jobs))))
 
 def open_file(file_path: Path | str):
     """
@@ -167,49 +635,31 @@ def open_file(file_path: Path | str):
             subprocess.run(['xdg-open', file_path])
 
 def check_bibtex() -> tuple[bool, str]:
-    """Check if bibtex is installed and return its version."""
-    try:
-        result = subprocess.run(['bibtex', '--version'],
-                                capture_output=True, text=True, check=False)
-        return True, result.stdout.strip()
-    except (subprocess.SubprocessError, FileNotFoundError):
+    """Check if bibtex is installed and return its version, without spawning a process once probed."""
+    toolchain = probe()
+
+    if not toolchain.has("bibtex"):
         return False, "BibTeX not found"
 
+    return True, toolchain.version("bibtex")
+
 def check_pdflatex() -> tuple[bool, str | None]:
     """
     Checks the availability of the `pdflatex` executable and its distribution.
 
-    This function determines if the `pdflatex` command is available on the system.
-    If available, it checks the version information to identify the LaTeX
-    distribution (e.g., MiKTeX, TeX Live, or MacTeX). If the `pdflatex` executable
-    is not found, or an error occurs during version checking, the function
-    indicates failure.
+    The answer comes from the cached toolchain probe, see `utils.toolchain.probe`.
 
     :return: A tuple where the first element is a boolean indicating whether the
              `pdflatex` command is available, and the second element is a string
              specifying the detected distribution name or None if unavailable.
     :rtype: tuple[bool, str | None]
     """
-    pdflatex_path = shutil.which("pdflatex")
-    if pdflatex_path is None:
-        return False, None
+    toolchain = probe()
 
-    try:
-        output = subprocess.check_output(["pdflatex", "--version"], text=True)
-        output_lower = output.lower()
-
-        match True:
-            case _ if "miktex" in output_lower:
-                return True, "MiKTeX"
-            case _ if "tex live" in output_lower:
-                return True, "TeX Live"
-            case _ if "mactex" in output_lower:
-                return True, "MacTeX"
-            case _:
-                return True, "Unknown distribution"
-
-    except subprocess.CalledProcessError:
+    if not toolchain.has("pdflatex"):
         return False, None
 
+    return True, toolchain.distribution
+
 if __name__ == "__main__":
     compile_tex("../data/TEST/test_file.tex")
\ No newline at end of file
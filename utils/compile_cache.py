@@ -0,0 +1,145 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Iterable
+
+from utils.cache import CACHE_DIR, CacheStats, DiskCache
+
+class CompileCache(DiskCache):
+    """
+    PDFs of previous compilations, keyed on every file the compilation read.
+
+    A compilation is first identified by a request key (the document, the
+    engine version and the flags). The first time it runs with `-recorder`,
+    the input files listed in its .fls (classes, packages, fonts, the format,
+    included files, plus the .bib/.bst read by bibtex) are stored under the
+    request key. A later lookup hashes those files again and only returns the
+    cached PDF if none of them changed.
+
+    Entries are tagged with the engine version. `stats` counts PDF hits and
+    misses, one per `lookup`.
+    """
+    _default: 'CompileCache | None' = None
+    _default_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, path: Path | str = CACHE_DIR / "compile.sqlite", max_size: int = 1024 * 1024 * 1024):
+        super().__init__(path, max_size=max_size)
+
+        self._pdf_hits   : int = 0
+        self._pdf_misses : int = 0
+        self._digests    : dict[str, tuple[int, int, str]] = {}
+        self._memo_lock  : threading.Lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> 'CompileCache':
+        """ Returns the process-wide cache in CACHE_DIR """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+
+        return cls._default
+
+    @staticmethod
+    def request_key(tex: str, name: str, flags: list[str], engine: str, use_bibtex: bool) -> str:
+        payload = json.dumps([tex, name, flags, engine, use_bibtex])
+
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, request_key: str) -> bytes | None:
+        """ Returns the cached PDF if the recorded inputs of the request are unchanged """
+        pdf = None
+
+        manifest = self.get(f"inputs:{request_key}")
+        if manifest is not None:
+            digest = self._digest(json.loads(manifest))
+            if digest is not None:
+                pdf = self.get(f"pdf:{request_key}:{digest}")
+
+        with self._lock:
+            if pdf is None:
+                self._pdf_misses += 1
+            else:
+                self._pdf_hits += 1
+
+        return pdf
+
+    def store(self, request_key: str, pdf: bytes, inputs: Iterable[Path], tag: str = "") -> None:
+        """ Records the inputs of a compilation and its PDF """
+        paths = sorted({str(Path(p).resolve()) for p in inputs})
+
+        digest = self._digest(paths)
+        if digest is None:
+            return
+
+        self.set(f"inputs:{request_key}", json.dumps(paths).encode("utf-8"), tag=tag)
+        self.set(f"pdf:{request_key}:{digest}", pdf, tag=tag)
+
+    @property
+    def stats(self) -> CacheStats:
+        stats = super().stats
+        stats.hits, stats.misses = self._pdf_hits, self._pdf_misses
+
+        return stats
+
+    def _digest(self, paths: list[str]) -> str | None:
+        """ Hash of the contents of every file, None if one of them is gone """
+        digest = hashlib.sha256()
+
+        for path in paths:
+            file_digest = self._file_digest(path)
+            if file_digest is None:
+                return None
+
+            digest.update(f"{path}\0{file_digest}\n".encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def _file_digest(self, path: str) -> str | None:
+        """ Content hash of a file, recomputed only when its size or mtime changed """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self._memo_lock:
+            memo = self._digests.get(path)
+        if memo is not None and memo[:2] == (stat.st_mtime_ns, stat.st_size):
+            return memo[2]
+
+        with open(path, "rb") as f:
+            file_digest = hashlib.file_digest(f, "sha256").hexdigest()
+
+        with self._memo_lock:
+            self._digests[path] = (stat.st_mtime_ns, stat.st_size, file_digest)
+
+        return file_digest
+
+def recorded_inputs(fls_path: Path, exclude: Path | None = None) -> list[Path]:
+    """
+    Reads the input files listed in a pdflatex `-recorder` .fls file.
+
+    Args:
+        fls_path: The .fls file
+        exclude: Directory whose files are left out, e.g. the workspace holding generated files
+    """
+    if not fls_path.exists():
+        return []
+
+    pwd = fls_path.parent
+    inputs: list[Path] = []
+    exclude = exclude.resolve() if exclude is not None else None
+
+    for line in fls_path.read_text(encoding="utf-8", errors="replace").splitlines():
+        if line.startswith("PWD "):
+            pwd = Path(line[4:].strip())
+        elif line.startswith("INPUT "):
+            path = (pwd / line[6:].strip()).resolve()
+
+            if exclude is not None and path.is_relative_to(exclude):
+                continue
+
+            inputs.append(path)
+
+    return list(dict.fromkeys(inputs))
@@ -1,7 +1,23 @@
+import os
+import re
+import sys
 import time
+import argparse
 import functools
+import subprocess
+from pathlib import Path
 import rich
 
+ROOT: Path = Path(__file__).resolve().parent.parent
+
+# Seconds `import core.convert` may take in a fresh interpreter
+IMPORT_BUDGET: float = 1.0
+
+# Packages which must only be imported on first use, never at startup
+LAZY_MODULES: tuple[str, ...] = ("llama_index", "groq", "openai", "spacy", "torch", "transformers")
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
 def compiling_timer(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
@@ -14,3 +30,69 @@ def compiling_timer(func):
         return result
 
     return wrapper
+
+def import_profile(module: str, runs: int = 3) -> dict[str, float]:
+    """
+    Cumulative import time in seconds of every module loaded by `import module`.
+
+    Each run imports the module in a fresh interpreter with `python -X importtime`;
+    the fastest run is kept to filter out noise.
+
+    Raises:
+        Exception: If the module cannot be imported
+    """
+    best: dict[str, float] | None = None
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, env=os.environ | {"PYTHONPATH": str(ROOT)}, capture_output=True, text=True, check=False,
+        )
+        if result.returncode != 0:
+            raise Exception(f"Importing {module} failed! Error output: {result.stderr[-2000:]}")
+
+        profile: dict[str, float] = {}
+        for line in result.stderr.splitlines():
+            match = _IMPORT_TIME.match(line)
+            if match is not None:
+                profile[match.group(4)] = int(match.group(2)) / 1_000_000
+
+        if best is None or profile.get(module, 0.0) < best.get(module, 0.0):
+            best = profile
+
+    return best or {}
+
+def check_import_budget(module: str = "core.convert", budget: float = IMPORT_BUDGET,
+                        lazy: tuple[str, ...] = LAZY_MODULES, runs: int = 3) -> tuple[bool, str]:
+    """
+    Checks that importing a module stays under `budget` seconds and loads none of the `lazy` packages.
+
+    Returns:
+        Whether the check passed and a report with the slowest imports
+    """
+    profile = import_profile(module, runs=runs)
+    total = profile.get(module, 0.0)
+
+    loaded = sorted({name.split(".")[0] for name in profile} & set(lazy))
+    slowest = sorted(profile.items(), key=lambda item: item[1], reverse=True)[:10]
+
+    lines = [f"import {module}: {total:.3f}s (budget {budget:.3f}s)"]
+    lines += [f"    {seconds:.3f}s  {name}" for name, seconds in slowest]
+    if loaded:
+        lines.append(f"[WARNING] imported at startup but should load lazily: {', '.join(loaded)}")
+
+    return total <= budget and not loaded, "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the startup import cost of a module.")
+    parser.add_argument("module", nargs="?", default="core.convert")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET, help="seconds")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    ok, report = check_import_budget(args.module, args.budget, runs=args.runs)
+    print(report)
+
+    if not ok:
+        print(f"[WARNING] import budget of {args.module} exceeded")
+        sys.exit(1)
@@ -15,12 +15,106 @@ def get_sections(node: ts.TexSoup):
 
 def get_required(node: ts.TexNode) -> list[str]:
     return [
-        field.string for field in node.args
+        str(field.string) for field in node.args
         if isinstance(field, ts.data.BraceGroup)
     ]
 
 def get_optionals(node: ts.TexNode) -> list[str]:
     return [
-        field.string for field in node.args
+        str(field.string) for field in node.args
         if isinstance(field, ts.data.BracketGroup)
     ]
+
+class DocumentIndex:
+    """
+    Preamble, metadata and bibliography elements of a document.
+
+    Gathered in a single traversal so consumers do not each run their own
+    full-tree `find`/`find_all` searches. Matches follow TexSoup's search
+    order, so `index.title` is the node `soup.title` would return.
+    """
+    BIBLIOGRAPHY: set[str] = {"bibliography", "bibliographystyle", "addbibresource", "thebibliography"}
+
+    def __init__(self, soup: ts.TexSoup):
+        self.doc_class    : ts.TexNode | None = None
+        self.title        : ts.TexNode | None = None
+        self.abstract     : ts.TexNode | None = None
+        self.document     : ts.TexNode | None = None
+        self.packages     : list[ts.TexNode]  = []
+        self.authors      : list[ts.TexNode]  = []
+        self.bibliography : dict[str, list[ts.TexNode]] = {name: [] for name in self.BIBLIOGRAPHY}
+
+        first: dict[str, str] = {
+            "documentclass" : "doc_class",
+            "title"         : "title",
+            "abstract"      : "abstract",
+            "document"      : "document",
+        }
+
+        for node in soup.descendants:
+            name = getattr(node, "name", None)
+
+            if name in first:
+                if getattr(self, first[name]) is None:
+                    setattr(self, first[name], node)
+            elif name == "usepackage":
+                self.packages.append(node)
+            elif name == "author":
+                self.authors.append(node)
+            elif name in self.BIBLIOGRAPHY:
+                self.bibliography[name].append(node)
+
+    @property
+    def requires_bibfile(self) -> bool:
+        """ Whether the document runs bibtex on a .bib file, biblatex (`\\addbibresource`) needs biber instead """
+        return bool(self.bibliography["bibliography"])
+
+def get_span(node: ts.TexNode, source: str) -> tuple[int, int]:
+    """
+    Returns the (start, end) offsets of a node in the source it was parsed from.
+
+    The end is found by following the last argument/content of each expression
+    instead of serialising the subtree, so the cost is proportional to the
+    nesting depth rather than the size of the node. Returns (-1, -1) when
+    the node carries no position information.
+    """
+    expr = node.expr if isinstance(node, ts.TexNode) else node
+
+    if getattr(expr, "position", -1) < 0:
+        return -1, -1
+
+    end = _get_end(expr, source)
+    if end < 0:
+        return -1, -1
+
+    return expr.position, end
+
+def _get_end(expr: ts.data.TexExpr, source: str) -> int:
+    if isinstance(expr, ts.data.TexText):
+        return expr.position + len(expr._text)
+
+    if not isinstance(expr, ts.data.TexExpr):
+        return expr.position + len(str(expr))     # raw token
+
+    if isinstance(expr, ts.data.TexEnv):
+        end = expr.position + len(expr.begin)
+    else:
+        end = expr.position + 1 + len(expr.name)
+
+    last = expr._contents[-1] if expr._contents else (expr.args[-1] if expr.args else None)
+    if last is not None:
+        if getattr(last, "position", -1) < 0:
+            return -1
+
+        end = _get_end(last, source)
+        if end < 0:
+            return -1
+
+    if isinstance(expr, ts.data.TexEnv) and expr.end:
+        close = source.find(expr.end, end)
+        if close < 0:
+            return -1
+
+        end = close + len(expr.end)
+
+    return end
@@ -0,0 +1,179 @@
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+from utils.cache import CACHE_DIR
+from utils.toolchain import probe, find_file
+
+FORMAT_DIR: Path = CACHE_DIR / "formats"
+
+# Packages which do not survive being dumped into a format, they and everything after them stay in the document
+NOT_DUMPABLE: set[str] = {"hyperref", "biblatex", "minted", "pdfx", "fontspec", "polyglossia", "bookmark"}
+
+_DOCUMENT_CLASS = re.compile(r"^\s*\\documentclass\s*(\[[^\]]*\])?\s*\{([^}]*)\}\s*(%.*)?$")
+_PACKAGE = re.compile(r"^\s*\\(usepackage|RequirePackage)\s*(\[[^\]]*\])?\s*\{([^}]*)\}\s*(%.*)?$")
+_SKIPPABLE = re.compile(r"^\s*(%.*)?$")
+
+class FormatDumpCache:
+    """
+    Precompiled preambles, one pdflatex format per document class and package set.
+
+    The leading `\\documentclass` and `\\usepackage` lines of a document are
+    dumped once with `pdflatex -ini` and every later document starting with
+    the same lines is compiled with `-fmt`, so the class and packages are not
+    loaded again. Dumps are keyed on those lines, the contents of the class
+    file and the engine version, so editing the class or the package list
+    builds a new format.
+
+    Args:
+        directory: Where the .fmt files are kept
+        search_dirs: Directories searched for local class files before kpsewhich
+    """
+    _default: 'FormatDumpCache | None' = None
+
+    def __init__(self, directory: Path | str = FORMAT_DIR, search_dirs: list[Path] | None = None):
+        self.directory   : Path       = Path(directory)
+        self.search_dirs : list[Path] = search_dirs or []
+
+        self._locks      : dict[str, threading.Lock] = {}
+        self._guard      : threading.Lock            = threading.Lock()
+
+    @classmethod
+    def default(cls) -> 'FormatDumpCache':
+        """ Returns the process-wide format cache in FORMAT_DIR """
+        if cls._default is None:
+            cls._default = cls()
+
+        return cls._default
+
+    def prepare(self, tex: str, search_dirs: list[Path] | None = None) -> tuple[str, str | None]:
+        """
+        Returns the document to compile and the name of the format to compile it with.
+
+        The dumped lines are commented out rather than removed so line numbers
+        in the log still match the source. If there is nothing to dump or the
+        dump fails, the document is returned unchanged with no format.
+        """
+        lines = tex.splitlines(keepends=True)
+        count, class_name = split_preamble(lines)
+        if count == 0:
+            return tex, None
+
+        preamble = "".join(lines[:count])
+        dirs = (search_dirs or []) + self.search_dirs
+
+        try:
+            name = self.build(preamble, class_name, dirs)
+        except Exception as e:
+            print(f"[WARNING] Could not dump the preamble, compiling without a format: {e}")
+            return tex, None
+
+        body = "".join("%" + line if not _SKIPPABLE.match(line) else line for line in lines[:count])
+
+        return body + "".join(lines[count:]), name
+
+    def build(self, preamble: str, class_name: str, search_dirs: list[Path] | None = None) -> str:
+        """ Dumps the preamble if no format for it exists yet, returns the format name """
+        name = f"texmorph-{self.key(preamble, class_name, search_dirs)[:20]}"
+        fmt = self.directory / f"{name}.fmt"
+
+        if fmt.exists():
+            return name
+
+        with self._lock(name):
+            if fmt.exists():
+                return name
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            with tempfile.TemporaryDirectory(prefix="texmorph-fmt-") as workspace:
+                workspace = Path(workspace)
+                (workspace / f"{name}.tex").write_text(preamble + "\n\\dump\n", encoding="utf-8")
+
+                env = dict(os.environ)
+                if search_dirs:
+                    paths = os.pathsep.join(str(d) for d in search_dirs) + os.pathsep
+                    env["TEXINPUTS"] = paths + env.get("TEXINPUTS", "")
+
+                result = subprocess.run(
+                    ['pdflatex', '-ini', '-interaction=nonstopmode', f'-jobname={name}', '&pdflatex', f'{name}.tex'],
+                    cwd=workspace, env=env, capture_output=True, text=True, check=False,
+                )
+
+                dumped = workspace / f"{name}.fmt"
+                if result.returncode != 0 or not dumped.exists():
+                    raise Exception(f"Format dump failed! Error output: {result.stdout}")
+
+                # Atomic, so concurrent processes never see a partial format
+                tmp = self.directory / f"{name}.fmt.{os.getpid()}.tmp"
+                shutil.copyfile(dumped, tmp)
+                os.replace(tmp, fmt)
+
+            print(f"INFO - dumped preamble format {name}")
+
+        return name
+
+    def key(self, preamble: str, class_name: str, search_dirs: list[Path] | None = None) -> str:
+        digest = hashlib.sha256()
+        digest.update(probe().version("pdflatex").encode("utf-8"))
+        digest.update(preamble.encode("utf-8"))
+
+        class_file = find_file(f"{class_name}.cls", search_dirs or [])
+        if class_file is not None:
+            digest.update(class_file.read_bytes())
+
+        return digest.hexdigest()
+
+    def env(self, env: dict[str, str] | None = None) -> dict[str, str]:
+        """ The environment with the format directory prepended to TEXFORMATS """
+        env = dict(os.environ if env is None else env)
+        env["TEXFORMATS"] = str(self.directory) + os.pathsep + env.get("TEXFORMATS", "")
+
+        return env
+
+    def clear(self) -> None:
+        for fmt in self.directory.glob("texmorph-*.fmt"):
+            fmt.unlink()
+
+    def _lock(self, name: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+def split_preamble(lines: list[str]) -> tuple[int, str | None]:
+    """
+    Finds the leading \\documentclass and \\usepackage lines which can be dumped.
+
+    Returns:
+        The number of leading lines to dump (0 if none) and the document class name
+    """
+    count = 0
+    class_name = None
+
+    for i, line in enumerate(lines):
+        if _SKIPPABLE.match(line):
+            continue
+
+        if class_name is None:
+            match = _DOCUMENT_CLASS.match(line)
+            if match is None:
+                return 0, None
+            class_name = match.group(2).strip()
+            count = i + 1
+            continue
+
+        match = _PACKAGE.match(line)
+        if match is None:
+            break
+
+        packages = {name.strip() for name in match.group(3).split(",")}
+        if packages & NOT_DUMPABLE:
+            break
+
+        count = i + 1
+
+    return count, class_name
@@ -0,0 +1,328 @@
+import re
+import hashlib
+import threading
+from pathlib import Path
+
+from models.types import PassKind
+from models.compile import CompilePass
+from utils.cache import CACHE_DIR, DiskCache
+from utils.compile_cache import recorded_inputs
+
+# Auxiliary files read back by the next pass; a pass that leaves them unchanged reached the fixpoint
+FIXPOINT_EXTENSIONS: tuple[str, ...] = ('.aux', '.toc', '.out', '.lof', '.lot')
+
+# Commands whose output only appears once the auxiliary files of a previous pass exist
+CROSS_REFERENCES = re.compile(
+    r"\\(ref|eqref|pageref|autoref|cref|Cref|nameref|cite[a-z]*|nocite|tableofcontents|listoffigures|listoftables)\b"
+)
+
+RERUN = re.compile(r"Rerun to get|Label\(s\) may have changed|Please rerun LaTeX|Rerun LaTeX")
+
+# Files whose text is part of the document: \input{chapter}, \input chapter, \include{chapter}, \subfile{chapter}
+_INCLUDES = re.compile(r"^[^%\n]*?\\(?:input|include|subfile)(?:\{([^}]+)\}|\s+([^\s{}\\%]+))", re.MULTILINE)
+
+_BIB_LINES = re.compile(r"^\\(citation|bibdata|bibstyle)\{([^}]*)\}", re.MULTILINE)
+
+# Auxiliary files of \include'd chapters, which bibtex reads along with the main one
+_AUX_INPUTS = re.compile(r"^\\@input\{([^}]+)\}", re.MULTILINE)
+
+class BibliographyCache(DiskCache):
+    """
+    .bbl files written by bibtex, keyed on the digest of everything bibtex read.
+
+    The key covers the citation, style and database lines of the .aux files
+    and the contents of the .bib/.bst files they name, so a hit is the .bbl
+    bibtex would write again, whatever workspace the document compiles in.
+    """
+    _default: 'BibliographyCache | None' = None
+    _default_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, path: Path | str = CACHE_DIR / "bibliography.sqlite", max_size: int = 64 * 1024 * 1024):
+        super().__init__(path, max_size=max_size)
+
+    @classmethod
+    def default(cls) -> 'BibliographyCache':
+        """ Returns the process-wide cache in CACHE_DIR """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+
+        return cls._default
+
+class PassScheduler:
+    """
+    Decides which pdflatex/bibtex passes a document needs.
+
+    The scheduler does no IO on processes: a driver asks `next_pass` for the
+    next command, runs it however it likes and hands the output to `record`,
+    until `next_pass` returns None.
+
+    - Passes known not to be the last run with `-draftmode`, which skips
+      writing the PDF. A document that reads no auxiliary data compiles in a
+      single pass.
+    - BibTeX is skipped when a run with the same citations, styles and .bib
+      files seen in the .aux is in the BibliographyCache; its .bbl is copied
+      into the work directory instead.
+    - pdflatex reruns until the auxiliary files reach a fixpoint and the log
+      no longer asks for a rerun, bounded by `max_passes`.
+
+    Args:
+        file_path: Absolute path to the .tex file
+        work_dir: Directory receiving the auxiliary files and the PDF
+        use_bibtex: Whether to use BibTeX for bibliography processing
+        max_passes: Maximum number of pdflatex passes
+        search_dirs: Directories searched for .bib and .bst files
+        fmt: Name of a precompiled format to run pdflatex with
+        recorder: Run pdflatex with `-recorder` so it lists the files it read in a .fls file
+        bib_cache: Cache of the .bbl files, the BibliographyCache default if None
+    """
+    def __init__(self, file_path: Path, work_dir: Path, use_bibtex: bool = False, max_passes: int = 5,
+                 search_dirs: list[Path] | None = None, fmt: str | None = None, recorder: bool = False,
+                 bib_cache: DiskCache | None = None):
+        self.file_path   : Path       = file_path
+        self.work_dir    : Path       = work_dir
+        self.use_bibtex  : bool       = use_bibtex
+        self.max_passes  : int        = max_passes
+        self.search_dirs : list[Path] = [file_path.parent, work_dir, *(search_dirs or [])]
+        self.fmt         : str | None = fmt
+        self.recorder    : bool       = recorder
+        self.bib_cache   : DiskCache | None = bib_cache
+
+        self.passes      : list[CompilePass] = []
+        self.skipped     : list[PassKind]    = []
+        self.done        : bool              = False
+
+        self._latex_runs     : int                    = 0
+        self._bibtex_due     : bool                   = False
+        self._after_bibtex   : bool                   = False
+        self._bib_digest     : str | None             = None
+        self._snapshot       : dict[str, str | None]  = self._take_snapshot()
+        self._cross_refs     : bool                   = self._reads_auxiliary_data()
+
+    @property
+    def flags(self) -> list[str]:
+        """ pdflatex options shared by every pass """
+        return ([f'-fmt={self.fmt}'] if self.fmt else []) + (['-recorder'] if self.recorder else [])
+
+    def next_pass(self) -> CompilePass | None:
+        """ The next command to run, or None when the PDF is final """
+        if self.done:
+            return None
+
+        if self._bibtex_due:
+            step = CompilePass(
+                kind=PassKind.BIBTEX,
+                command=['bibtex', self.file_path.stem],
+                cwd=self.work_dir,
+                number=len(self.passes) + 1,
+            )
+        else:
+            draft = self._predict_rerun()
+            step = CompilePass(
+                kind=PassKind.LATEX,
+                command=['pdflatex', '-interaction=nonstopmode', '-file-line-error'] + self.flags
+                        + (['-draftmode'] if draft else [])
+                        + ['-output-directory', str(self.work_dir), str(self.file_path)],
+                cwd=self.file_path.parent,
+                draft=draft,
+                number=len(self.passes) + 1,
+            )
+
+        self.passes.append(step)
+
+        return step
+
+    def record(self, output: str) -> None:
+        """ Takes the console output of the pass returned by the last `next_pass` """
+        step = self.passes[-1]
+
+        if step.kind == PassKind.BIBTEX:
+            self._bibtex_due = False
+            self._after_bibtex = True
+            self._store_bbl()
+            return
+
+        self._latex_runs += 1
+        snapshot = self._take_snapshot()
+        changed = snapshot != self._snapshot
+        self._snapshot = snapshot
+
+        if self._latex_runs == 1 and not self._cross_refs:
+            # Text read from files the static scan did not find, e.g. through \InputIfFileExists
+            self._cross_refs = self._reads_recorded_auxiliary_data()
+
+        if self.use_bibtex and self._latex_runs == 1:
+            self._bibtex_due = not self._restore_bbl()
+            if not self._bibtex_due:
+                self.skipped.append(PassKind.BIBTEX)
+                print(f"INFO - bibliography of {self.file_path.name} unchanged, skipping bibtex")
+            return
+
+        if step.draft:
+            # A draft pass wrote no PDF, so at least one more pass follows
+            self._after_bibtex = False
+            if self._latex_runs >= self.max_passes:
+                self.max_passes += 1
+            return
+
+        self._after_bibtex = False
+        rerun = RERUN.search(output) is not None
+
+        if not rerun and not (self._cross_refs and changed):
+            self.done = True
+        elif self._latex_runs >= self.max_passes:
+            print(f"[WARNING] {self.file_path.name} did not reach a fixpoint after {self._latex_runs} passes")
+            self.done = True
+
+    def _predict_rerun(self) -> bool:
+        """ Whether another pdflatex pass is certain to follow the next one """
+        if self._latex_runs == 0:
+            return self.use_bibtex or self._cross_refs
+
+        return self._after_bibtex and self._latex_runs + 1 < self.max_passes
+
+    def _reads_auxiliary_data(self) -> bool:
+        """ Whether the document or a file it inputs uses cross-references, True if one cannot be read """
+        pending: list[Path] = [self.file_path]
+        seen: set[Path] = set()
+
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+
+            try:
+                text = path.read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                return True
+
+            if CROSS_REFERENCES.search(text) is not None:
+                return True
+
+            for braced, bare in _INCLUDES.findall(text):
+                name = (braced or bare).strip()
+                found = self._find(name) or self._find(f"{name}.tex")
+                if found is not None:
+                    pending.append(found)
+                elif not name.endswith((".sty", ".cls")):
+                    return True
+
+        return False
+
+    def _reads_recorded_auxiliary_data(self) -> bool:
+        """ Whether a .tex file pdflatex recorded reading, outside of the TeX tree, uses cross-references """
+        fls = self.work_dir / f"{self.file_path.stem}.fls"
+        roots = [directory.resolve() for directory in self.search_dirs]
+
+        for path in recorded_inputs(fls):
+            if path.suffix != ".tex" or path == self.file_path.resolve():
+                continue
+            if not any(path.is_relative_to(root) for root in roots):
+                continue
+
+            try:
+                if CROSS_REFERENCES.search(path.read_text(encoding="utf-8", errors="replace")) is not None:
+                    return True
+            except OSError:
+                return True
+
+        return False
+
+    def _take_snapshot(self) -> dict[str, str | None]:
+        snapshot: dict[str, str | None] = {}
+
+        for ext in FIXPOINT_EXTENSIONS:
+            path = self.work_dir / f"{self.file_path.stem}{ext}"
+            snapshot[ext] = hashlib.sha256(path.read_bytes()).hexdigest() if path.exists() else None
+
+        return snapshot
+
+    @property
+    def _bbl_path(self) -> Path:
+        return self.work_dir / f"{self.file_path.stem}.bbl"
+
+    def bib_inputs(self) -> list[Path]:
+        """ The .bib and .bst files named by the .aux which exist in the search directories """
+        inputs: list[Path] = []
+
+        for command, argument in _BIB_LINES.findall(self._read_aux()):
+            if command == "bibdata":
+                names = [(name.strip(), ".bib") for name in argument.split(",")]
+            elif command == "bibstyle":
+                names = [(argument.strip(), ".bst")]
+            else:
+                continue
+
+            for name, ext in names:
+                path = self._find(name if name.endswith(ext) else name + ext)
+                if path is not None:
+                    inputs.append(path)
+
+        return inputs
+
+    def _bib_key(self) -> str:
+        """ Hash of the citation data of the .aux and of the .bib/.bst files it names """
+        digest = hashlib.sha256()
+
+        for command, argument in _BIB_LINES.findall(self._read_aux()):
+            digest.update(f"{command}:{argument}\n".encode("utf-8"))
+
+        for path in self.bib_inputs():
+            digest.update(f"{path.name}\0".encode("utf-8"))
+            digest.update(path.read_bytes())
+
+        return digest.hexdigest()
+
+    def _read_aux(self) -> str:
+        """ The main .aux followed by the .aux files it inputs, in the order bibtex reads them """
+        texts: list[str] = []
+        pending: list[Path] = [self.work_dir / f"{self.file_path.stem}.aux"]
+        seen: set[Path] = set()
+
+        while pending:
+            aux = pending.pop(0)
+            if aux in seen or not aux.exists():
+                continue
+            seen.add(aux)
+
+            text = aux.read_text(encoding="utf-8", errors="replace")
+            texts.append(text)
+            pending.extend(self.work_dir / name for name in _AUX_INPUTS.findall(text))
+
+        return "".join(texts)
+
+    def _find(self, name: str) -> Path | None:
+        for directory in self.search_dirs:
+            path = directory / name
+            if path.exists():
+                return path
+
+        return None
+
+    def _cache(self) -> DiskCache:
+        if self.bib_cache is None:
+            self.bib_cache = BibliographyCache.default()
+
+        return self.bib_cache
+
+    def _restore_bbl(self) -> bool:
+        """ Copies the cached .bbl of the current citation data into the work directory, False on a miss """
+        self._bib_digest = self._bib_key()
+
+        bbl = self._cache().get(f"bbl:{self._bib_digest}")
+        if bbl is None:
+            return False
+
+        if not self._bbl_path.exists() or self._bbl_path.read_bytes() != bbl:
+            self._bbl_path.write_bytes(bbl)
+            # The first pass ran without this bibliography, as if bibtex had just run
+            self._after_bibtex = True
+
+        return True
+
+    def _store_bbl(self) -> None:
+        if self._bib_digest is None or not self._bbl_path.exists():
+            return
+
+        self._cache().set(f"bbl:{self._bib_digest}", self._bbl_path.read_bytes())
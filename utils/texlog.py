@@ -0,0 +1,177 @@
+import re
+
+from models.types import PassKind, DiagnosticKind, CompileStatus
+from models.compile import Diagnostic
+
+# Wide enough that TeX does not wrap log lines, so every message stays on one line
+MAX_PRINT_LINE: str = "10000"
+
+FATAL_MESSAGES: tuple[str, ...] = (
+    "Emergency stop", "Fatal error occurred", "TeX capacity exceeded", "Interruption", "job aborted",
+)
+
+_FILE_LINE_ERROR = re.compile(r"^(?P<file>[^:\s()][^:()]*\.[A-Za-z]+):(?P<line>\d+): (?P<message>.*)$")
+_ERROR           = re.compile(r"^! (?P<message>.*)$")
+_ERROR_LINE      = re.compile(r"^l\.(?P<line>\d+)")
+_WARNING         = re.compile(r"^(?:LaTeX|Package \S+|Class \S+|pdfTeX) warning:? (?P<message>.*)$", re.IGNORECASE)
+_INPUT_LINE      = re.compile(r"on input line (\d+)")
+_BADBOX          = re.compile(r"^(?:Overfull|Underfull) \\[hv]box")
+_BADBOX_LINE     = re.compile(r"lines? (\d+)")
+_CONTINUATION    = re.compile(r"^\s*(\([^)\s]*\))?\s*")
+_OPEN_FILE       = re.compile(r"\((?P<file>\.{0,2}/?[^\s()]+\.(?:tex|sty|cls|clo|bbl|aux|toc|def|cfg|fd|ltx))")
+
+_BIBTEX_LINE     = re.compile(r"^(?P<message>.*)---line (?P<line>\d+) of file (?P<file>.*)$")
+_BIBTEX_ERROR    = re.compile(r"^(?P<message>I couldn't open .*|I found no .*|I'm skipping whatever remains.*)$")
+_BIBTEX_WARNING  = re.compile(r"^Warning--(?P<message>.*)$")
+
+class CompilationError(Exception):
+    """
+    Raised when a pdflatex or bibtex pass fails, is aborted or exceeds its limits.
+
+    Carries the parsed diagnostics and the tail of the log instead of
+    putting the whole log in the message.
+    """
+    def __init__(self, message: str, diagnostics: list[Diagnostic] | None = None, log: str = "",
+                 status: CompileStatus = CompileStatus.FAILED):
+        self.diagnostics : list[Diagnostic] = diagnostics or []
+        self.log         : str              = log
+        self.status      : CompileStatus    = status
+
+        errors = [d for d in self.diagnostics if d.kind in (DiagnosticKind.FATAL, DiagnosticKind.ERROR)]
+        details = "\n".join(f"  {d}" for d in errors[:5])
+        if len(errors) > 5:
+            details += f"\n  ... and {len(errors) - 5} more"
+
+        super().__init__(f"{message}\n{details}" if details else message)
+
+class LogParser:
+    """
+    Incremental parser of pdflatex/bibtex console output.
+
+    Lines are fed as they are produced; each call returns the diagnostics
+    the line completed. pdflatex is expected to run with `-file-line-error`
+    and a large `max_print_line`, so every error names its file and line.
+    For other errors the file comes from the stack of files TeX opened.
+
+    Args:
+        tool: The program whose output is parsed
+        max_errors: Number of errors after which `should_abort` becomes True
+    """
+    def __init__(self, tool: PassKind = PassKind.LATEX, max_errors: int | None = None):
+        self.tool        : PassKind         = tool
+        self.max_errors  : int | None       = max_errors
+        self.diagnostics : list[Diagnostic] = []
+        self.errors      : int              = 0
+        self.fatal       : bool             = False
+
+        self._files      : list[str]         = []
+        self._pending    : Diagnostic | None = None     # error waiting for its l.<n> line
+        self._warning    : Diagnostic | None = None     # warning which may continue on the next lines
+
+    @property
+    def should_abort(self) -> bool:
+        return self.fatal or (self.max_errors is not None and self.errors >= self.max_errors)
+
+    def feed(self, line: str) -> list[Diagnostic]:
+        line = line.rstrip("\r\n")
+
+        if self.tool == PassKind.BIBTEX:
+            return self._feed_bibtex(line)
+
+        return self._feed_latex(line)
+
+    def _feed_latex(self, line: str) -> list[Diagnostic]:
+        if self._warning is not None:
+            if line.startswith((" ", "(")) and line.strip() and not _OPEN_FILE.match(line.strip()):
+                self._warning.message += " " + _CONTINUATION.sub("", line)
+                self._locate_warning(self._warning)
+                return []
+            self._warning = None
+
+        if self._pending is not None:
+            match = _ERROR_LINE.match(line)
+            if match is not None:
+                self._pending.line = int(match.group("line"))
+                self._pending = None
+                return []
+
+        match = _FILE_LINE_ERROR.match(line)
+        if match is not None:
+            return self._error(match.group("message"), match.group("file"), int(match.group("line")))
+
+        match = _ERROR.match(line)
+        if match is not None:
+            diagnostic = self._error(match.group("message"), self._current_file(), None)
+            self._pending = diagnostic[0]
+            return diagnostic
+
+        match = _WARNING.match(line)
+        if match is not None:
+            self._warning = self._add(DiagnosticKind.WARNING, match.group("message"), self._current_file(), None)
+            self._locate_warning(self._warning)
+            return [self._warning]
+
+        if _BADBOX.match(line):
+            number = _BADBOX_LINE.search(line)
+            return [self._add(DiagnosticKind.BADBOX, line, self._current_file(), int(number.group(1)) if number else None)]
+
+        self._track_files(line)
+
+        return []
+
+    def _feed_bibtex(self, line: str) -> list[Diagnostic]:
+        match = _BIBTEX_LINE.match(line)
+        if match is not None:
+            return self._error(match.group("message").strip() or line, match.group("file").strip(), int(match.group("line")))
+
+        match = _BIBTEX_ERROR.match(line)
+        if match is not None:
+            return self._error(match.group("message"), None, None)
+
+        match = _BIBTEX_WARNING.match(line)
+        if match is not None:
+            return [self._add(DiagnosticKind.WARNING, match.group("message"), None, None)]
+
+        return []
+
+    def _error(self, message: str, file: str | None, line: int | None) -> list[Diagnostic]:
+        fatal = any(text in message for text in FATAL_MESSAGES)
+        kind = DiagnosticKind.FATAL if fatal else DiagnosticKind.ERROR
+
+        self.errors += 1
+        self.fatal = self.fatal or fatal
+
+        return [self._add(kind, message, file, line)]
+
+    def _add(self, kind: DiagnosticKind, message: str, file: str | None, line: int | None) -> Diagnostic:
+        diagnostic = Diagnostic(kind=kind, message=message.strip(), file=file, line=line, tool=self.tool)
+        self.diagnostics.append(diagnostic)
+
+        return diagnostic
+
+    def _locate_warning(self, warning: Diagnostic) -> None:
+        match = _INPUT_LINE.search(warning.message)
+        if match is not None:
+            warning.line = int(match.group(1))
+
+    def _current_file(self) -> str | None:
+        return next((file for file in reversed(self._files) if file), None)
+
+    def _track_files(self, line: str) -> None:
+        """ Follows the files TeX opens `(./file.tex` and closes `)` """
+        pos = 0
+
+        while pos < len(line):
+            char = line[pos]
+
+            if char == "(":
+                match = _OPEN_FILE.match(line, pos)
+                if match is not None:
+                    self._files.append(match.group("file"))
+                    pos = match.end()
+                    continue
+                self._files.append("")        # a parenthesis which is not a file still needs its pop
+            elif char == ")" and self._files:
+                self._files.pop()
+
+            pos += 1
@@ -0,0 +1,324 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+from pathlib import Path
+from functools import lru_cache
+from typing import Iterable
+
+from models.compile import ToolInfo, Toolchain
+from utils.cache import CACHE_DIR
+
+TOOLS: tuple[str, ...] = ("pdflatex", "bibtex", "kpsewhich")
+
+TOOLCHAIN_CACHE: Path = CACHE_DIR / "toolchain.json"
+
+# Seconds a file kpsewhich did not find is not looked up again, so a package installed meanwhile is seen
+MISSING_TTL: float = 60.0
+
+_DOCUMENT_CLASS = re.compile(r"\\documentclass\s*(\[[^\]]*\])?\s*\{([^}]*)\}")
+_PACKAGES = re.compile(r"\\(usepackage|RequirePackage)\s*(\[[^\]]*\])?\s*\{([^}]*)\}")
+_COMMENT = re.compile(r"(?<!\\)%[^\n]*")
+
+# Commands whose arguments after the first are branches taken only under a condition
+_BRANCHING = re.compile(
+    r"\\(?:IfFileExists|InputIfFileExists|If(?:Package|Class)(?:Available|Loaded)(?:TF|T|F)|IfFormatAtLeast(?:TF|T|F)"
+    r"|@ifpackageloaded|@ifclassloaded|@ifpackagelater|@ifundefined|ifthenelse)(?![A-Za-z@])"
+)
+# TeX conditionals, \ifx ... \fi, not counting \newif\iffoo which declares one
+_TEX_IF = re.compile(r"(\\newif\s*)?\\(if[A-Za-z@]*|fi)(?![A-Za-z@])")
+
+_lock: threading.Lock = threading.Lock()
+_missing: dict[str, tuple[str, float]] = {}     # name -> (toolchain key, monotonic time of the miss)
+
+@lru_cache(maxsize=1)
+def probe() -> Toolchain:
+    """
+    Finds the TeX executables, their versions and the distribution, once per process.
+
+    The result is also kept in TOOLCHAIN_CACHE, keyed on PATH and on the
+    paths and modification times of the executables, so a new process only
+    spawns `--version` subprocesses after the toolchain changed. Call
+    `probe.cache_clear()` after changing PATH in a running process.
+    """
+    paths = {name: shutil.which(name) for name in TOOLS}
+    key = _key(paths)
+
+    cached = _load(key)
+    if cached is not None:
+        return cached
+
+    toolchain = Toolchain(key=key)
+    for name, path in paths.items():
+        if path is None:
+            continue
+
+        try:
+            result = subprocess.run([name, '--version'], capture_output=True, text=True, check=False)
+        except (subprocess.SubprocessError, OSError):
+            continue
+
+        toolchain.tools[name] = ToolInfo(
+            name=name,
+            path=path,
+            version=result.stdout.strip().splitlines()[0] if result.stdout.strip() else "",
+            mtime=os.stat(path).st_mtime,
+        )
+
+    if "pdflatex" in toolchain.tools:
+        toolchain.distribution = _distribution(toolchain.tools["pdflatex"].version)
+
+    _save(toolchain)
+
+    return toolchain
+
+def find_files(names: Iterable[str], search_dirs: Iterable[Path] = ()) -> dict[str, Path | None]:
+    """
+    Locates TeX input files, first in search_dirs, then with a single kpsewhich call.
+
+    kpsewhich hits are remembered for the toolchain (on disk too), misses for
+    MISSING_TTL seconds and as long as the toolchain is the same.
+    """
+    names = list(dict.fromkeys(names))
+    search_dirs = [Path(d) for d in search_dirs]
+    found: dict[str, Path | None] = {}
+    lookup: list[str] = []
+
+    toolchain = probe()
+
+    for name in names:
+        local = next((d / name for d in search_dirs if (d / name).exists()), None)
+
+        if local is not None:
+            found[name] = local
+        elif name in toolchain.files:
+            found[name] = Path(toolchain.files[name])
+        elif _known_missing(name, toolchain.key):
+            found[name] = None
+        else:
+            lookup.append(name)
+
+    if lookup:
+        hits = _kpsewhich(lookup) if toolchain.has("kpsewhich") else {}
+
+        with _lock:
+            for name in lookup:
+                found[name] = hits.get(name)
+                if name in hits:
+                    toolchain.files[name] = str(hits[name])
+                else:
+                    _missing[name] = (toolchain.key, time.monotonic())
+
+        if hits:
+            _save(toolchain)
+
+    return found
+
+def find_file(name: str, search_dirs: Iterable[Path] = ()) -> Path | None:
+    """ Locates one TeX input file, see `find_files` """
+    return find_files([name], search_dirs)[name]
+
+def required_files(tex: str, conditional: bool = False) -> list[str]:
+    """
+    The class and package files a document loads from its preamble.
+
+    Args:
+        tex: The document
+        conditional: Return the packages loaded only in a conditional branch,
+            e.g. `\\IfFileExists{a.sty}{\\usepackage{a}}{}`, instead of the others
+    """
+    preamble = _COMMENT.sub("", tex.split("\\begin{document}", 1)[0])
+    branches = _branches(preamble)
+    names: list[str] = []
+
+    if conditional:
+        preamble = "\n".join(preamble[start:end] for start, end in branches)
+    else:
+        for start, end in branches:
+            preamble = preamble[:start] + " " * (end - start) + preamble[end:]
+
+        match = _DOCUMENT_CLASS.search(preamble)
+        if match is not None:
+            names.append(f"{match.group(2).strip()}.cls")
+
+    for match in _PACKAGES.finditer(preamble):
+        names.extend(f"{name.strip()}.sty" for name in match.group(3).split(",") if name.strip())
+
+    return names
+
+def preflight(tex: str, search_dirs: Iterable[Path] = (), use_bibtex: bool = False) -> Toolchain:
+    """
+    Checks the toolchain and the document's class and packages before any pass runs.
+
+    Packages loaded only in a conditional branch may be missing on purpose,
+    so those are only warned about.
+
+    Raises:
+        Exception: If pdflatex (or bibtex when needed) is not installed
+        FileNotFoundError: If a class or package file cannot be found
+    """
+    toolchain = probe()
+    toolchain.require("pdflatex", *(["bibtex"] if use_bibtex else []))
+
+    if not toolchain.has("kpsewhich"):
+        return toolchain
+
+    search_dirs = list(search_dirs)
+    required = required_files(tex)
+    optional = [name for name in required_files(tex, conditional=True) if name not in required]
+
+    found = find_files(required + optional, search_dirs)
+
+    missing = [name for name in required if found[name] is None]
+    if missing:
+        raise FileNotFoundError(f"Missing LaTeX class/package files: {', '.join(missing)}")
+
+    missing = [name for name in optional if found[name] is None]
+    if missing:
+        print(f"[WARNING] Conditionally loaded package files not found: {', '.join(missing)}")
+
+    return toolchain
+
+def _known_missing(name: str, key: str) -> bool:
+    """ Whether kpsewhich recently failed to find `name` with the same toolchain """
+    with _lock:
+        miss = _missing.get(name)
+        if miss is None:
+            return False
+
+        if miss[0] != key or time.monotonic() - miss[1] > MISSING_TTL:
+            del _missing[name]
+            return False
+
+    return True
+
+def _branches(preamble: str) -> list[tuple[int, int]]:
+    """ (start, end) of the conditional branches of a preamble, sorted and not overlapping """
+    spans: list[tuple[int, int]] = []
+
+    for match in _BRANCHING.finditer(preamble):
+        pos = match.end()
+        first = True
+
+        while True:
+            while pos < len(preamble) and preamble[pos].isspace():
+                pos += 1
+            if pos >= len(preamble) or preamble[pos] != "{":
+                break
+
+            end = _group_end(preamble, pos)
+            # The first argument is the condition, e.g. the file tested by \IfFileExists
+            if not first:
+                spans.append((pos, end))
+            first = False
+            pos = end
+
+    depth, start = 0, 0
+    for match in _TEX_IF.finditer(preamble):
+        if match.group(1) is not None or match.group(2) == "ifthenelse":
+            continue
+
+        if match.group(2) == "fi":
+            depth = max(0, depth - 1)
+            if depth == 0:
+                spans.append((start, match.end()))
+        else:
+            if depth == 0:
+                start = match.start()
+            depth += 1
+
+    if depth > 0:
+        spans.append((start, len(preamble)))
+
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+def _group_end(text: str, start: int) -> int:
+    """ Index after the brace closing the group opened at `start` """
+    depth = 0
+    pos = start
+
+    while pos < len(text):
+        char = text[pos]
+
+        if char == "\\":
+            pos += 2        # an escaped brace does not count
+            continue
+
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+
+        pos += 1
+
+    return len(text)
+
+def _kpsewhich(names: list[str]) -> dict[str, Path]:
+    result = subprocess.run(['kpsewhich', *names], capture_output=True, text=True, check=False)
+
+    hits: dict[str, Path] = {}
+    for line in result.stdout.splitlines():
+        path = Path(line.strip())
+        if path.name in names:
+            hits.setdefault(path.name, path)
+
+    return hits
+
+def _distribution(version: str) -> str:
+    version = version.lower()
+
+    match True:
+        case _ if "miktex" in version:
+            return "MiKTeX"
+        case _ if "tex live" in version:
+            return "TeX Live"
+        case _ if "mactex" in version:
+            return "MacTeX"
+        case _:
+            return "Unknown distribution"
+
+def _key(paths: dict[str, str | None]) -> str:
+    digest = hashlib.sha256(os.environ.get("PATH", "").encode("utf-8"))
+
+    for name, path in sorted(paths.items()):
+        mtime = os.stat(path).st_mtime if path is not None else None
+        digest.update(f"{name}={path}@{mtime}\n".encode("utf-8"))
+
+    return digest.hexdigest()
+
+def _load(key: str) -> Toolchain | None:
+    try:
+        toolchains = json.loads(TOOLCHAIN_CACHE.read_text(encoding="utf-8"))
+        return Toolchain(**toolchains[key]) if key in toolchains else None
+    except (OSError, ValueError, TypeError):
+        return None
+
+def _save(toolchain: Toolchain) -> None:
+    with _lock:
+        try:
+            toolchains = json.loads(TOOLCHAIN_CACHE.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            toolchains = {}
+
+        toolchains[toolchain.key] = toolchain.model_dump()
+
+        try:
+            TOOLCHAIN_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = TOOLCHAIN_CACHE.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(toolchains), encoding="utf-8")
+            tmp.replace(TOOLCHAIN_CACHE)
+        except OSError as e:
+            print(f"[WARNING] Could not write the toolchain cache: {e}")
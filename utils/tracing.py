@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import bisect
+import itertools
+import argparse
+import threading
+import functools
+import contextvars
+from pathlib import Path
+from contextlib import nullcontext
+from typing import Callable, Iterator
+
+# Upper bounds in seconds, from a single node dispatch up to a full compilation
+BUCKETS: tuple[float, ...] = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+_current: contextvars.ContextVar['Span | None'] = contextvars.ContextVar("texmorph_span", default=None)
+
+# Span ids only need to be unique within the trace file, a counter is much cheaper than uuid4
+_ids: Iterator[int] = itertools.count(1)
+
+class Span:
+    """
+    A timed operation, nested under the span that was current when it started.
+
+    Labels may be added while the span is open, e.g. once a cache lookup
+    tells whether an extraction was cached; they end up in the metrics.
+    """
+    __slots__ = ("name", "labels", "trace_id", "span_id", "parent_id", "start", "end", "error", "_tracer", "_token")
+
+    def __init__(self, tracer: 'Tracer', name: str, labels: dict[str, str]):
+        self.name      : str                    = name
+        self.labels    : dict[str, str]         = labels
+        self.trace_id  : str                    = ""
+        self.span_id   : str                    = ""
+        self.parent_id : str | None             = None
+        self.start     : float                  = 0.0
+        self.end       : float | None           = None
+        self.error     : str | None             = None
+
+        self._tracer   : Tracer                 = tracer
+        self._token    : contextvars.Token | None = None
+
+    def __enter__(self) -> 'Span':
+        parent = _current.get()
+
+        self.span_id = f"{os.getpid():x}-{next(_ids):x}"
+        if parent is not None:
+            self.trace_id, self.parent_id = parent.trace_id, parent.span_id
+        else:
+            self.trace_id = self.span_id
+
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.error = exc_type.__name__
+
+        _current.reset(self._token)
+        self._tracer._finish(self)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self) -> dict:
+        return {
+            "name"      : self.name,
+            "labels"    : self.labels,
+            "trace_id"  : self.trace_id,
+            "span_id"   : self.span_id,
+            "parent_id" : self.parent_id,
+            "duration"  : self.duration,
+            "error"     : self.error,
+            "time"      : time.time(),
+        }
+
+class Histogram:
+    """ Cumulative bucket counts, the sum and the count of observed durations """
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts : list[int] = [0] * (len(BUCKETS) + 1)
+        self.sum    : float     = 0.0
+        self.count  : int       = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """ Upper bound of the bucket holding the q-quantile """
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+        return float("inf")
+
+class Metrics:
+    """
+    Counters and duration histograms, keyed on a name and a set of labels.
+
+    Every finished span adds to the `texmorph_span_seconds` histogram (its
+    `_count` is the number of spans) and failed ones to
+    `texmorph_span_errors_total`.
+    """
+    def __init__(self):
+        self.counters   : dict[tuple[str, tuple], float]     = {}
+        self.histograms : dict[tuple[str, tuple], Histogram] = {}
+
+        self._lock      : threading.Lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def summary(self) -> dict[str, dict]:
+        """ Count, mean and p50/p95/p99 of every histogram, keyed on `name{labels}` """
+        with self._lock:
+            histograms = list(self.histograms.items())
+
+        return {
+            _series(name, labels): {
+                "count" : histogram.count,
+                "mean"  : histogram.sum / histogram.count if histogram.count else 0.0,
+                "p50"   : histogram.quantile(0.50),
+                "p95"   : histogram.quantile(0.95),
+                "p99"   : histogram.quantile(0.99),
+            }
+            for (name, labels), histogram in sorted(histograms)
+        }
+
+    def prometheus(self) -> str:
+        """ The metrics in the Prometheus text exposition format """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count)) for key, h in self.histograms.items())
+
+        lines: list[str] = []
+        typed: set[str] = set()
+
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{_series(name, labels)} {value:g}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{_series(name + '_bucket', labels + (('le', le),))} {cumulative}")
+
+            lines.append(f"{_series(name + '_sum', labels)} {total:.6f}")
+            lines.append(f"{_series(name + '_count', labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+class JsonLinesExporter:
+    """
+    Appends every finished span to a JSON-lines file.
+
+    The file is opened once per process in append mode and line buffered, so
+    worker processes can share one file without interleaving lines.
+    """
+    def __init__(self, path: Path | str):
+        self.path  : Path           = Path(path)
+        self._lock : threading.Lock = threading.Lock()
+        self._file                  = None
+        self._pid  : int | None     = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def __call__(self, span: Span) -> None:
+        line = json.dumps(span.to_dict()) + "\n"
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._pid = os.getpid()
+
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file, self._pid = None, None
+
+class Tracer:
+    """
+    Nested spans around the stages of the pipeline, aggregated into Metrics.
+
+    The current span is kept in a context variable, so spans nest across
+    function calls and asyncio tasks; threads started with
+    `contextvars.copy_context().run` nest under the span that started them.
+    Finished spans go to every exporter, see `JsonLinesExporter`.
+
+    The process-wide tracer is configured from the environment:
+    TEXMORPH_TRACE=0 disables it, TEXMORPH_TRACE_FILE exports spans as JSON lines.
+    """
+    _default: 'Tracer | None' = None
+    _default_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, enabled: bool = True):
+        self.enabled   : bool                         = enabled
+        self.metrics   : Metrics                      = Metrics()
+        self.exporters : list[Callable[[Span], None]] = []
+
+    @classmethod
+    def default(cls) -> 'Tracer':
+        """ Returns the process-wide tracer """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(enabled=os.getenv("TEXMORPH_TRACE", "1") != "0")
+
+                path = os.getenv("TEXMORPH_TRACE_FILE")
+                if path:
+                    cls._default.exporters.append(JsonLinesExporter(path))
+
+        return cls._default
+
+    def span(self, name: str, **labels: str) -> Span | nullcontext:
+        if not self.enabled:
+            return nullcontext()
+
+        return Span(self, name, labels)
+
+    def _finish(self, span: Span) -> None:
+        self.metrics.observe("texmorph_span_seconds", span.duration, span=span.name, **span.labels)
+        if span.error is not None:
+            self.metrics.inc("texmorph_span_errors_total", span=span.name, error=span.error)
+
+        for exporter in self.exporters:
+            try:
+                exporter(span)
+            except Exception as e:
+                print(f"[WARNING] Could not export span {span.name}: {e}")
+
+def span(name: str, **labels: str):
+    """ A span of the process-wide tracer, `with span("parse"): ...` """
+    return Tracer.default().span(name, **labels)
+
+def traced(name: str, **labels: str):
+    """ Decorator running every call of a function in a span """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+def current_span() -> Span | None:
+    return _current.get()
+
+def metrics() -> Metrics:
+    return Tracer.default().metrics
+
+def write_prometheus(path: Path | str) -> None:
+    """ Writes the metrics for the node exporter textfile collector, atomically """
+    path = Path(path)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(metrics().prometheus(), encoding="utf-8")
+    tmp.replace(path)
+
+def summarise(path: Path | str) -> dict[str, dict]:
+    """ Rebuilds the duration summary of every span name and label set from a JSON-lines file """
+    path = Path(path)
+
+    if not path.exists():
+        raise FileNotFoundError(f"File {path} not found.")
+
+    aggregated = Metrics()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            aggregated.observe("texmorph_span_seconds", record["duration"], span=record["name"], **record["labels"])
+
+    return aggregated.summary()
+
+def _series(name: str, labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return name
+
+    return name + "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise spans exported to a JSON-lines file.")
+    parser.add_argument("trace", type=Path)
+    parser.add_argument("--slowest", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = sorted(summarise(args.trace).items(), key=lambda item: item[1]["p95"], reverse=True)
+
+    print(f"{'series':<70}{'count':>8}{'mean':>10}{'p95':>10}")
+    for series, stats in rows[:args.slowest]:
+        print(f"{series:<70}{stats['count']:>8}{stats['mean'] * 1000:>8.2f}ms{stats['p95'] * 1000:>8.2f}ms")